@@ -0,0 +1,127 @@
+import os
+import subprocess
+import pandas as pd
+from app.result_cache import cached_map
+
+CLONE_COLUMNS = ['full_name', 'head', 'files', 'size_bytes', 'lines', 'primary_language', 'languages', 'language_files',
+                 'manifests', 'test_files', 'test_ratio']
+ANALYSIS_VERSION = 2  # Bump when the metrics change, so cached results of older versions are recomputed
+
+# File extension -> language of its lines
+LANGUAGE_EXTENSIONS = {
+    '.py': 'Python', '.pyx': 'Python', '.ipynb': 'Jupyter Notebook',
+    '.js': 'JavaScript', '.mjs': 'JavaScript', '.cjs': 'JavaScript', '.jsx': 'JavaScript',
+    '.ts': 'TypeScript', '.tsx': 'TypeScript',
+    '.java': 'Java', '.kt': 'Kotlin', '.kts': 'Kotlin', '.scala': 'Scala', '.groovy': 'Groovy',
+    '.c': 'C', '.h': 'C', '.cc': 'C++', '.cpp': 'C++', '.cxx': 'C++', '.hpp': 'C++', '.hh': 'C++',
+    '.cs': 'C#', '.go': 'Go', '.rs': 'Rust', '.rb': 'Ruby', '.php': 'PHP', '.swift': 'Swift',
+    '.m': 'Objective-C', '.mm': 'Objective-C++', '.r': 'R', '.jl': 'Julia', '.lua': 'Lua', '.pl': 'Perl',
+    '.hs': 'Haskell', '.ex': 'Elixir', '.exs': 'Elixir', '.erl': 'Erlang', '.clj': 'Clojure', '.dart': 'Dart',
+    '.sh': 'Shell', '.bash': 'Shell', '.zsh': 'Shell', '.ps1': 'PowerShell', '.sql': 'SQL',
+    '.html': 'HTML', '.htm': 'HTML', '.css': 'CSS', '.scss': 'SCSS', '.vue': 'Vue', '.svelte': 'Svelte',
+    '.md': 'Markdown', '.rst': 'reStructuredText', '.tex': 'TeX',
+    '.json': 'JSON', '.yml': 'YAML', '.yaml': 'YAML', '.toml': 'TOML', '.xml': 'XML',
+}
+# File names that declare dependencies, by ecosystem
+MANIFEST_FILES = {
+    'requirements.txt', 'setup.py', 'setup.cfg', 'pyproject.toml', 'Pipfile', 'environment.yml', 'poetry.lock',
+    'package.json', 'yarn.lock', 'pnpm-lock.yaml', 'Cargo.toml', 'go.mod', 'pom.xml', 'build.gradle',
+    'build.gradle.kts', 'Gemfile', 'composer.json', 'Package.swift', 'mix.exs', 'DESCRIPTION', 'CMakeLists.txt',
+    'conanfile.txt', 'vcpkg.json',
+}
+# Documentation and data languages, counted but never the primary language of a repository
+NON_CODE_LANGUAGES = {'Markdown', 'reStructuredText', 'TeX', 'JSON', 'YAML', 'TOML', 'XML', 'HTML', 'CSS', 'SCSS'}
+TEST_DIR_NAMES = {'test', 'tests', 'testing', 'spec', 'specs', '__tests__'}
+BINARY_PROBE_BYTES = 8192  # A file with a NUL byte in its first bytes is binary and has no lines
+
+
+def head_sha(clone_dir):
+    """ Commit SHA checked out in a clone, or None when it is not a git working tree. """
+    if not os.path.exists(os.path.join(clone_dir, '.git')):
+        return None
+    result = subprocess.run(['git', '-C', clone_dir, 'rev-parse', 'HEAD'], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _line_count(path):
+    """ Lines of a text file (a last line without newline counts too), or None for a binary file. """
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as file:
+        chunk = file.read(BINARY_PROBE_BYTES)
+        if b'\0' in chunk:
+            return None
+        while chunk:
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+            chunk = file.read(2 ** 20)
+    return lines + (last != b'\n')
+
+
+def _clone_metrics(clone_dir):
+    """
+    Walk one working tree (without .git) and compute its file count and size, lines and files
+    per language, the dependency manifests present (relative paths) and the share of the
+    source files (documentation and data left out) that are under a test directory.
+    """
+    files = size = test_files = source_files = 0
+    languages, language_files, manifests = {}, {}, []
+    for root, dirs, names in os.walk(clone_dir):
+        dirs[:] = [name for name in dirs if name != '.git']
+        relative_root = os.path.relpath(root, clone_dir)
+        in_tests = any(part.lower() in TEST_DIR_NAMES for part in relative_root.split(os.sep))
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.islink(path) or not os.path.isfile(path):
+                continue
+            files += 1
+            size += os.path.getsize(path)
+            if name in MANIFEST_FILES:
+                manifests.append(os.path.normpath(os.path.join(relative_root, name)))
+            language = LANGUAGE_EXTENSIONS.get(os.path.splitext(name)[1].lower())
+            if language is None:
+                continue
+            lines = _line_count(path)
+            if lines is None:
+                continue
+            languages[language] = languages.get(language, 0) + lines
+            language_files[language] = language_files.get(language, 0) + 1
+            if language not in NON_CODE_LANGUAGES:
+                source_files += 1
+                test_files += in_tests
+
+    code = {language: lines for language, lines in languages.items() if language not in NON_CODE_LANGUAGES}
+    return {
+        'files': files,
+        'size_bytes': size,
+        'lines': sum(languages.values()),
+        'primary_language': max(code, key=code.get) if code else None,
+        'languages': dict(sorted(languages.items(), key=lambda item: -item[1])),
+        'language_files': language_files,
+        'manifests': sorted(manifests),
+        'test_files': test_files,
+        'test_ratio': round(test_files / source_files, 4) if source_files else 0.0,
+    }
+
+
+def analyze_clones(clones, cache_file, max_workers=None):
+    """
+    Compute the local metrics of every clone in clones (full_name -> working tree directory)
+    and return them as one DataFrame keyed by full_name. Missing directories are left out.
+
+    Working trees are walked in parallel across a process pool. Results are cached per
+    full_name with the HEAD commit SHA in cache_file, so clones whose checkout has not
+    changed are not walked again.
+    """
+    jobs, heads = {}, {}
+    for full_name, clone_dir in clones.items():
+        if not os.path.isdir(clone_dir):
+            continue
+        heads[full_name] = head_sha(clone_dir)
+        # Without a readable HEAD there is no key, so the clone is walked again every time
+        jobs[full_name] = ((ANALYSIS_VERSION, heads[full_name]) if heads[full_name] else None, clone_dir)
+    results = cached_map(_clone_metrics, jobs, cache_file, max_workers)
+
+    analysis = pd.DataFrame([dict(metrics, full_name=full_name, head=heads[full_name]) for full_name, metrics in results.items()],
+                            columns=CLONE_COLUMNS)
+    return analysis.set_index('full_name').sort_index()
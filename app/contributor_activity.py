@@ -0,0 +1,179 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+ACTIVITY_KINDS = ('commits', 'pulls', 'issues')
+KIND_INDEX = {kind: index for index, kind in enumerate(ACTIVITY_KINDS)}
+
+
+class _RepoCounts:
+    """ Activity counts of one repository: a growable (contributors x kinds) array and the row of each contributor id. """
+    __slots__ = ('rows', 'contributors', 'counts', 'unattributed', 'recorded')
+
+    def __init__(self):
+        self.rows = {}  # contributor id -> row in counts
+        self.contributors = np.zeros(8, dtype=np.int32)  # row -> contributor id
+        self.counts = np.zeros((8, len(ACTIVITY_KINDS)), dtype=np.int64)
+        self.unattributed = np.zeros(len(ACTIVITY_KINDS), dtype=np.int64)  # items without a GitHub login
+        self.recorded = 0  # bitmask of the kinds fetched for this repository
+
+    def row(self, contributor):
+        row = self.rows.get(contributor)
+        if row is None:
+            row = len(self.rows)
+            if row == len(self.contributors):
+                capacity = max(8, 2 * row)
+                self.contributors = np.resize(self.contributors, capacity)
+                self.counts = np.vstack([self.counts, np.zeros((capacity - row, len(ACTIVITY_KINDS)), dtype=np.int64)])
+            self.rows[contributor] = row
+            self.contributors[row] = contributor
+        return row
+
+    def reset(self, kind):
+        used = len(self.rows)
+        self.counts[:used, kind] = 0
+        self.unattributed[kind] = 0
+
+
+class ContributorActivity:
+    """
+    Per-repository commit, pull request and issue counts of every contributor, fed by the
+    fetch stages page by page. Logins are interned to integer ids once; each repository keeps
+    its counts in a numpy array indexed by row, so millions of (repo, contributor) pairs stay
+    compact. Saved as a .npz file and mergeable across runs and shards.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.logins = []  # contributor id -> login
+        self.ids = {}  # login -> contributor id
+        self.repos = {}  # full_name -> _RepoCounts
+
+    def intern(self, login):
+        contributor = self.ids.get(login)
+        if contributor is None:
+            contributor = len(self.logins)
+            login = sys.intern(login)
+            self.logins.append(login)
+            self.ids[login] = contributor
+        return contributor
+
+    def _repo(self, full_name):
+        counts = self.repos.get(full_name)
+        if counts is None:
+            counts = self.repos[full_name] = _RepoCounts()
+        return counts
+
+    def begin(self, full_name, kind):
+        """ Start (re)counting one kind of a repository: a stage that re-fetches it replaces the earlier counts. """
+        with self.lock:
+            counts = self._repo(full_name)
+            counts.reset(KIND_INDEX[kind])
+            counts.recorded |= 1 << KIND_INDEX[kind]
+
+    def add(self, full_name, kind, logins):
+        """ Count one item of `kind` per login of a fetched page; None stands for an item without a login. """
+        column = KIND_INDEX[kind]
+        with self.lock:
+            counts = self._repo(full_name)
+            counts.recorded |= 1 << column
+            for login in logins:
+                if login:
+                    row = counts.row(self.intern(login))  # May grow counts.counts, so look it up first
+                    counts.counts[row, column] += 1
+                else:
+                    counts.unattributed[column] += 1
+
+    def repo_activity(self, full_name):
+        """ {login: {kind: count}} of one repository. """
+        with self.lock:
+            counts = self.repos.get(full_name)
+            if counts is None:
+                return {}
+            used = len(counts.rows)
+            return {self.logins[contributor]: dict(zip(ACTIVITY_KINDS, row.tolist()))
+                    for contributor, row in zip(counts.contributors[:used], counts.counts[:used])}
+
+    def to_frame(self):
+        """ One row per (full_name, login) with a column per activity kind. """
+        with self.lock:
+            names, logins, blocks = [], [], []
+            for full_name, counts in self.repos.items():
+                used = len(counts.rows)
+                names.extend([full_name] * used)
+                logins.extend(self.logins[contributor] for contributor in counts.contributors[:used])
+                blocks.append(counts.counts[:used])
+            values = np.vstack(blocks) if blocks else np.zeros((0, len(ACTIVITY_KINDS)), dtype=np.int64)
+        df = pd.DataFrame(values, columns=list(ACTIVITY_KINDS))
+        df.insert(0, 'login', logins)
+        df.insert(0, 'full_name', names)
+        return df
+
+    def contributor_totals(self):
+        """ Activity of every contributor summed over all repositories, most active first. """
+        df = self.to_frame()
+        totals = df.groupby('login')[list(ACTIVITY_KINDS)].sum()
+        totals['repos'] = df.groupby('login').size()
+        return totals.sort_values(list(ACTIVITY_KINDS), ascending=False)
+
+    def merge(self, other):
+        """ Take over the counts of every (repository, kind) recorded in other, replacing ours. """
+        for full_name, theirs in other.repos.items():
+            used = len(theirs.rows)
+            with self.lock:
+                ours = self._repo(full_name)
+                for kind in range(len(ACTIVITY_KINDS)):
+                    if not theirs.recorded & (1 << kind):
+                        continue
+                    ours.reset(kind)
+                    ours.recorded |= 1 << kind
+                    ours.unattributed[kind] = theirs.unattributed[kind]
+                    for contributor, count in zip(theirs.contributors[:used], theirs.counts[:used, kind]):
+                        if count:
+                            row = ours.row(self.intern(other.logins[contributor]))
+                            ours.counts[row, kind] = count
+
+    def save(self, path):
+        with self.lock:
+            names = list(self.repos)
+            used = [len(self.repos[name].rows) for name in names]
+            tmp_path = path + '.tmp.npz'
+            np.savez_compressed(
+                tmp_path,
+                logins=np.array(self.logins, dtype=str),
+                repos=np.array(names, dtype=str),
+                recorded=np.array([self.repos[name].recorded for name in names], dtype=np.uint8),
+                unattributed=np.array([self.repos[name].unattributed for name in names], dtype=np.int64).reshape(-1, len(ACTIVITY_KINDS)),
+                repo_index=np.repeat(np.arange(len(names), dtype=np.int32), used),
+                contributors=np.concatenate([self.repos[name].contributors[:n] for name, n in zip(names, used)] or [np.zeros(0, dtype=np.int32)]),
+                counts=np.concatenate([self.repos[name].counts[:n] for name, n in zip(names, used)] or [np.zeros((0, len(ACTIVITY_KINDS)), dtype=np.int64)]),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        activity = cls()
+        with np.load(path) as data:
+            activity.logins = [sys.intern(str(login)) for login in data['logins']]
+            activity.ids = {login: contributor for contributor, login in enumerate(activity.logins)}
+            names = [str(name) for name in data['repos']]
+            # Entries are stored grouped by repository, so each repository is one slice
+            ends = np.cumsum(np.bincount(data['repo_index'], minlength=len(names)))
+            contributors, values = data['contributors'], data['counts']
+            for index, (name, recorded, unattributed) in enumerate(zip(names, data['recorded'], data['unattributed'])):
+                start, end = (ends[index - 1] if index else 0), ends[index]
+                counts = activity._repo(name)
+                counts.recorded = int(recorded)
+                counts.unattributed = unattributed.copy()
+                if end > start:
+                    counts.contributors = contributors[start:end].copy()
+                    counts.counts = values[start:end].copy()
+                    counts.rows = {contributor: row for row, contributor in enumerate(counts.contributors.tolist())}
+        return activity
+
+    @classmethod
+    def load_or_create(cls, path):
+        return cls.load(path) if os.path.isfile(path) else cls()
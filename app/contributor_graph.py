@@ -0,0 +1,235 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from app.repo_activity import full_name_from_filename
+
+# Per-repo outputs the graph is built from: dataset directory -> (login column, weight column or None to count rows)
+GRAPH_SOURCES = {
+    'contributors': ('contributor_login', 'contributions'),
+    'commits': ('login', None),
+    'pulls': ('user', None),
+}
+MISSING_LOGINS = ('N/A', '')
+
+
+def _repo_weights(data_dir, filename):
+    """
+    Edge weights of one repository: the contributions reported by the contributors API (or,
+    without that file, the number of commits) plus the number of pull requests, per login.
+    """
+    weights = {}
+    for dataset, (login_column, weight_column) in GRAPH_SOURCES.items():
+        path = os.path.join(data_dir, dataset, filename)
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            continue
+        if dataset == 'commits' and os.path.isfile(os.path.join(data_dir, 'contributors', filename)):
+            continue  # The contributors API already counts the commits
+        columns = [login_column] + ([weight_column] if weight_column else [])
+        try:
+            df = pd.read_csv(path, usecols=columns, dtype={login_column: 'string'})
+        except (ValueError, pd.errors.EmptyDataError):
+            continue  # Header without the expected columns, or no rows at all
+        df = df[df[login_column].notna() & ~df[login_column].isin(MISSING_LOGINS)]
+        if weight_column:
+            counts = df.groupby(login_column)[weight_column].sum()
+        else:
+            counts = df[login_column].value_counts()
+        for login, count in counts.items():
+            weights[login] = weights.get(login, 0) + float(count)
+    return weights
+
+
+class ContributorGraph:
+    """
+    Repository x contributor sparse matrix. Rows are replaced per repository when its
+    output files change, and the CSR matrix is assembled from the rows on demand. Saved
+    uncompressed as .npz (CSR arrays plus labels), so loading takes milliseconds.
+    """
+
+    def __init__(self):
+        self.repos = []  # row -> full_name
+        self.repo_ids = {}
+        self.logins = []  # column -> login
+        self.login_ids = {}
+        self.rows = {}  # row -> (column indices, weights)
+        self.sources = {}  # 'dataset/owner++repo.csv' -> (mtime_ns, size) the row was built from
+        self._matrix = None
+
+    def _login_id(self, login):
+        column = self.login_ids.get(login)
+        if column is None:
+            column = self.login_ids[login] = len(self.logins)
+            self.logins.append(login)
+        return column
+
+    def set_repo(self, full_name, weights):
+        """ Replace the row of a repository with {login: weight}. """
+        row = self.repo_ids.get(full_name)
+        if row is None:
+            row = self.repo_ids[full_name] = len(self.repos)
+            self.repos.append(full_name)
+        columns = np.fromiter((self._login_id(login) for login in weights), dtype=np.int32, count=len(weights))
+        values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        order = np.argsort(columns)
+        self.rows[row] = (columns[order], values[order])
+        self._matrix = None
+
+    def remove_repos(self, full_names):
+        """ Drop the rows of repositories, and the contributors left without any repository. """
+        empty = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+        kept = [(full_name, self.rows.get(row, empty)) for row, full_name in enumerate(self.repos) if full_name not in full_names]
+        used = np.unique(np.concatenate([columns for _, (columns, _) in kept])) if kept else empty[0]
+        # Used columns keep their order, so every row stays sorted by column
+        new_columns = np.full(len(self.logins), -1, dtype=np.int32)
+        new_columns[used] = np.arange(len(used), dtype=np.int32)
+        self.logins = [self.logins[column] for column in used]
+        self.login_ids = {login: column for column, login in enumerate(self.logins)}
+        self.repos = [full_name for full_name, _ in kept]
+        self.repo_ids = {full_name: row for row, full_name in enumerate(self.repos)}
+        self.rows = {row: (new_columns[columns], values) for row, (_, (columns, values)) in enumerate(kept)}
+        self._matrix = None
+
+    def update(self, data_dir):
+        """
+        Rebuild the rows of every repository whose contributors, commits or pulls file changed
+        or was deleted; repositories without any of those files left are removed. Returns their count.
+        """
+        changed = set()
+        seen = set()
+        for dataset in GRAPH_SOURCES:
+            directory = os.path.join(data_dir, dataset)
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if not entry.name.endswith('.csv'):
+                    continue
+                stat = entry.stat()
+                key = f'{dataset}/{entry.name}'
+                seen.add(key)
+                if self.sources.get(key) != (stat.st_mtime_ns, stat.st_size):
+                    self.sources[key] = (stat.st_mtime_ns, stat.st_size)
+                    changed.add(entry.name)
+        # Drop entries of files that no longer exist, rebuilding the rows they were part of
+        for key in [key for key in self.sources if key not in seen]:
+            del self.sources[key]
+            changed.add(key.split('/', 1)[1])
+
+        removed = set()
+        for filename in changed:
+            if any(f'{dataset}/{filename}' in self.sources for dataset in GRAPH_SOURCES):
+                self.set_repo(full_name_from_filename(filename), _repo_weights(data_dir, filename))
+            elif full_name_from_filename(filename) in self.repo_ids:
+                removed.add(full_name_from_filename(filename))
+        if removed:
+            self.remove_repos(removed)
+        return len(changed)
+
+    @property
+    def matrix(self):
+        """ The repos x contributors CSR matrix of edge weights. """
+        if self._matrix is None:
+            lengths = np.array([len(self.rows[row][0]) if row in self.rows else 0 for row in range(len(self.repos))], dtype=np.int64)
+            indptr = np.concatenate([[0], np.cumsum(lengths)])
+            empty = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+            parts = [self.rows.get(row, empty) for row in range(len(self.repos))]
+            indices = np.concatenate([part[0] for part in parts]) if parts else empty[0]
+            data = np.concatenate([part[1] for part in parts]) if parts else empty[1]
+            self._matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(self.repos), len(self.logins)))
+        return self._matrix
+
+    def _binary(self):
+        binary = self.matrix.copy()
+        binary.data[:] = 1
+        return binary
+
+    def repo_projection(self, weighted=False):
+        """ Repo x repo matrix of shared contributors (or summed weight products when weighted). """
+        matrix = self.matrix if weighted else self._binary()
+        return (matrix @ matrix.T).tocsr()
+
+    def contributor_projection(self, weighted=False):
+        """ Contributor x contributor matrix of the repositories they share. """
+        matrix = self.matrix if weighted else self._binary()
+        matrix = matrix.tocsc()
+        return (matrix.T @ matrix).tocsr()
+
+    @staticmethod
+    def _top_k(scores, exclude, labels, k):
+        scores = np.asarray(scores.todense()).ravel()
+        scores[exclude] = 0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(labels[index], float(scores[index])) for index in candidates]
+
+    def top_repos(self, full_name, k=10, weighted=False):
+        """ The k repositories sharing the most contributors with full_name, without the full projection. """
+        matrix = self.matrix if weighted else self._binary()
+        row = self.repo_ids[full_name]
+        return self._top_k(matrix[row] @ matrix.T, row, self.repos, k)
+
+    def top_contributors(self, login, k=10, weighted=False):
+        """ The k contributors sharing the most repositories with login. """
+        matrix = (self.matrix if weighted else self._binary()).tocsc()
+        column = self.login_ids[login]
+        return self._top_k(matrix[:, column].T @ matrix, column, self.logins, k)
+
+    def save(self, path):
+        matrix = self.matrix
+        sources = list(self.sources.items())
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                 shape=np.array(matrix.shape), repos=np.array(self.repos, dtype=str),
+                 logins=np.array(self.logins, dtype=str),
+                 source_keys=np.array([key for key, _ in sources], dtype=str),
+                 source_stats=np.array([stat for _, stat in sources], dtype=np.int64).reshape(-1, 2))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        graph = cls()
+        with np.load(path) as data:
+            graph.repos = data['repos'].tolist()
+            graph.logins = data['logins'].tolist()
+            graph._matrix = sparse.csr_matrix((data['data'], data['indices'], data['indptr']), shape=tuple(data['shape']))
+            graph.sources = {key: tuple(stat) for key, stat in zip(data['source_keys'].tolist(), data['source_stats'].tolist())}
+        graph.repo_ids = {full_name: row for row, full_name in enumerate(graph.repos)}
+        graph.login_ids = {login: column for column, login in enumerate(graph.logins)}
+        matrix = graph._matrix
+        graph.rows = {row: (matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]],
+                            matrix.data[matrix.indptr[row]:matrix.indptr[row + 1]]) for row in range(len(graph.repos))}
+        return graph
+
+
+def update_contributor_graph(data_dir, graph_file=None):
+    """ Load the saved graph of data_dir (if any), fold in the changed per-repo outputs and save it again. """
+    graph_file = graph_file or os.path.join(data_dir, 'metadata', 'contributor_graph.npz')
+    graph = ContributorGraph.load(graph_file) if os.path.isfile(graph_file) else ContributorGraph()
+    changed = graph.update(data_dir)
+    if changed or not os.path.isfile(graph_file):
+        graph.save(graph_file)
+    print(f"\nContributor graph: {len(graph.repos)} repositories x {len(graph.logins)} contributors "
+          f"({graph.matrix.nnz} edges, {changed} repositories updated)")
+    return graph
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the repository x contributor graph and query neighbours.")
+    parser.add_argument('--data', type=str, default='data', help='Data directory with contributors/, commits/ and pulls/')
+    parser.add_argument('--repo', type=str, default=None, help='Show the repositories sharing most contributors with owner/repo')
+    parser.add_argument('--login', type=str, default=None, help='Show the contributors sharing most repositories with a login')
+    parser.add_argument('-k', type=int, default=10, help='Number of neighbours to show')
+    args = parser.parse_args()
+
+    graph = update_contributor_graph(args.data)
+    if args.repo:
+        for full_name, shared in graph.top_repos(args.repo, args.k):
+            print(f"{full_name}\t{shared:g}")
+    if args.login:
+        for login, shared in graph.top_contributors(args.login, args.k):
+            print(f"{login}\t{shared:g}")
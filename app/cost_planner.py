@@ -0,0 +1,128 @@
+import json
+import math
+import os
+import time
+
+from tabulate import tabulate
+
+from app.fetch_github_data import TOTAL_COUNT_FIELDS
+from app.repo_registry import RepoRegistry
+
+PAGE_SIZE = 100  # Items per page of every planned connection
+DEFAULT_PAGE_SECONDS = 1.0  # Latency of a page when no earlier run report has measured it
+RATE_LIMIT_WINDOW = 3600  # The GraphQL point budget resets every hour
+DEFAULT_POINTS_PER_HOUR = 5000
+
+
+def connection_pages(total):
+    """ Pages needed to walk a connection of `total` items; an empty connection still costs one request. """
+    return max(1, math.ceil(total / PAGE_SIZE))
+
+
+def measured_page_seconds(metadata_dir, stages):
+    """ Mean GraphQL latency of the planned stages in the last run report, or None without one. """
+    report_path = os.path.join(metadata_dir, 'run_report.json')
+    if not os.path.isfile(report_path):
+        return None
+    with open(report_path, encoding='utf-8') as file:
+        report = json.load(file)
+    entries = [entry for entry in report.get('endpoints', [])
+               if entry['stage'] in stages and entry['endpoint'] == 'graphql' and entry['requests']]
+    requests = sum(entry['requests'] for entry in entries)
+    return sum(entry['latency_seconds_sum'] for entry in entries) / requests if requests else None
+
+
+def estimate_plan(repos, stages, workers=1, page_seconds=DEFAULT_PAGE_SECONDS, rate_limit=None, now=None):
+    """
+    Pages, GraphQL cost and wall-clock time of fetching `stages` for `repos` from their totals.
+
+    A page of up to 100 nodes without nested connections costs one point, so cost equals
+    pages. The run takes the longest of: all pages spread over the workers, the longest
+    single repository (its pages of one stage are sequential), and the rate-limit windows
+    needed once the remaining points are spent. Repositories are ordered largest first.
+    """
+    now = now or time.time()
+    rate_limit = rate_limit or {}
+    per_stage = {stage: {'items': 0, 'pages': 0, 'cost': 0} for stage in stages}
+    order = []
+    for repo in repos:
+        pages = {stage: connection_pages(repo.totals.get(stage, 0)) for stage in stages}
+        for stage in stages:
+            per_stage[stage]['items'] += repo.totals.get(stage, 0)
+            per_stage[stage]['pages'] += pages[stage]
+            per_stage[stage]['cost'] += pages[stage]
+        order.append({'full_name': repo.full_name, 'pages': sum(pages.values()),
+                      'longest_stage_pages': max(pages.values()) if pages else 0})
+    order.sort(key=lambda entry: (-entry['longest_stage_pages'], -entry['pages'], entry['full_name']))
+
+    pages = sum(entry['pages'] for entry in per_stage.values())
+    cost = pages
+    request_seconds = pages * page_seconds / max(1, workers)
+    longest_repo_seconds = order[0]['longest_stage_pages'] * page_seconds if order else 0.0
+
+    limit = rate_limit.get('limit') or DEFAULT_POINTS_PER_HOUR
+    remaining = rate_limit.get('remaining', limit)
+    rate_limit_seconds = 0.0
+    if cost > remaining:
+        # The points left now, then a full budget per window until the rest is paid for
+        windows = math.ceil((cost - remaining) / limit)
+        until_reset = max(0.0, rate_limit.get('reset', now + RATE_LIMIT_WINDOW) - now)
+        rate_limit_seconds = until_reset + (windows - 1) * RATE_LIMIT_WINDOW
+
+    return {
+        'created': now,
+        'repos': len(order),
+        'stages': per_stage,
+        'pages': pages,
+        'cost': cost,
+        'workers': workers,
+        'page_seconds': round(page_seconds, 4),
+        'rate_limit': {'limit': limit, 'remaining': remaining, 'reset': rate_limit.get('reset')},
+        'request_seconds': round(request_seconds, 1),
+        'longest_repo_seconds': round(longest_repo_seconds, 1),
+        'rate_limit_seconds': round(rate_limit_seconds, 1),
+        'estimated_seconds': round(max(request_seconds, longest_repo_seconds, rate_limit_seconds), 1),
+        'order': order,
+    }
+
+
+def _duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}m"
+
+
+def plan_collection(fetcher, stages, workers=1, page_seconds=None):
+    """
+    Dry run: fetch the connection totals of every repository in batched queries, estimate
+    pages, cost and time of the stages, save the plan to metadata/plan.json and reorder the
+    registry largest first, so the pipeline and job queue start the longest repositories early.
+    """
+    # Stages without a paged GraphQL connection (contributors, branch, clone) are not planned
+    planned = [stage for stage in stages if stage in TOTAL_COUNT_FIELDS]
+    queries = fetcher.fetch_totals(planned)
+    if page_seconds is None:
+        page_seconds = measured_page_seconds(fetcher.metadata_dir, planned) or DEFAULT_PAGE_SECONDS
+    rate_limit = fetcher.metrics.rate_limit.get('graphql') or next(iter(fetcher.metrics.rate_limit.values()), None)
+
+    registry = fetcher.load_registry()
+    plan = estimate_plan(registry, planned, workers, page_seconds, rate_limit)
+    plan['queries'] = queries
+    fetcher.registry = RepoRegistry(registry.get(entry['full_name']) for entry in plan['order'])
+    fetcher.save_registry()
+
+    plan_path = os.path.join(fetcher.metadata_dir, 'plan.json')
+    with open(plan_path, 'w', encoding='utf-8') as file:
+        json.dump(plan, file, indent=1)
+
+    rows = [[stage, entry['items'], entry['pages'], entry['cost']] for stage, entry in plan['stages'].items()]
+    rows.append(['total', sum(entry['items'] for entry in plan['stages'].values()), plan['pages'], plan['cost']])
+    print(tabulate(rows, headers=['Stage', 'Items', 'Pages', 'Cost (points)'], tablefmt='pipe'))
+    print(f"\n{plan['repos']} repositories planned with {queries} totals queries. Estimated time with {workers} "
+          f"workers at {page_seconds:.2f}s per page: {_duration(plan['estimated_seconds'])} "
+          f"(requests {_duration(plan['request_seconds'])}, largest repository {_duration(plan['longest_repo_seconds'])}, "
+          f"rate limit {_duration(plan['rate_limit_seconds'])}; {plan['rate_limit']['remaining']} of "
+          f"{plan['rate_limit']['limit']} points left)")
+    for entry in plan['order'][:5]:
+        print(f"  {entry['full_name']}: {entry['pages']} pages, {entry['longest_stage_pages']} in its largest stage")
+    print(f"\nPlan saved in {plan_path}; the registry now lists the largest repositories first.")
+    return plan
@@ -0,0 +1,124 @@
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+import tracemalloc
+
+from tabulate import tabulate
+
+from app.fetch_github_data import GitHubRepoFetcher
+from app.mock_github import MockGitHubAPI
+from app.pipeline import DEFAULT_STAGES, run_pipeline
+
+BENCHMARK_TERM = 'benchmark'
+
+
+def _serve_mock(config, connection):
+    """ Mock API process: serve until the benchmark sends anything on the connection. """
+    api = MockGitHubAPI(**config)
+    connection.send(api.start())
+    connection.recv()
+    api.stop()
+
+
+def _measure(name, function, fetcher, repos, trace_memory):
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+
+    report = fetcher.metrics.report()
+    stage = report['stages'].get(name, {})
+    endpoints = [entry for entry in report['endpoints'] if entry['stage'] == name]
+    # Search pages carry no repository, so count them from the requests instead
+    pages = stage.get('pages') or sum(entry['requests'] for entry in endpoints)
+    return {
+        'stage': name,
+        'repos': repos,
+        'pages': pages,
+        'rows': stage.get('rows_written', 0),
+        'seconds': round(elapsed, 3),
+        'repos_per_second': round(repos / elapsed, 2) if elapsed else None,
+        'pages_per_second': round(pages / elapsed, 2) if elapsed else None,
+        'peak_memory_mb': round(peak / 2 ** 20, 2) if peak is not None else None,
+    }
+
+
+def run_benchmark(repos=20, size=300, latency=0.0, error_rate=0.0, rate_limit=0, stages=None, workers=1,
+                  trace_memory=True):
+    """
+    Run the repository search and each fetch stage against a local mock GitHub API and
+    report repos/sec, pages/sec and peak traced memory per stage. The mock API runs in its
+    own process so its work does not count against the fetcher. Peak memory comes from
+    tracemalloc, which slows the fetcher down; pass trace_memory=False for throughput only.
+    """
+    config = {'repos': repos, 'size': size, 'latency': latency, 'error_rate': error_rate, 'rate_limit': rate_limit}
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve_mock, args=(config, child), daemon=True)
+    server.start()
+    api_url = parent.recv()
+
+    if trace_memory:
+        tracemalloc.start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            fetcher = GitHubRepoFetcher('benchmark-token', data_dir=data_dir, api_url=api_url)
+            results.append(_measure('repos', lambda: fetcher.fetch_repos([BENCHMARK_TERM], repos), fetcher, repos, trace_memory))
+            for stage in stages or DEFAULT_STAGES:
+                results.append(_measure(stage, lambda: run_pipeline(fetcher, [stage], workers=workers), fetcher, repos, trace_memory))
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        parent.send('stop')
+        server.join()
+
+    rows = [[r['stage'], r['repos'], r['pages'], r['rows'], r['seconds'], r['repos_per_second'],
+             r['pages_per_second'], r['peak_memory_mb']] for r in results]
+    print(tabulate(rows, headers=['Stage', 'Repos', 'Pages', 'Rows', 'Seconds', 'Repos/s', 'Pages/s', 'Peak MB'],
+                   tablefmt='pipe', floatfmt='.2f'))
+    return {'config': dict(config, workers=workers), 'stages': results}
+
+
+def compare_to_baseline(result, baseline, tolerance=0.2):
+    """ Stages whose pages/sec dropped by more than `tolerance` (a fraction) compared to a saved baseline run. """
+    previous = {entry['stage']: entry for entry in baseline['stages']}
+    regressions = []
+    for entry in result['stages']:
+        before = previous.get(entry['stage'])
+        if before and before['pages_per_second'] and entry['pages_per_second'] is not None:
+            if entry['pages_per_second'] < before['pages_per_second'] * (1 - tolerance):
+                regressions.append((entry['stage'], before['pages_per_second'], entry['pages_per_second']))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the fetch stages offline against a synthetic GitHub API.")
+    parser.add_argument('--repos', type=int, default=20, help='Number of synthetic repositories')
+    parser.add_argument('--size', type=int, default=300, help='Approximate items per repository connection')
+    parser.add_argument('--latency', type=float, default=0.0, help='Injected latency per request in seconds')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of requests answered with 502')
+    parser.add_argument('--rate_limit', type=int, default=0, help='Requests allowed per minute before 403s (0 = unlimited)')
+    parser.add_argument('--stages', nargs='+', choices=DEFAULT_STAGES, default=DEFAULT_STAGES, help='Stages to benchmark')
+    parser.add_argument('--workers', type=int, default=1, help='Worker threads of the stage scheduler')
+    parser.add_argument('--no_memory', action='store_true', help='Skip tracemalloc (faster, no peak memory column)')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Save the results as JSON, e.g., as a future baseline')
+    parser.add_argument('--baseline', type=str, default=None, help='Earlier --output file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed pages/sec drop against the baseline')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.repos, args.size, args.latency, args.error_rate, args.rate_limit,
+                           args.stages, args.workers, trace_memory=not args.no_memory)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare_to_baseline(result, json.load(file), args.tolerance)
+        for stage, before, after in regressions:
+            print(f"Regression in '{stage}': {before} -> {after} pages/s")
+        if regressions:
+            raise SystemExit(1)
@@ -3,20 +3,98 @@ from tqdm import tqdm
 import os
 import subprocess
 import csv
-from app.process_metadata import structure_metadata
-from app.text_segments_transformers import generate_summary, extract_topics_from_summaries
+import itertools
+import threading
+import time
+from collections import namedtuple
+from app.instrumentation import FetchMetrics
+from app.response_archive import ResponseArchive, ArchivedResponse, request_cursor
+from app.pagination import AdaptivePageSize, ConnectionSampler
+from app.time_window import TimeWindow
+from app.workflows import WORKFLOWS_SELECTION, WORKFLOW_COLUMNS, workflow_files, parse_workflow
+from app.graphql_paginator import GraphQLPaginator, GraphQLError
+from app.repo_registry import RepoRecord, RepoRegistry
+from app.process_metadata import structure_metadata, flatten_repo, save_metadata, metadata_parquet_path
+
+MAX_RETRIES = 3  # Retries of a request answered with a transient error status
+RETRY_STATUS_CODES = (502, 503, 504)
+DEFAULT_API_URL = 'https://api.github.com'
+REQUEST_TIMEOUT = 60  # Seconds before a request counts as timed out
+
+# CSV column -> GraphQL field selection of the pull request and issue nodes
+PULL_FIELDS = {
+    'pull_number': 'id',
+    'title': 'title',
+    'state': 'state',
+    'created_at': 'createdAt',
+    'updated_at': 'updatedAt',
+    'closed_at': 'closedAt',
+    'merged_at': 'mergedAt',
+    'body': 'body',
+    'user': 'author { login ... on User { name } }',
+    'url': 'url',
+}
+ISSUE_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'state': 'state',
+    'created_at': 'createdAt',
+    'updated_at': 'updatedAt',
+    'closed_at': 'closedAt',
+    'body': 'body',
+    'user': 'author { login }',
+    'url': 'url',
+}
+# Fetch stage -> selection of the totalCount of the connection it pages through
+TOTAL_COUNT_FIELDS = {
+    'stargazers': 'stargazers { totalCount }',
+    'forks': 'forks { totalCount }',
+    'subscribers': 'watchers { totalCount }',
+    'releases': 'releases { totalCount }',
+    'issues': 'issues { totalCount }',
+    'pulls': 'pullRequests { totalCount }',
+    'commits': 'defaultBranchRef { name target { ... on Commit { history { totalCount } } } }',
+}
+TOTALS_BATCH_SIZE = 50  # Repositories per aliased totalCount query
+WORKFLOWS_BATCH_SIZE = 25  # Repositories per aliased workflows query; halved for a batch whose response is too large
+# Stages that can fetch a sample of their connection instead of every page
+SAMPLED_STAGES = ['stargazers', 'forks', 'issues']
+# Columns written by default; only their fields are requested (pull request bodies are not written unless asked for)
+DEFAULT_COLUMNS = {
+    'pulls': ['pull_number', 'title', 'state', 'created_at', 'updated_at', 'closed_at', 'merged_at', 'user', 'url'],
+    'issues': ['id', 'title', 'state', 'created_at', 'updated_at', 'closed_at', 'body', 'user', 'url'],
+}
+
+# Records yielded by the iter_* methods; their fields are the columns of the CSV files written from them
+Commit = namedtuple('Commit', ['commit_sha', 'commit_author_name', 'commit_author_email', 'commit_message', 'commit_date', 'login'])
+PullRequest = namedtuple('PullRequest', list(PULL_FIELDS))
+Stargazer = namedtuple('Stargazer', ['login', 'avatarUrl', 'url', 'starredAt'])
+PAGE_ROWS = 100  # Records written (and counted for the contributor activity) at a time
+
+
+def _pages(records, size=PAGE_ROWS):
+    """ Group a record iterator into lists of up to size records. """
+    records = iter(records)
+    while True:
+        page = list(itertools.islice(records, size))
+        if not page:
+            return
+        yield page
+
 
 class GitHubRepoFetcher:
-    def __init__(self, token):
+    def __init__(self, token, data_dir=None, metadata_file=None, profile=False, api_url=None, archive_dir=None, replay=False,
+                 columns=None, sampling=None, window=None):
         self.token = token
         # self.readme_flag = readme_flag
-        self.base_url = "https://api.github.com/search/repositories"
+        # API root, overridable (GITHUB_API_URL) for GitHub Enterprise or the local mock API of the benchmarks
+        self.api_url = (api_url or os.environ.get('GITHUB_API_URL') or DEFAULT_API_URL).rstrip('/')
+        self.base_url = f"{self.api_url}/search/repositories"
         self.headers = {'Authorization': f'token {self.token}'}
-        self.graphql_url = 'https://api.github.com/graphql'
+        self.graphql_url = f"{self.api_url}/graphql"
         self.urls = set()
-        self.data_dir = os.path.join(os.getcwd(), 'data')
-        self.pr_counts = {}  # Dictionary to store PR count per contributor
-        self.commit_counts = {}  # Dictionary to store commit count per contributor
+        self.registry = None  # RepoRegistry, built once by load_registry()
+        self.data_dir = data_dir or os.path.join(os.getcwd(), 'data')
         self.metadata_dir = os.path.join(self.data_dir, 'metadata')
         self.contributors_dir = os.path.join(self.data_dir, 'contributors')
         self.commits_dir = os.path.join(self.data_dir, 'commits')
@@ -24,17 +102,36 @@ class GitHubRepoFetcher:
         self.pulls_dir = os.path.join(self.data_dir, 'pulls')
         self.releases_dir = os.path.join(self.data_dir, 'releases')
         self.stargazers_dir = os.path.join(self.data_dir, 'stars')
+        self.stars_daily_dir = os.path.join(self.data_dir, 'stars_daily')
         self.forks_dir = os.path.join(self.data_dir, 'forks')
         self.subscribers_dir = os.path.join(self.data_dir, 'subscribers')
+        self.workflows_dir = os.path.join(self.data_dir, 'workflows')
         self.readme_directory = os.path.join(self.data_dir, 'readme')
         self.analysis_directory = os.path.join(self.data_dir, 'analysis')
-
-        if not self.validate_token():
+        self.metadata_file = metadata_file or os.path.join(self.metadata_dir, 'combined_metadata.csv')
+        self.registry_file = os.path.join(self.metadata_dir, 'registry.json')
+        # Commit, pull request and issue counts per (repository, contributor), fed by those stages
+        self.activity_file = os.path.join(self.metadata_dir, 'contributor_activity.npz')
+        self._activity = None  # ContributorActivity, loaded by the first stage that needs it
+        self.metrics = FetchMetrics(profile=profile)  # Per-request and per-stage instrumentation
+        # One lock for the GraphQL budget check of every paginator and thread using this fetcher
+        self.budget_lock = threading.Lock()
+        # Raw response archive: responses are recorded into it, or (replay) served from it without network
+        self.archive = ResponseArchive(archive_dir, 'replay' if replay else 'record') if archive_dir else None
+        self.replay = bool(archive_dir and replay)
+        self.columns = dict(DEFAULT_COLUMNS, **(columns or {}))  # stage -> CSV columns to request and write
+        self.sampling = sampling or {}  # stage -> (max_items, rate) of the sample to fetch from large connections
+        # Creation time window of the commits, releases, issues and pull requests to fetch (open by default)
+        self.window = window or TimeWindow()
+        if self.window and 'issues' in self.sampling:
+            raise ValueError("Issues can be limited to a time window or sampled, not both")
+
+        if not self.replay and not self.validate_token():
             raise ValueError("\nInvalid GitHub token provided.")  # Raise an error to indicate invalid token
 
         # Ensure directories exist
         for dir_path in [self.metadata_dir, self.contributors_dir, self.commits_dir, 
-                         self.issues_dir, self.pulls_dir, self.releases_dir, 
+                         self.issues_dir, self.pulls_dir, self.releases_dir, self.workflows_dir,
                          self.readme_directory, self.analysis_directory]:
             if not os.path.exists(dir_path):
                 os.makedirs(dir_path)
@@ -42,7 +139,7 @@ class GitHubRepoFetcher:
     def validate_token(self):
         """ Check if the provided token is valid by making a request to the /user endpoint. """
         try:
-            response = requests.get('https://api.github.com/user', headers=self.headers)
+            response = self._request('GET', f"{self.api_url}/user", 'validate')
             if response.status_code == 200:
                 print("\nToken is valid.")
                 return True
@@ -56,20 +153,184 @@ class GitHubRepoFetcher:
             print(f"\nError during token validation: {e}")
             return False
 
+    def _endpoint_name(self, url):
+        """ Short metrics label of a request URL, e.g. 'graphql', 'repositories' or 'contributors'. """
+        url = url.split('?', 1)[0]
+        if url == self.graphql_url:
+            return 'graphql'
+        return url.rstrip('/').split('/')[-1]
+
+    def _with_rate_limit(self, query):
+        """ Ask GraphQL for the cost of the query and the remaining budget alongside the data. """
+        # A document starting with a fragment has no operation at its first brace
+        if 'rateLimit' in query or query.lstrip().startswith('fragment'):
+            return query
+        opening = query.index('{')
+        return query[:opening + 1] + ' rateLimit { cost remaining } ' + query[opening + 1:]
+
+    def _wait_for_graphql_budget(self, reserve):
+        """ Hold the caller while the GraphQL budget is below reserve points, until it resets. """
+        with self.budget_lock:
+            limits = self.metrics.rate_limit.get('graphql')
+            if limits and limits['remaining'] < reserve:
+                pause = limits['reset'] - time.time()
+                if pause > 0:
+                    print(f"GraphQL budget down to {limits['remaining']} points, waiting {pause:.0f}s for the reset")
+                    time.sleep(pause + 1)
+
+    def _request(self, method, url, stage, repo=None, retry_transient=True, **kwargs):
+        """
+        Send a request to the GitHub API, recording latency, bytes, status and rate limit for the
+        stage, and retrying transient errors (timeouts, 502/503/504, secondary rate limits) with
+        backoff. With retry_transient=False only secondary rate limits are waited out, and
+        timeouts and 502/503/504 are left to the caller (see _fetch_adaptive_page).
+        With an archive, successful responses are recorded under (repo, stage, cursor), or in
+        replay mode served from it instead of the network.
+        """
+        endpoint = self._endpoint_name(url)
+        if self.archive is not None:
+            key = (repo.full_name if repo else None, stage, request_cursor(kwargs))
+            if self.replay:
+                start = time.perf_counter()
+                response = self.archive.lookup(*key) or ArchivedResponse(404, b'{"message": "Not in the response archive"}', url=url)
+                self.metrics.record_request(stage, endpoint, time.perf_counter() - start, len(response.content),
+                                            response.status_code, None, key[0])
+                return response
+        if endpoint == 'graphql' and 'json' in kwargs:
+            kwargs['json'] = dict(kwargs['json'], query=self._with_rate_limit(kwargs['json']['query']))
+
+        for attempt in range(MAX_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                response = requests.request(method, url, headers=self.headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            except requests.Timeout:
+                # Recorded with status code 0
+                self.metrics.record_request(stage, endpoint, time.perf_counter() - start, 0, 0, None,
+                                            repo.full_name if repo else None)
+                if attempt == MAX_RETRIES or not retry_transient:
+                    raise
+                self.metrics.record_retry(stage, endpoint)
+                time.sleep(2 ** attempt)
+                continue
+            self.metrics.record_request(stage, endpoint, time.perf_counter() - start, len(response.content),
+                                        response.status_code, response.headers, repo.full_name if repo else None)
+
+            secondary_limit = response.status_code == 403 and 'Retry-After' in response.headers
+            transient = retry_transient and response.status_code in RETRY_STATUS_CODES
+            if attempt == MAX_RETRIES or not (transient or secondary_limit):
+                if self.archive is not None and response.status_code == 200:
+                    self.archive.record(*key, response)
+                return response
+            self.metrics.record_retry(stage, endpoint)
+            time.sleep(int(response.headers['Retry-After']) if secondary_limit else 2 ** attempt)
+        return response
+
+    def _json(self, response, stage):
+        """ Decode a response, timing the JSON parsing and taking out the GraphQL rateLimit block. """
+        start = time.perf_counter()
+        data = response.json()
+        cost = None
+        if isinstance(data, dict) and isinstance(data.get('data'), dict) and 'rateLimit' in data['data']:
+            rate_limit = data['data'].pop('rateLimit') or {}
+            cost = rate_limit.get('cost')
+        self.metrics.record_parse(stage, self._endpoint_name(response.url), time.perf_counter() - start, cost)
+        return data
+
+    def _fetch_adaptive_page(self, stage, repo, build_query, page_size, variables=None):
+        """
+        Request one page of a heavy connection, where build_query(first) returns the query for a
+        page size and variables are sent along with it. When GitHub times out (request timeout, 502/504 or a timeout error in the
+        GraphQL response) the page is asked for again with half the page size instead of
+        dropping the rest of the connection; fast pages let it grow back.
+        Returns (response, data), with data None when even the smallest page failed.
+        """
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self._request('POST', self.graphql_url, stage, repo=repo, retry_transient=False,
+                                         json={'query': build_query(page_size.size), 'variables': variables or {}})
+            except requests.Timeout:
+                response = None
+            if response is not None and response.status_code == 200:
+                data = self._json(response, stage)
+                timed_out = any('timeout' in error.get('message', '').lower() for error in data.get('errors', []))
+                if not timed_out:
+                    page_size.succeeded(time.perf_counter() - start)
+                    return response, data
+            elif response is not None and response.status_code not in RETRY_STATUS_CODES:
+                return response, None
+
+            if not page_size.failed():
+                print(f"Giving up on {stage} of {repo.full_name}: pages of {page_size.size} still time out")
+                return response, None
+            self.metrics.record_retry(stage, 'graphql')
+            print(f"Page of {stage} for {repo.full_name} timed out, retrying with first: {page_size.size}")
+
+    def _sampler(self, stage, repo=None):
+        """
+        The sampler of a stage's connection. A sample sized by a rate needs totalCount before the
+        first page, or that page would be fetched whole, so it is asked for in a totalCount-only query.
+        """
+        sampler = ConnectionSampler(*self.sampling.get(stage, (None, None)))
+        if sampler.rate and repo is not None:
+            total = self._connection_total(stage, repo)
+            if total is not None:
+                sampler.start(total)
+        return sampler
+
+    def _connection_total(self, stage, repo):
+        """ totalCount of a stage's connection (TOTAL_COUNT_FIELDS) in one cheap query, or None when it failed. """
+        query = 'query($owner: String!, $name: String!) { repository(owner: $owner, name: $name) { %s } }' % TOTAL_COUNT_FIELDS[stage]
+        # Its own stage name keeps it apart from the first page in the metrics and the response archive
+        response = self._request('POST', self.graphql_url, f'{stage}_total', repo=repo,
+                                 json={'query': query, 'variables': {'owner': repo.owner, 'name': repo.name}})
+        if response.status_code != 200:
+            return None
+        repository = (self._json(response, f'{stage}_total').get('data') or {}).get('repository')
+        if not repository:
+            return None
+        total = repository[TOTAL_COUNT_FIELDS[stage].split(' ', 1)[0]]['totalCount']
+        repo.totals[stage] = total
+        return total
+
+    def _record_sample(self, repo, stage, sampler):
+        """Keep the sampling rate of a sampled connection on the registry record (and drop it once fetched whole)."""
+        if sampler.is_sample:
+            repo.samples[stage] = sampler.summary()
+        else:
+            repo.samples.pop(stage, None)
+
+    def save_run_report(self, prometheus_file=None):
+        """ Write the run report (JSON) to the metadata directory, plus an optional Prometheus textfile and stage profiles. """
+        report_path = self.metrics.save_json(os.path.join(self.metadata_dir, 'run_report.json'))
+        if prometheus_file:
+            self.metrics.write_prometheus(prometheus_file)
+        if self.metrics.profile:
+            self.metrics.save_profiles(os.path.join(self.metadata_dir, 'profiles'))
+        print(f"\nRun report saved in {report_path}")
+        return report_path
+
     def fetch_repos(self, search_terms, max_repos):
-        combined_csv_filename = os.path.join(self.metadata_dir, 'combined_metadata.csv')
+        combined_csv_filename = self.metadata_file
     
         if os.path.isfile(combined_csv_filename):
             # Prompt the user for confirmation to delete the existing file
             confirm = input(f"The file '{combined_csv_filename}' already exists. Do you want to delete it? (y/n): ").strip().lower()
             if confirm == 'y':
                 os.remove(combined_csv_filename)
+                if os.path.isfile(metadata_parquet_path(combined_csv_filename)):
+                    os.remove(metadata_parquet_path(combined_csv_filename))
                 print(f"Deleted the existing file: {combined_csv_filename}")
             else:
                 print(f"Keeping the existing file: {combined_csv_filename}")
 
         # Proceed with fetching repositories
         file_exists = os.path.isfile(combined_csv_filename)
+        if file_exists:
+            self.load_registry()
+        else:
+            self.registry = RepoRegistry()
+        flattened_rows = []
 
         with open(combined_csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
             writer = None
@@ -87,11 +348,11 @@ class GitHubRepoFetcher:
 
                 while fetched_urls < max_repos:
                     params['page'] = page
-                    response = requests.get(self.base_url, headers=self.headers, params=params)
+                    response = self._request('GET', self.base_url, 'repos', params=params)
                     if response.status_code != 200:
                         print(f"Failed to fetch data for '{term}': {response.status_code}")
                         break
-                    data = response.json()
+                    data = self._json(response, 'repos')
 
                     for item in data.get('items', []):
                         if item['html_url'] not in self.urls:
@@ -109,6 +370,9 @@ class GitHubRepoFetcher:
 
                             # Write the repository metadata
                             writer.writerow(item)
+                            flattened_rows.append(flatten_repo(item, query))
+                            self.registry.add(RepoRecord(item['owner']['login'], item['name'],
+                                                         item.get('node_id'), item.get('default_branch')))
                             fetched_urls += 1
                             pbar.update(1)
 
@@ -118,7 +382,10 @@ class GitHubRepoFetcher:
 
                 pbar.close()
 
+        # Typed, flattened copy of the metadata next to the CSV
+        save_metadata(flattened_rows, combined_csv_filename)
         structure_metadata(combined_csv_filename)
+        self.save_registry()
 
     def _save_readme(self, repo_owner, repo_name, readme_content):
             """Helper function to save the fetched README content to a file."""
@@ -133,8 +400,8 @@ class GitHubRepoFetcher:
             if self.readme_flag:
                 readme_variants = ['README.md', 'README.rst', 'README.txt', 'README']
 
-                for url in self.urls:
-                    repo_owner, repo_name = self._parse_github_url(url)
+                for repo in self.load_registry():
+                    repo_owner, repo_name = repo.owner, repo.name
 
                     # Initialize pagination variables for readme
                     has_next_page = True
@@ -145,9 +412,9 @@ class GitHubRepoFetcher:
 
                         # GraphQL query to fetch the README content
                         query = '''
-                        query($owner: String!, $name: String!, $readme_variant: String!) {
+                        query($owner: String!, $name: String!, $expression: String!) {
                             repository(owner: $owner, name: $name) {
-                                object(expression: "main:$readme_variant") {  # Using "main" branch here
+                                object(expression: $expression) {
                                     ... on Blob {
                                         text
                                     }
@@ -159,18 +426,14 @@ class GitHubRepoFetcher:
                         variables = {
                             'owner': repo_owner,
                             'name': repo_name,
-                            'readme_variant': readme_variant
+                            'expression': f'HEAD:{readme_variant}'
                         }
 
                         # Execute the GraphQL request
-                        response = requests.post(
-                            'https://api.github.com/graphql',
-                            json={'query': query, 'variables': variables},
-                            headers=self.headers
-                        )
+                        response = self._request('POST', self.graphql_url, 'readme', repo=repo, json={'query': query, 'variables': variables})
 
                         if response.status_code == 200:
-                            data = response.json()
+                            data = self._json(response, 'readme')
 
                             # Check if 'data' is in the response
                             if 'data' in data and 'repository' in data['data']:
@@ -196,795 +459,979 @@ class GitHubRepoFetcher:
         parts = url.rstrip('/').split('/')
         return parts[-2], parts[-1]
 
+    def load_registry(self):
+        """
+        Return the repository registry, building it once per fetcher. A registry saved by an
+        earlier run is reused unless combined_metadata.csv has changed since it was written.
+        """
+        if self.registry is None:
+            if os.path.isfile(self.registry_file) and (not os.path.isfile(self.metadata_file) or
+                                                       os.path.getmtime(self.registry_file) >= os.path.getmtime(self.metadata_file)):
+                self.registry = RepoRegistry.load(self.registry_file)
+            else:
+                self.registry = RepoRegistry.from_metadata(self.metadata_file)
+                # Keep default branches and totals learned by earlier runs
+                if os.path.isfile(self.registry_file):
+                    for record in RepoRegistry.load(self.registry_file):
+                        if record.full_name in self.registry:
+                            self.registry.add(record)
+                self.save_registry()
+            self.urls.update(record.url for record in self.registry)
+        return self.registry
+
+    @property
+    def activity(self):
+        if self._activity is None:
+            # Imported here: it loads numpy, which stages without contributor activity never need
+            from app.contributor_activity import ContributorActivity
+            self._activity = ContributorActivity.load_or_create(self.activity_file)
+        return self._activity
+
+    @activity.setter
+    def activity(self, activity):
+        self._activity = activity
+
+    def save_registry(self):
+        """Persist the registry (node ids, default branches, connection totals) and the contributor activity for later runs and stages."""
+        if self.registry is not None:
+            self.registry.save(self.registry_file)
+        if self._activity is not None and self._activity.repos:
+            self._activity.save(self.activity_file)
+
     def _save_readme(self, repo_owner, repo_name, content):
         readme_path = os.path.join(self.readme_directory, f'{repo_owner}++{repo_name}_README.md')
         with open(readme_path, 'w', encoding='utf-8') as file:
             file.write(content)
 
     def clone_repositories(self):
-        repos_directory = os.path.join(self.data_dir, 'repos')
-        if not os.path.exists(repos_directory):
-            os.makedirs(repos_directory)
-        for url in self.urls:
-            repo_name = url.split('/')[-1]
-            repo_path = os.path.join(repos_directory, repo_name)
-            if not os.path.exists(repo_path):
-                subprocess.run(['git', 'clone', url, repo_path])
+        for repo in self.load_registry():
+            self._clone_repository(repo)
+
+    def clone_path(self, repo):
+        """ Working tree of a clone: data/repos/owner++repo, so same-named repositories of different owners never share one. """
+        return os.path.join(self.data_dir, 'repos', repo.file_name[:-len('.csv')])
+
+    def _clone_repository(self, repo):
+        """Clone a single repository into data/repos unless it is already there."""
+        repo_path = self.clone_path(repo)
+        os.makedirs(os.path.dirname(repo_path), exist_ok=True)
+        if os.path.exists(repo_path):
+            return
+        # Clones used to be named after the repository alone; move one of this repository instead of cloning again
+        legacy_path = os.path.join(self.data_dir, 'repos', repo.name)
+        if os.path.isdir(legacy_path):
+            origin = subprocess.run(['git', '-C', legacy_path, 'remote', 'get-url', 'origin'], capture_output=True, text=True)
+            if origin.returncode == 0 and origin.stdout.strip().rstrip('/').removesuffix('.git').lower() == repo.url.lower():
+                os.replace(legacy_path, repo_path)
+                return
+        subprocess.run(['git', 'clone', repo.url, repo_path])
+
+    def analyze_clones(self, max_workers=None):
+        """
+        Compute line counts per language, file counts, size, dependency manifests and test
+        ratio of every cloned repository on a process pool (cached by HEAD commit), and save
+        them to analysis/clone_analysis.csv. Returns the DataFrame.
+        """
+        # Imported here: only this stage walks the clones
+        from app.clone_analysis import analyze_clones
+        clones = {repo.full_name: self.clone_path(repo) for repo in self.load_registry()}
+        analysis = analyze_clones(clones, os.path.join(self.analysis_directory, 'clone_analysis_cache.pkl'), max_workers)
+        analysis_path = os.path.join(self.analysis_directory, 'clone_analysis.csv')
+        analysis.to_csv(analysis_path)
+        print(f"\nAnalyzed {len(analysis)} cloned repositories into {analysis_path}")
+        return analysis
 
     def fetch_contributors(self):
         """Fetch contributors for each repository and save to a CSV file named as owner++reponame.csv."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
+        for repo in tqdm(self.load_registry(), desc="Fetching contributors"):
+            self._fetch_contributors_repo(repo)
 
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
+        self.save_registry()
 
-            for row in tqdm(reader, desc="Fetching contributors"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                file_name = f"{repo_owner}++{repo_name}.csv"
-                contributors_filename = os.path.join(self.contributors_dir, file_name)
+    def _fetch_contributors_repo(self, repo):
+        """Fetch the contributors of a single repository."""
+        repo_owner, repo_name = repo.owner, repo.name
+        file_name = f"{repo_owner}++{repo_name}.csv"
+        contributors_filename = os.path.join(self.contributors_dir, file_name)
 
-                contributors_api_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contributors"
-                contributors = []
-                page = 1
+        contributors_api_url = f"{self.api_url}/repos/{repo_owner}/{repo_name}/contributors"
+        contributors = []
+        page = 1
 
-                while True:
-                    response = requests.get(contributors_api_url, headers=self.headers, params={'page': page, 'per_page': 100})
-                    
-                    if response.status_code == 200:
-                        page_contributors = response.json()
+        while True:
+            response = self._request('GET', contributors_api_url, 'contributors', repo=repo, params={'page': page, 'per_page': 100})
+            
+            if response.status_code == 200:
+                page_contributors = self._json(response, 'contributors')
 
-                        if not page_contributors:
-                            break  # No more contributors, exit loop
-                        
-                        contributors.extend(page_contributors)
-                        page += 1  # Move to the next page
-                    else:
-                        print(f"Failed to fetch contributors for {repo_name}: {response.status_code}")
-                        break  # Exit loop on failure
+                if not page_contributors:
+                    break  # No more contributors, exit loop
                 
-                # Open the CSV file to write the contributors' data
-                with open(contributors_filename, 'w', newline='', encoding='utf-8') as contributors_csv:
-                    if contributors:
-                        fieldnames = ['repo_owner', 'repo_name', 'contributor_login', 'contributions'] + list(contributors[0].keys())
-                        writer = csv.DictWriter(contributors_csv, fieldnames=fieldnames)
-                        writer.writeheader()
-
-                        for contributor in contributors:
-                            contributor_data = {
-                                'repo_owner': repo_owner,
-                                'repo_name': repo_name,
-                                'contributor_login': contributor.get('login'),
-                                'contributions': contributor.get('contributions')
-                            }
-                            contributor_data.update(contributor)
-                            writer.writerow(contributor_data)
-                    else:
-                        print(f"No contributors found for {repo_name}")
+                contributors.extend(page_contributors)
+                page += 1  # Move to the next page
+            else:
+                print(f"Failed to fetch contributors for {repo_name}: {response.status_code}")
+                break  # Exit loop on failure
+        
+        # Open the CSV file to write the contributors' data
+        with open(contributors_filename, 'w', newline='', encoding='utf-8') as contributors_csv:
+            if contributors:
+                fieldnames = ['repo_owner', 'repo_name', 'contributor_login', 'contributions'] + list(contributors[0].keys())
+                writer = csv.DictWriter(contributors_csv, fieldnames=fieldnames)
+                writer.writeheader()
+
+                for contributor in contributors:
+                    contributor_data = {
+                        'repo_owner': repo_owner,
+                        'repo_name': repo_name,
+                        'contributor_login': contributor.get('login'),
+                        'contributions': contributor.get('contributions')
+                    }
+                    contributor_data.update(contributor)
+                    writer.writerow(contributor_data)
+                self.metrics.record_rows('contributors', len(contributors))
+            else:
+                print(f"No contributors found for {repo_name}")
+        repo.totals['contributors'] = len(contributors)
 
     def fetch_commits(self):
         """Fetch commits for each repository and save to a CSV file."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
+        for repo in tqdm(self.load_registry(), desc="Fetching commits"):
+            self._fetch_commits_repo(repo)
 
-        # Track already processed repositories
-        processed_repos = {
-            os.path.splitext(filename)[0].replace('++', '/')
-            for filename in os.listdir(self.commits_dir) if filename.endswith('.csv')
-        }
-
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
+        self.save_registry()
 
-            for row in tqdm(reader, desc="Fetching commits"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                repo_key = f"{repo_owner}/{repo_name}"
+    def resolve_default_branch(self, repo):
+        """Return the default branch of a repository, querying it only when the registry does not know it yet."""
+        if repo.default_branch:
+            return repo.default_branch
 
-                # Skip already processed repositories
-                if repo_key in processed_repos:
-                    print(f"Skipping already processed repository: {repo_key}")
-                    continue
-
-                file_name = f"{repo_owner}++{repo_name}.csv"
-                commits_filename = os.path.join(self.commits_dir, file_name)
-                self.commit_counts[f"{repo_owner}-{repo_name}"] = {}
-
-                # Initialize pagination variables
-                has_next_page = True
-                end_cursor = None
-
-                # Fetch the default branch of the repository
-                default_branch_query = """
-                query($owner: String!, $name: String!) {
-                    repository(owner: $owner, name: $name) {
-                        defaultBranchRef {
-                            name
-                        }
-                    }
+        default_branch_query = """
+        query($owner: String!, $name: String!) {
+            repository(owner: $owner, name: $name) {
+                defaultBranchRef {
+                    name
                 }
-                """
-                variables = {'owner': repo_owner, 'name': repo_name}
-                response = requests.post(
-                    'https://api.github.com/graphql',
-                    json={'query': default_branch_query, 'variables': variables},
-                    headers=self.headers
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    if ('data' in data and 'repository' in data['data'] and
-                            data['data']['repository'] and data['data']['repository']['defaultBranchRef']):
-                        default_branch = data['data']['repository']['defaultBranchRef']['name']
+            }
+        }
+        """
+        variables = {'owner': repo.owner, 'name': repo.name}
+        response = self._request('POST', self.graphql_url, 'branch', repo=repo,
+                                 json={'query': default_branch_query, 'variables': variables})
+
+        if response.status_code == 200:
+            data = self._json(response, 'branch')
+            if ('data' in data and 'repository' in data['data'] and
+                    data['data']['repository'] and data['data']['repository']['defaultBranchRef']):
+                repo.default_branch = data['data']['repository']['defaultBranchRef']['name']
+            else:
+                print(f"No default branch found for {repo.full_name}.")
+        else:
+            print(f"Failed to fetch default branch for {repo.full_name}. Status code: {response.status_code}")
+        return repo.default_branch
+
+    def fetch_totals(self, stages=None, batch_size=TOTALS_BATCH_SIZE):
+        """
+        Fill repo.totals with the totalCount of the connection of every stage (and the default
+        branch on the way), asking for batch_size repositories per query through aliases
+        (r0: repository(...), r1: ...) instead of one request per repository and connection.
+        Returns the number of queries sent.
+        """
+        stages = [stage for stage in (stages or TOTAL_COUNT_FIELDS) if stage in TOTAL_COUNT_FIELDS]
+        selection = ' '.join(TOTAL_COUNT_FIELDS[stage] for stage in stages)
+        repos = list(self.load_registry())
+        queries = 0
+        for start in tqdm(range(0, len(repos), batch_size), desc="Fetching connection totals", unit="batch"):
+            batch = repos[start:start + batch_size]
+            # Owners and names go in as variables, so no quoting of the query is needed
+            declarations = ', '.join(f'$owner{i}: String!, $name{i}: String!' for i in range(len(batch)))
+            aliases = ' '.join(f'r{i}: repository(owner: $owner{i}, name: $name{i}) {{ {selection} }}' for i in range(len(batch)))
+            variables = {}
+            for i, repo in enumerate(batch):
+                variables[f'owner{i}'], variables[f'name{i}'] = repo.owner, repo.name
+            # Keyed by the first repository of the batch in the response archive
+            response = self._request('POST', self.graphql_url, 'plan', repo=batch[0],
+                                     json={'query': f'query({declarations}) {{ {aliases} }}', 'variables': variables})
+            queries += 1
+            if response.status_code != 200:
+                print(f"Totals query failed for {len(batch)} repositories starting at {batch[0].full_name}: {response.status_code}")
+                continue
+            data = self._json(response, 'plan').get('data') or {}
+            for i, repo in enumerate(batch):
+                repository = data.get(f'r{i}')
+                if repository is None:
+                    print(f"No totals for {repo.full_name}; it may have been renamed or deleted.")
+                    continue
+                for stage in stages:
+                    if stage == 'commits':
+                        branch = repository.get('defaultBranchRef') or {}
+                        repo.default_branch = branch.get('name') or repo.default_branch
+                        history = (branch.get('target') or {}).get('history')
+                        repo.totals['commits'] = history['totalCount'] if history else 0
                     else:
-                        print(f"No default branch found for {repo_key}. Skipping...")
-                        continue
+                        field = TOTAL_COUNT_FIELDS[stage].split(' ', 1)[0]
+                        repo.totals[stage] = repository[field]['totalCount']
+        self.save_registry()
+        return queries
+
+    def fetch_workflows(self, batch_size=WORKFLOWS_BATCH_SIZE):
+        """
+        Fetch the .github/workflows directory (file names and YAML texts) of batch_size
+        repositories per query through aliased object(expression: "HEAD:.github/workflows")
+        trees, instead of one request per file. The files are saved under
+        workflows/owner++repo/ and summarized (triggers, jobs, actions used) in
+        workflows/owner++repo.csv. Repositories with a summary are skipped. Returns the
+        number of queries sent.
+        """
+        repos = [repo for repo in self.load_registry()
+                 if not os.path.isfile(os.path.join(self.workflows_dir, repo.file_name))]
+        batches = [repos[start:start + batch_size] for start in range(0, len(repos), batch_size)]
+        queries = 0
+        pbar = tqdm(total=len(repos), desc="Fetching workflows", unit="repo")
+        while batches:
+            batch = batches.pop(0)
+            declarations = ', '.join(f'$owner{i}: String!, $name{i}: String!' for i in range(len(batch)))
+            aliases = ' '.join(f'r{i}: repository(owner: $owner{i}, name: $name{i}) {{ {WORKFLOWS_SELECTION} }}'
+                               for i in range(len(batch)))
+            variables = {}
+            for i, repo in enumerate(batch):
+                variables[f'owner{i}'], variables[f'name{i}'] = repo.owner, repo.name
+            # Keyed by the first repository of the batch in the response archive
+            response = self._request('POST', self.graphql_url, 'workflows', repo=batch[0],
+                                     json={'query': f'query({declarations}) {{ {aliases} }}', 'variables': variables})
+            queries += 1
+            if response.status_code in RETRY_STATUS_CODES and len(batch) > 1:
+                # Too many workflow files for one response: ask for each half separately
+                middle = len(batch) // 2
+                batches[:0] = [batch[:middle], batch[middle:]]
+                continue
+            if response.status_code != 200:
+                print(f"Workflows query failed for {len(batch)} repositories starting at {batch[0].full_name}: {response.status_code}")
+                pbar.update(len(batch))
+                continue
+            data = self._json(response, 'workflows').get('data') or {}
+            for i, repo in enumerate(batch):
+                if f'r{i}' not in data or data[f'r{i}'] is None:
+                    print(f"No workflows for {repo.full_name}; it may have been renamed or deleted.")
                 else:
-                    print(f"Failed to fetch default branch for {repo_key}. Status code: {response.status_code}")
-                    continue
-
-                # GraphQL query to fetch commits
-                commits_query = """
-                query($owner: String!, $name: String!, $cursor: String, $branch: String!) {
-                    repository(owner: $owner, name: $name) {
-                        object(expression: $branch) {
-                            ... on Commit {
-                                history(first: 100, after: $cursor) {
-                                    edges {
-                                        node {
-                                            oid
-                                            author {
-                                                name
-                                                email
-                                                user {
-                                                    login
-                                                }
-                                            }
-                                            committedDate
-                                            message
+                    self._save_workflows(repo, workflow_files(data[f'r{i}'].get('object')))
+                pbar.update(1)
+        pbar.close()
+        return queries
+
+    def _save_workflows(self, repo, files):
+        """ Save the workflow files of a repository and write their summary (header only without workflows). """
+        files_dir = os.path.join(self.workflows_dir, repo.file_name[:-len('.csv')])
+        rows = []
+        for file_name, text in files:
+            if text is not None:
+                os.makedirs(files_dir, exist_ok=True)
+                with open(os.path.join(files_dir, file_name), 'w', encoding='utf-8') as file:
+                    file.write(text)
+            rows.append(parse_workflow(file_name, text))
+        with open(os.path.join(self.workflows_dir, repo.file_name), 'w', newline='', encoding='utf-8') as summary_csv:
+            writer = csv.DictWriter(summary_csv, fieldnames=WORKFLOW_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        self.metrics.record_rows('workflows', len(rows))
+
+    def iter_commits(self, repo):
+        """
+        Yield the commits of a repository's default branch (within the time window) as Commit
+        records, requesting one page of 100 at a time as the caller consumes them.
+        """
+        repo_key = repo.full_name
+        default_branch = self.resolve_default_branch(repo)
+        if not default_branch:
+            print(f"Skipping {repo_key} without a default branch...")
+            return
+
+        # GraphQL query to fetch commits
+        commits_query = """
+        query($owner: String!, $name: String!, $cursor: String, $branch: String!, $since: GitTimestamp, $until: GitTimestamp) {
+            repository(owner: $owner, name: $name) {
+                object(expression: $branch) {
+                    ... on Commit {
+                        history(first: 100, after: $cursor, since: $since, until: $until) {
+                            edges {
+                                node {
+                                    oid
+                                    author {
+                                        name
+                                        email
+                                        user {
+                                            login
                                         }
                                     }
-                                    pageInfo {
-                                        hasNextPage
-                                        endCursor
-                                    }
+                                    committedDate
+                                    message
                                 }
                             }
+                            totalCount
+                            pageInfo {
+                                hasNextPage
+                                endCursor
+                            }
                         }
                     }
                 }
-                """
-
-                # Loop through pages of commits until all commits are fetched
-                while has_next_page:
-                    variables = {'owner': repo_owner, 'name': repo_name, 'cursor': end_cursor, 'branch': default_branch}
-                    response = requests.post(
-                        'https://api.github.com/graphql',
-                        json={'query': commits_query, 'variables': variables},
-                        headers=self.headers
-                    )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        if 'data' in data and 'repository' in data['data']:
-                            repository_object = data['data']['repository']['object']
-                            if repository_object and 'history' in repository_object:
-                                commits = repository_object['history']['edges']
-                                page_info = repository_object['history']['pageInfo']
-
-                                # Save commits to CSV file
-                                with open(commits_filename, 'a', newline='', encoding='utf-8') as commits_csv:
-                                    fieldnames = ['commit_sha', 'commit_author_name', 'commit_author_email',
-                                                'commit_message', 'commit_date', 'login']
-                                    writer = csv.DictWriter(commits_csv, fieldnames=fieldnames)
-
-                                    if commits_csv.tell() == 0:  # Write header only if it's the first write
-                                        writer.writeheader()
-
-                                    for commit in commits:
-                                        commit_data = {
-                                            'commit_sha': commit['node']['oid'],
-                                            'commit_author_name': commit['node']['author']['name'],
-                                            'commit_author_email': commit['node']['author']['email'],
-                                            'commit_message': commit['node']['message'],
-                                            'commit_date': commit['node']['committedDate'],
-                                            'login': commit['node']['author']['user']['login']
-                                            if commit['node']['author']['user'] else 'N/A'
-                                        }
-                                        writer.writerow(commit_data)
+            }
+        }
+        """
+
+        # Initialize pagination variables
+        has_next_page = True
+        end_cursor = None
+
+        # Loop through pages of commits until all commits are fetched
+        while has_next_page:
+            variables = {'owner': repo.owner, 'name': repo.name, 'cursor': end_cursor, 'branch': default_branch,
+                         'since': self.window.since, 'until': self.window.until}
+            response = self._request('POST', self.graphql_url, 'commits', repo=repo, json={'query': commits_query, 'variables': variables})
+
+            if response.status_code != 200:
+                print(f"Failed to fetch commits for {repo_key}. Status code: {response.status_code}")
+                return
+            data = self._json(response, 'commits')
+            if 'data' not in data or 'repository' not in data['data']:
+                print(f"Error: No commit data found for {repo_key}")
+                return
+            repository_object = data['data']['repository']['object']
+            if not repository_object or 'history' not in repository_object:
+                print(f"No commit history found for {repo_key}")
+                return
+
+            history = repository_object['history']
+            if not self.window:  # A windowed totalCount only counts the window
+                repo.totals['commits'] = history['totalCount']
+            for commit in history['edges']:
+                node = commit['node']
+                yield Commit(node['oid'], node['author']['name'], node['author']['email'], node['message'],
+                             node['committedDate'], node['author']['user']['login'] if node['author']['user'] else None)
+
+            # Handle pagination
+            has_next_page = history['pageInfo']['hasNextPage']
+            end_cursor = history['pageInfo']['endCursor']
+
+    def _fetch_commits_repo(self, repo):
+        """Fetch the commits of a single repository into its CSV file."""
+        commits_filename = os.path.join(self.commits_dir, repo.file_name)
+
+        # Skip already processed repositories
+        if os.path.isfile(commits_filename):
+            print(f"Skipping already processed repository: {repo.full_name}")
+            return
+
+        # The file is only created once the first page arrived, so a repository that failed early is retried next run
+        pages = _pages(self.iter_commits(repo))
+        first_page = next(pages, None)
+        if first_page is None:
+            return
+        self.activity.begin(repo.full_name, 'commits')
+        with open(commits_filename, 'w', newline='', encoding='utf-8') as commits_csv:
+            writer = csv.DictWriter(commits_csv, fieldnames=Commit._fields)
+            writer.writeheader()
+            for commits in itertools.chain([first_page], pages):
+                writer.writerows(dict(commit._asdict(), login=commit.login or 'N/A') for commit in commits)
+                self.metrics.record_rows('commits', len(commits))
+                self.activity.add(repo.full_name, 'commits', [commit.login for commit in commits])
 
-                                # Handle pagination
-                                has_next_page = page_info['hasNextPage']
-                                end_cursor = page_info['endCursor']
-                            else:
-                                print(f"No commit history found for {repo_key}")
-                                break
-                        else:
-                            print(f"Error: No commit data found for {repo_key}")
-                            break
-                    else:
-                        print(f"Failed to fetch commits for {repo_key}. Status code: {response.status_code}")
-                        break
 
 
     def fetch_releases(self):
         """Fetch detailed information about releases using GitHub GraphQL API."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
-
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
-
-            for row in tqdm(reader, desc="Fetching releases"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                releases_filename = os.path.join(self.releases_dir, f"{repo_owner}++{repo_name}.csv")
-
-                # Initialize pagination
-                has_next_page = True
-                end_cursor = None
-
-                with open(releases_filename, 'w', newline='', encoding='utf-8') as releases_csv:
-                    release_writer = None
-
-                    while has_next_page:
-                        # GraphQL query to fetch releases
-                        query = '''
-                        {
-                            repository(owner: "%s", name: "%s") {
-                                releases(first: 100, after: "%s") {
-                                    edges {
-                                        node {
-                                            id
-                                            tagName   
-                                            name
-                                            createdAt
-                                            publishedAt
-                                            author {
-                                                login 
-                                                name
-                                            }
-                                        }
-                                    }
-                                    pageInfo {
-                                        hasNextPage
-                                        endCursor
-                                    }
-                                }
+        for repo in tqdm(self.load_registry(), desc="Fetching releases"):
+            self._fetch_releases_repo(repo)
+
+        self.save_registry()
+
+    def _fetch_releases_repo(self, repo):
+        """Fetch the releases of a single repository."""
+        releases_filename = os.path.join(self.releases_dir, repo.file_name)
+
+        # GraphQL query to fetch releases, newest first when limited to a time window
+        query = '''
+        query($owner: String!, $name: String!, $cursor: String) {
+            repository(owner: $owner, name: $name) {
+                releases(first: 100, after: $cursor%s) {
+                    edges {
+                        node {
+                            id
+                            tagName
+                            name
+                            createdAt
+                            publishedAt
+                            author {
+                                login
+                                name
                             }
                         }
-                        ''' % (repo_owner, repo_name, end_cursor if end_cursor else "")
-
-
-                        # Make the request
-                        response = requests.post(self.graphql_url, headers=self.headers, json={'query': query})
-
-                        if response.status_code == 200:
-                            data = response.json()
-
-                            # Handle errors in the response
-                            if 'errors' in data:
-                                print(f"GraphQL query failed with errors: {data['errors']}")
-                                break
-
-                            # Fetch release edges
-                            if 'data' in data:
-                                release_edges = data['data']['repository']['releases']['edges']
-                                page_info = data['data']['repository']['releases']['pageInfo']
-
-                                if not release_writer:
-                                    fieldnames = ['id', 'tag_name', 'name', 'created_at', 'published_at',  'author_login', 'author_name']
-                                    release_writer = csv.DictWriter(releases_csv, fieldnames=fieldnames)
-                                    release_writer.writeheader()
-
-                                # Write releases to CSV
-                                for release in release_edges:
-                                    release_data = release['node']
-                                    # Check if author data exists, if not, set default values
-                                    author_login = release_data['author']['login'] if release_data['author'] else 'N/A'
-                                    author_name = release_data['author']['name'] if release_data['author'] else 'N/A'
-
-                                    release_data = {
-                                        'id': release['node']['id'],
-                                        'tag_name': release['node']['tagName'],
-                                        'name': release['node']['name'],
-                                        'created_at': release['node']['createdAt'],
-                                        'published_at': release['node']['publishedAt'],
-                                        'author_login': author_login,
-                                        'author_name': author_name
-                                    }
-                                    release_writer.writerow(release_data)
+                    }
+                    totalCount
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+                }
+            }
+        }
+        ''' % self.window.order_arguments()
+
+        def record_total(connection):
+            repo.totals['releases'] = connection['totalCount']
+
+        releases = GraphQLPaginator(self, 'releases').paginate(query, {'owner': repo.owner, 'name': repo.name},
+                                                               'repository.releases', repo=repo, on_page=record_total)
+        with open(releases_filename, 'w', newline='', encoding='utf-8') as releases_csv:
+            fieldnames = ['id', 'tag_name', 'name', 'created_at', 'published_at', 'author_login', 'author_name']
+            release_writer = csv.DictWriter(releases_csv, fieldnames=fieldnames)
+            release_writer.writeheader()
+            rows = []
+            try:
+                for release in releases:
+                    # Windowed releases come newest first: stop at the first one older than the window
+                    if self.window.passed(release['createdAt']):
+                        break
+                    if not self.window.contains(release['createdAt']):
+                        continue
+                    # Check if author data exists, if not, set default values
+                    rows.append({
+                        'id': release['id'],
+                        'tag_name': release['tagName'],
+                        'name': release['name'],
+                        'created_at': release['createdAt'],
+                        'published_at': release['publishedAt'],
+                        'author_login': release['author']['login'] if release['author'] else 'N/A',
+                        'author_name': release['author']['name'] if release['author'] else 'N/A'
+                    })
+                    if len(rows) == PAGE_ROWS:
+                        release_writer.writerows(rows)
+                        self.metrics.record_rows('releases', len(rows))
+                        rows = []
+            except GraphQLError as error:
+                print(f"{error} ({repo.full_name})")
+            release_writer.writerows(rows)
+            self.metrics.record_rows('releases', len(rows))
 
-                                # Handle pagination
-                                has_next_page = page_info['hasNextPage']
-                                end_cursor = page_info['endCursor']
-                            else:
-                                print(f"Unexpected response structure: {data}")
-                                break
-                        else:
-                            print(f"GraphQL request failed for {repo_name} with status code {response.status_code}")
-                            break
 
 
     def fetch_pulls(self):
         """Fetch detailed information about pull requests using GitHub GraphQL API."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
-        
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
-
-            for row in tqdm(reader, desc="Fetching pull requests"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                pulls_filename = os.path.join(self.pulls_dir, f"{repo_owner}++{repo_name}.csv")
-                self.pr_counts[f"{repo_owner}-{repo_name}"] = {}  # Dictionary to store commit count per contributor
-
-                # Initialize pagination
-                has_next_page = True
-                end_cursor = None
-
-                with open(pulls_filename, 'w', newline='', encoding='utf-8') as pulls_csv:
-                    pull_writer = None
-
-                    while has_next_page:
-                        # GraphQL query to fetch pull requests
-                        query = '''
-                        {
-                            repository(owner: "%s", name: "%s") {
-                                pullRequests(first: 100, after: "%s") {
-                                    edges {
-                                        node {
-                                            id
-                                            title
-                                            state
-                                            createdAt
-                                            updatedAt
-                                            closedAt
-                                            mergedAt
-                                            body
-                                            url
-                                            author {
-                                                login
-                                                ... on User {
-                                                    name
-                                                }
-                                            }
-                                        }
-                                    }
-                                    pageInfo {
-                                        hasNextPage
-                                        endCursor
-                                    }
-                                }
+        for repo in tqdm(self.load_registry(), desc="Fetching pull requests"):
+            self._fetch_pulls_repo(repo)
+
+        self.save_registry()
+
+    def iter_pulls(self, repo, columns=None):
+        """
+        Yield the pull requests of a repository (within the time window) as PullRequest records,
+        one adaptive page at a time as the caller consumes them. Only the fields of `columns`
+        (default: the configured pull request columns) are requested; the others are None.
+        """
+        columns = columns or self.columns['pulls']
+        # The author is always needed for the contributor activity, and the creation time for the time window
+        selection = ' '.join(dict.fromkeys([PULL_FIELDS[column] for column in columns] + [PULL_FIELDS['user'], PULL_FIELDS['created_at']]))
+        page_size = AdaptivePageSize()
+
+        # Initialize pagination
+        has_next_page = True
+        end_cursor = None
+
+        def build_query(first):
+            # GraphQL query to fetch pull requests
+            return '''
+            query($owner: String!, $name: String!) {
+                repository(owner: $owner, name: $name) {
+                    pullRequests(first: %d, after: "%s"%s) {
+                        edges {
+                            node {
+                                %s
                             }
                         }
-                        ''' % (repo_owner, repo_name, end_cursor if end_cursor else "")
+                        totalCount
+                        pageInfo {
+                            hasNextPage
+                            endCursor
+                        }
+                    }
+                }
+            }
+            ''' % (first, end_cursor if end_cursor else "", self.window.order_arguments(), selection)
+
+        while has_next_page:
+            response, data = self._fetch_adaptive_page('pulls', repo, build_query, page_size,
+                                                      {'owner': repo.owner, 'name': repo.name})
+            if data is None:
+                print(f"GraphQL request failed for {repo.name} with status code {response.status_code if response is not None else 'timeout'}")
+                return
+            # Handle errors
+            if 'errors' in data:
+                print(f"GraphQL query failed with errors: {data['errors']}")
+                return
+            if 'data' not in data:
+                print(f"Unexpected response structure: {data}")
+                return
+
+            connection = data['data']['repository']['pullRequests']
+            repo.totals['pulls'] = connection['totalCount']
+            passed = False
+            for pull in connection['edges']:
+                node = pull['node']
+                # Windowed pages come newest first: stop at the first pull request older than the window
+                if self.window.passed(node['createdAt']):
+                    passed = True
+                    continue
+                if not self.window.contains(node['createdAt']):
+                    continue
+                yield PullRequest(node.get('id'), node.get('title'), node.get('state'), node.get('createdAt'),
+                                  node.get('updatedAt'), node.get('closedAt'), node.get('mergedAt'), node.get('body'),
+                                  node['author']['login'] if node['author'] else None, node.get('url'))
 
-                        # Make the request
-                        response = requests.post(self.graphql_url, headers=self.headers, json={'query': query})
+            # Handle pagination
+            has_next_page = connection['pageInfo']['hasNextPage'] and not passed
+            end_cursor = connection['pageInfo']['endCursor']
 
-                        if response.status_code == 200:
-                            data = response.json()
-
-                            # Handle errors
-                            if 'errors' in data:
-                                print(f"GraphQL query failed with errors: {data['errors']}")
-                                break
-
-                            # Fetch pull request edges
-                            if 'data' in data:
-                                pull_edges = data['data']['repository']['pullRequests']['edges']
-                                page_info = data['data']['repository']['pullRequests']['pageInfo']
-
-                                # Update PR counts for contributors
-                                for pull in pull_edges:
-                                    pr_author_login = pull['node']['author']['login'] if pull['node']['author'] else 'N/A'
-                                    pr_author_name = pull['node']['author'].get('name', 'N/A') if pull['node']['author'] else 'N/A'
-                                    if pr_author_login:
-                                        self.pr_counts[f"{repo_owner}-{repo_name}"].setdefault(pr_author_login, 0)
-                                        self.pr_counts[f"{repo_owner}-{repo_name}"][pr_author_login] += 1
-                                    else:
-                                        self.pr_counts[f"{repo_owner}-{repo_name}"].setdefault(pr_author_name, 0)
-                                        self.pr_counts[f"{repo_owner}-{repo_name}"][pr_author_name] += 1
-
-                                if not pull_writer:
-                                    fieldnames = ['pull_number', 'title', 'state', 'created_at', 'updated_at', 
-                                                'closed_at', 'merged_at', 'user', 'url']
-                                    pull_writer = csv.DictWriter(pulls_csv, fieldnames=fieldnames)
-                                    pull_writer.writeheader()
-
-                                # Write pull requests to CSV
-                                for pull in pull_edges:
-                                    pull_data = {
-                                        'pull_number': pull['node']['id'],
-                                        'title': pull['node']['title'],
-                                        'state': pull['node']['state'],
-                                        'created_at': pull['node']['createdAt'],
-                                        'updated_at': pull['node']['updatedAt'],
-                                        'closed_at': pull['node']['closedAt'],
-                                        'merged_at': pull['node']['mergedAt'],
-                                        'user': pull['node']['author']['login'] if pull['node']['author'] else 'N/A',
-                                        'url': pull['node']['url']
-                                    }
-                                    pull_writer.writerow(pull_data)
+    def _fetch_pulls_repo(self, repo):
+        """Fetch the pull requests of a single repository into its CSV file."""
+        pulls_filename = os.path.join(self.pulls_dir, repo.file_name)
+        columns = self.columns['pulls']
+        self.activity.begin(repo.full_name, 'pulls')
 
-                                # Handle pagination
-                                has_next_page = page_info['hasNextPage']
-                                end_cursor = page_info['endCursor']
-                            else:
-                                print(f"Unexpected response structure: {data}")
-                                break
-                        else:
-                            print(f"GraphQL request failed for {repo_name} with status code {response.status_code}")
-                            break
+        with open(pulls_filename, 'w', newline='', encoding='utf-8') as pulls_csv:
+            pull_writer = csv.DictWriter(pulls_csv, fieldnames=columns, extrasaction='ignore')
+            pull_writer.writeheader()
+            for pulls in _pages(self.iter_pulls(repo, columns)):
+                # Deleted accounts have no author
+                pull_writer.writerows(dict(pull._asdict(), user=pull.user or 'N/A') for pull in pulls)
+                self.metrics.record_rows('pulls', len(pulls))
+                self.activity.add(repo.full_name, 'pulls', [pull.user for pull in pulls])
 
 
 
     def fetch_issues(self):
         """Fetch detailed information about issues using GitHub GraphQL API."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
-
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
+        for repo in tqdm(self.load_registry(), desc="Fetching issues"):
+            self._fetch_issues_repo(repo)
+
+        self.save_registry()
+
+    def _fetch_issues_repo(self, repo):
+        """Fetch the issues of a single repository."""
+        repo_owner, repo_name = repo.owner, repo.name
+        issues_filename = os.path.join(self.issues_dir, f"{repo_owner}++{repo_name}.csv")
+        columns = self.columns['issues']
+        # Only the fields of the configured columns are requested; the author is always needed for the contributor
+        # activity, and the creation time for the time window
+        selection = ' '.join(dict.fromkeys([ISSUE_FIELDS[column] for column in columns] + [ISSUE_FIELDS['user'], ISSUE_FIELDS['created_at']]))
+        page_size = AdaptivePageSize()
+        sampler = self._sampler('issues', repo)
+        self.activity.begin(repo.full_name, 'issues')
+
+        # Initialize pagination
+        has_next_page = True
+
+        def build_query(first):
+            # GraphQL query to fetch issues
+            return '''
+            query($owner: String!, $name: String!) {
+                repository(owner: $owner, name: $name) {
+                    issues(%s%s) {
+                        edges {
+                            node {
+                                %s
+                            }
+                        }
+                        totalCount
+                        pageInfo {
+                            hasNextPage
+                            endCursor
+                            hasPreviousPage
+                            startCursor
+                        }
+                    }
+                }
+            }
+            ''' % (sampler.arguments(first), self.window.order_arguments(filter_since=True), selection)
 
-            for row in tqdm(reader, desc="Fetching issues"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                issues_filename = os.path.join(self.issues_dir, f"{repo_owner}++{repo_name}.csv")
+        with open(issues_filename, 'w', newline='', encoding='utf-8') as issues_csv:
+            issue_writer = None
 
-                # Initialize pagination
-                has_next_page = True
-                end_cursor = None
+            while has_next_page:
+                response, data = self._fetch_adaptive_page('issues', repo, build_query, page_size,
+                                                          {'owner': repo_owner, 'name': repo_name})
 
-                with open(issues_filename, 'w', newline='', encoding='utf-8') as issues_csv:
-                    issue_writer = None
+                if data is not None:
+                    # Handle errors
+                    if 'errors' in data:
+                        print(f"GraphQL query failed with errors: {data['errors']}")
+                        break
 
-                    while has_next_page:
-                        # GraphQL query to fetch issues
-                        query = '''
-                        {
-                            repository(owner: "%s", name: "%s") {
-                                issues(first: 100, after: "%s") {
-                                    edges {
-                                        node {
-                                            id
-                                            title
-                                            state
-                                            createdAt
-                                            updatedAt
-                                            closedAt
-                                            body
-                                            url
-                                            author {
-                                            login 
-                                        }
-                                        }
-                                    }
-                                    pageInfo {
-                                        hasNextPage
-                                        endCursor
-                                    }
-                                }
+                    # Fetch issue edges
+                    if 'data' in data:
+                        issue_edges = data['data']['repository']['issues']['edges']
+                        if not self.window:  # filterBy makes totalCount count only the recently updated issues
+                            repo.totals['issues'] = data['data']['repository']['issues']['totalCount']
+                        # Windowed pages come newest first: stop at the first issue created before the window
+                        passed = any(self.window.passed(issue['node']['createdAt']) for issue in issue_edges)
+                        issue_edges = [issue for issue in issue_edges if self.window.contains(issue['node']['createdAt'])]
+
+                        if not issue_writer:
+                            issue_writer = csv.DictWriter(issues_csv, fieldnames=columns, extrasaction='ignore')
+                            issue_writer.writeheader()
+
+                        self.activity.add(repo.full_name, 'issues',
+                                          [issue['node']['author']['login'] if issue['node'].get('author') else None for issue in issue_edges])
+
+                        # Write issues to CSV
+                        for issue in issue_edges:
+                            node = issue['node']
+                            # Check if author data exists, if not, set default values
+                            author_login = node['author']['login'] if node.get('author') else 'N/A'
+                            #author_name = issue_data['author']['name'] if issue_data['author'] else 'N/A'
+
+                            issue_data = {
+                                'id': node.get('id'),
+                                'title': node.get('title'),
+                                'state': node.get('state'),
+                                'created_at': node.get('createdAt'),
+                                'updated_at': node.get('updatedAt'),
+                                'closed_at': node.get('closedAt'),
+                                'body': node.get('body'),
+                                'user': author_login,
+                                #'name':author_name,
+                                'url': node.get('url')
                             }
-                        }
-                        ''' % (repo_owner, repo_name, end_cursor if end_cursor else "")
+                            issue_writer.writerow(issue_data)
+                        self.metrics.record_rows('issues', len(issue_edges))
 
-                        # Make the request
-                        response = requests.post(self.graphql_url, headers=self.headers, json={'query': query})
+                        # Handle pagination
+                        has_next_page = sampler.advance(data['data']['repository']['issues']) and not passed
+                    else:
+                        print(f"Unexpected response structure: {data}")
+                        break
+                else:
+                    print(f"GraphQL request failed for {repo_name} with status code {response.status_code if response is not None else 'timeout'}")
+                    break
 
-                        if response.status_code == 200:
-                            data = response.json()
-
-                            # Handle errors
-                            if 'errors' in data:
-                                print(f"GraphQL query failed with errors: {data['errors']}")
-                                break
-
-                            # Fetch issue edges
-                            if 'data' in data:
-                                issue_edges = data['data']['repository']['issues']['edges']
-                                page_info = data['data']['repository']['issues']['pageInfo']
-
-                                if not issue_writer:
-                                    fieldnames = ['id', 'title', 'state', 'created_at', 'updated_at', 'closed_at', 'body', 'user', 'url']
-                                    issue_writer = csv.DictWriter(issues_csv, fieldnames=fieldnames)
-                                    issue_writer.writeheader()
-
-                                # Write issues to CSV
-                                for issue in issue_edges:
-                                    # Check if author data exists, if not, set default values
-                                    author_login = issue['node']['author']['login'] if issue['node']['author'] else 'N/A'
-                                    #author_name = issue_data['author']['name'] if issue_data['author'] else 'N/A'
-
-                                    issue_data = {
-                                        'id': issue['node']['id'],
-                                        'title': issue['node']['title'],
-                                        'state': issue['node']['state'],
-                                        'created_at': issue['node']['createdAt'],
-                                        'updated_at': issue['node']['updatedAt'],
-                                        'closed_at': issue['node']['closedAt'],
-                                        'body': issue['node']['body'],
-                                        'user': author_login,
-                                        #'name':author_name,
-                                        'url': issue['node']['url']
-                                    }
-                                    issue_writer.writerow(issue_data)
+        if not has_next_page:
+            self._record_sample(repo, 'issues', sampler)
 
-                                # Handle pagination
-                                has_next_page = page_info['hasNextPage']
-                                end_cursor = page_info['endCursor']
-                            else:
-                                print(f"Unexpected response structure: {data}")
-                                break
-                        else:
-                            print(f"GraphQL request failed for {repo_name} with status code {response.status_code}")
-                            break
 
 
     def fetch_stargazers(self):
         """Fetch stargazers for each repository and save to a CSV file named as owner++reponame.csv."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
-
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
-
-            for row in tqdm(reader, desc="Fetching stargazers"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                file_name = f"{repo_owner}++{repo_name}.csv"
-                stargazers_filename = os.path.join(self.stargazers_dir, file_name)
-
-                # Ensure the directory exists
-                os.makedirs(self.stargazers_dir, exist_ok=True)
-
-                # Initialize variables for pagination
-                has_next_page = True
-                end_cursor = None  # To store the cursor for the next page
-
-                # Open the CSV file in append mode to write stargazers incrementally
-                with open(stargazers_filename, 'w', newline='', encoding='utf-8') as stargazers_csv:
-                    stargazer_writer = None  # We'll initialize the writer after the first batch
-
-                    while has_next_page:
-                        query = '''
-                        {
-                            repository(owner: "%s", name: "%s") {
-                                stargazers(first: 100%s) {
-                                    edges {
-                                        node {
-                                            login
-                                            avatarUrl
-                                            url
-                                        }
-                                        starredAt
-                                    }
-                                    pageInfo {
-                                        hasNextPage
-                                        endCursor
-                                    }
-                                }
+        for repo in tqdm(self.load_registry(), desc="Fetching stargazers"):
+            self._fetch_stargazers_repo(repo)
+
+        self.save_registry()
+
+    def iter_stargazers(self, repo, sampler=None):
+        """
+        Yield the stargazers of a repository newest first as Stargazer records, one page at a
+        time as the caller consumes them. With a sampler only its sample is paged; either way
+        sampler.finished tells afterwards whether the connection was paged to the end.
+        """
+        sampler = sampler or ConnectionSampler()
+        has_next_page = True
+
+        while has_next_page:
+            query = '''
+            query($owner: String!, $name: String!) {
+                repository(owner: $owner, name: $name) {
+                    stargazers(%s, orderBy: {field: STARRED_AT, direction: DESC}) {
+                        edges {
+                            node {
+                                login
+                                avatarUrl
+                                url
                             }
+                            starredAt
                         }
-                        ''' % (repo_owner, repo_name, f', after: "{end_cursor}"' if end_cursor else "")
-
-                        # Make the API request
-                        response = requests.post(self.graphql_url, headers=self.headers, json={'query': query})
-
-                        if response.status_code == 200:
-                            data = response.json()
-                            if 'data' in data and 'repository' in data['data'] and 'stargazers' in data['data']['repository']:
-                                stargazer_edges = data['data']['repository']['stargazers']['edges']
-                                page_info = data['data']['repository']['stargazers']['pageInfo']
-
-                                if not stargazer_edges:
-                                    print(f"No stargazers found for {repo_name}. Skipping...")
-                                    break
-
-                                if not stargazer_writer:
-                                    fieldnames = ['login', 'avatarUrl', 'url', 'starredAt']
-                                    stargazer_writer = csv.DictWriter(stargazers_csv, fieldnames=fieldnames)
-                                    stargazer_writer.writeheader()
-
-                                for stargazer in stargazer_edges:
-                                    node = stargazer['node']
-                                    stargazer_data = {
-                                        'login': node['login'],
-                                        'avatarUrl': node['avatarUrl'],
-                                        'url': node['url'],
-                                        'starredAt': stargazer['starredAt']
-                                    }
-                                    stargazer_writer.writerow(stargazer_data)
+                        totalCount
+                        pageInfo {
+                            hasNextPage
+                            endCursor
+                            hasPreviousPage
+                            startCursor
+                        }
+                    }
+                }
+            }
+            ''' % sampler.arguments()
+
+            # Make the API request
+            response = self._request('POST', self.graphql_url, 'stargazers', repo=repo,
+                                     json={'query': query, 'variables': {'owner': repo.owner, 'name': repo.name}})
+            if response.status_code != 200:
+                print(f"GraphQL request failed for {repo.name} with status code {response.status_code}")
+                print(response.json())
+                return
+            data = self._json(response, 'stargazers')
+            if 'data' not in data or not data['data'].get('repository') or 'stargazers' not in data['data']['repository']:
+                print(f"Invalid response structure for {repo.name}. Skipping...")
+                return
+
+            connection = data['data']['repository']['stargazers']
+            repo.totals['stargazers'] = connection['totalCount']
+            for stargazer in connection['edges']:
+                node = stargazer['node']
+                yield Stargazer(node['login'], node['avatarUrl'], node['url'], stargazer['starredAt'])
+            has_next_page = sampler.advance(connection)
+
+    def _fetch_stargazers_repo(self, repo):
+        """
+        Fetch the stargazers of a single repository, newest first. When the stars CSV and a
+        watermark from an earlier run exist, paging stops at the watermark and only the new
+        stars are appended; the daily star-count series is updated alongside.
+        """
+        stargazers_filename = os.path.join(self.stargazers_dir, repo.file_name)
+
+        # Ensure the directory exists
+        os.makedirs(self.stargazers_dir, exist_ok=True)
+
+        # A watermark only counts while the CSV it describes is still there
+        watermark = repo.watermarks.get('stargazers') if os.path.isfile(stargazers_filename) else None
+        rows = []  # Refresh: buffered, and appended only once the watermark was reached
+        day_counts = {}
+        newest = None
+        reached_watermark = False
+        # A refresh only reads the stars newer than the watermark, so it is never sampled
+        sampler = self._sampler('stargazers', repo) if not watermark else ConnectionSampler()
+
+        # A full fetch streams into a new file; a refresh appends to the existing one
+        with open(stargazers_filename, 'a' if watermark else 'w', newline='', encoding='utf-8') as stargazers_csv:
+            stargazer_writer = csv.DictWriter(stargazers_csv, fieldnames=Stargazer._fields)
+            if not watermark:
+                stargazer_writer.writeheader()
+
+            for stargazer in self.iter_stargazers(repo, sampler):
+                if watermark and (stargazer.starredAt < watermark['starred_at'] or
+                                  (stargazer.starredAt == watermark['starred_at'] and stargazer.login in watermark['logins'])):
+                    reached_watermark = True
+                    break  # Closing the iterator requests no further pages
+                if newest is None:
+                    newest = {'starred_at': stargazer.starredAt, 'logins': []}
+                if stargazer.starredAt == newest['starred_at']:
+                    newest['logins'].append(stargazer.login)
+                day = stargazer.starredAt[:10]
+                day_counts[day] = day_counts.get(day, 0) + 1
+                rows.append(stargazer._asdict())
+                if not watermark and len(rows) == PAGE_ROWS:
+                    stargazer_writer.writerows(rows)
+                    self.metrics.record_rows('stargazers', len(rows))
+                    rows = []
+
+            complete = reached_watermark or sampler.finished
+            if rows and (complete or not watermark):
+                stargazer_writer.writerows(rows)
+                self.metrics.record_rows('stargazers', len(rows))
+
+        if complete and newest is None and not watermark:
+            print(f"No stargazers found for {repo.name}. Skipping...")
+
+        # Only a completed fetch moves the watermark; an interrupted full fetch is redone next time.
+        # A sample has gaps, so it gets neither a watermark nor a daily series and is sampled again next time
+        if complete:
+            self._record_sample(repo, 'stargazers', sampler)
+            if sampler.is_sample:
+                repo.watermarks.pop('stargazers', None)
+                return
+            if newest is not None:
+                if watermark and newest['starred_at'] == watermark['starred_at']:
+                    newest['logins'] += watermark['logins']
+                repo.watermarks['stargazers'] = newest
+            self._update_star_series(repo, day_counts, rebuild=not watermark)
+
+    def _update_star_series(self, repo, day_counts, rebuild=False):
+        """Add the new stars per day to the repository's daily series (date, new_stars, total_stars) in stars_daily/."""
+        os.makedirs(self.stars_daily_dir, exist_ok=True)
+        series_filename = os.path.join(self.stars_daily_dir, repo.file_name)
+        counts = {}
+        if not rebuild and os.path.isfile(series_filename):
+            with open(series_filename, newline='', encoding='utf-8') as series_csv:
+                counts = {row['date']: int(row['new_stars']) for row in csv.DictReader(series_csv)}
+        for day, count in day_counts.items():
+            counts[day] = counts.get(day, 0) + count
+
+        total = 0
+        with open(series_filename, 'w', newline='', encoding='utf-8') as series_csv:
+            writer = csv.writer(series_csv)
+            writer.writerow(['date', 'new_stars', 'total_stars'])
+            for day in sorted(counts):
+                total += counts[day]
+                writer.writerow([day, counts[day], total])
 
-                                has_next_page = page_info.get('hasNextPage', False)
-                                end_cursor = page_info.get('endCursor')
-                            else:
-                                print(f"Invalid response structure for {repo_name}. Skipping...")
-                                break
-                        else:
-                            print(f"GraphQL request failed for {repo_name} with status code {response.status_code}")
-                            print(response.json())
-                            break
 
 
     def fetch_forks(self):
         """Fetch forks for each repository using GraphQL and save to a CSV file named as owner++reponame_forks.csv."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
+        for repo in tqdm(self.load_registry(), desc="Fetching forks"):
+            self._fetch_forks_repo(repo)
 
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
+        self.save_registry()
 
-            for row in tqdm(reader, desc="Fetching forks"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                file_name = f"{repo_owner}++{repo_name}.csv"
-                forks_filename = os.path.join(self.forks_dir, file_name)
+    def _fetch_forks_repo(self, repo):
+        """Fetch the forks of a single repository."""
+        repo_owner, repo_name = repo.owner, repo.name
+        file_name = f"{repo_owner}++{repo_name}.csv"
+        forks_filename = os.path.join(self.forks_dir, file_name)
 
-                # Ensure the directory exists
-                os.makedirs(self.forks_dir, exist_ok=True)
+        # Ensure the directory exists
+        os.makedirs(self.forks_dir, exist_ok=True)
 
-                # Initialize variables for pagination
-                has_next_page = True
-                end_cursor = None  # To store the cursor for the next page
+        sampler = self._sampler('forks', repo)
 
-                # Open the CSV file in append mode to write forks incrementally
-                with open(forks_filename, 'w', newline='', encoding='utf-8') as forks_csv:
-                    forks_writer = None  # Initialize writer after first batch
+        # Initialize variables for pagination
+        has_next_page = True
 
-                    while has_next_page:
-                        # GraphQL query to fetch forks with pagination
-                        query = '''
-                        {
-                            repository(owner: "%s", name: "%s") {
-                                forks(first: 100, after: "%s") {
-                                    edges {
-                                        node {
-                                            id
-                                            name
-                                            nameWithOwner  # Corrected to nameWithOwner
-                                            owner {
-                                                login
-                                            }
-                                            createdAt
-                                            updatedAt
-                                            url
-                                        }
-                                    }
-                                    pageInfo {
-                                        hasNextPage
-                                        endCursor
+        # Open the CSV file in append mode to write forks incrementally
+        with open(forks_filename, 'w', newline='', encoding='utf-8') as forks_csv:
+            forks_writer = None  # Initialize writer after first batch
+
+            while has_next_page:
+                # GraphQL query to fetch forks with pagination
+                query = '''
+                query($owner: String!, $name: String!) {
+                    repository(owner: $owner, name: $name) {
+                        forks(%s) {
+                            edges {
+                                node {
+                                    id
+                                    name
+                                    nameWithOwner  # Corrected to nameWithOwner
+                                    owner {
+                                        login
                                     }
+                                    createdAt
+                                    updatedAt
+                                    url
                                 }
                             }
+                            totalCount
+                            pageInfo {
+                                hasNextPage
+                                endCursor
+                                hasPreviousPage
+                                startCursor
+                            }
                         }
-                        ''' % (repo_owner, repo_name, end_cursor if end_cursor else "")
+                    }
+                }
+                ''' % sampler.arguments()
 
-                        # Make the GraphQL request
-                        response = requests.post(self.graphql_url, headers=self.headers, json={'query': query})
+                # Make the GraphQL request
+                response = self._request('POST', self.graphql_url, 'forks', repo=repo,
+                                         json={'query': query, 'variables': {'owner': repo_owner, 'name': repo_name}})
 
-                        if response.status_code == 200:
-                            data = response.json()
-                            fork_edges = data['data']['repository']['forks']['edges']
-                            page_info = data['data']['repository']['forks']['pageInfo']
-
-                            if not fork_edges:
-                                print(f" No forks found for {repo_name}.")
-                                break  # No more forks, exit loop
-
-                            # Initialize the CSV writer with fieldnames after fetching the first batch
-                            if not forks_writer:
-                                fieldnames = ['fork_id', 'fork_name', 'fork_full_name', 'fork_owner', 'fork_url', 'fork_created_at', 'fork_updated_at']
-                                forks_writer = csv.DictWriter(forks_csv, fieldnames=fieldnames)
-                                forks_writer.writeheader()  # Write header only once
-
-                            # Write fork data incrementally
-                            for fork in fork_edges:
-                                node = fork['node']
-                                fork_data = {
-                                    'fork_id': node['id'],
-                                    'fork_name': node['name'],
-                                    'fork_full_name': node['nameWithOwner'],
-                                    'fork_owner': node['owner']['login'],
-                                    'fork_url': node['url'],
-                                    'fork_created_at': node['createdAt'],
-                                    'fork_updated_at': node['updatedAt']
-                                }
-                                forks_writer.writerow(fork_data)
+                if response.status_code == 200:
+                    data = self._json(response, 'forks')
+                    fork_edges = data['data']['repository']['forks']['edges']
+                    repo.totals['forks'] = data['data']['repository']['forks']['totalCount']
+
+                    if not fork_edges:
+                        print(f" No forks found for {repo_name}.")
+                        break  # No more forks, exit loop
+
+                    # Initialize the CSV writer with fieldnames after fetching the first batch
+                    if not forks_writer:
+                        fieldnames = ['fork_id', 'fork_name', 'fork_full_name', 'fork_owner', 'fork_url', 'fork_created_at', 'fork_updated_at']
+                        forks_writer = csv.DictWriter(forks_csv, fieldnames=fieldnames)
+                        forks_writer.writeheader()  # Write header only once
+
+                    # Write fork data incrementally
+                    for fork in fork_edges:
+                        node = fork['node']
+                        fork_data = {
+                            'fork_id': node['id'],
+                            'fork_name': node['name'],
+                            'fork_full_name': node['nameWithOwner'],
+                            'fork_owner': node['owner']['login'],
+                            'fork_url': node['url'],
+                            'fork_created_at': node['createdAt'],
+                            'fork_updated_at': node['updatedAt']
+                        }
+                        forks_writer.writerow(fork_data)
+                    self.metrics.record_rows('forks', len(fork_edges))
 
-                            # Update pagination info
-                            has_next_page = page_info['hasNextPage']
-                            end_cursor = page_info['endCursor']  # Set the cursor for the next page
+                    # Update pagination info
+                    has_next_page = sampler.advance(data['data']['repository']['forks'])
 
-                            #print(f"Fetched {len(fork_edges)} forks. {'More pages to fetch' if has_next_page else 'No more pages.'}")
-                        else:
-                            print(f"GraphQL request failed for {repo_name} with status code {response.status_code}")
-                            break  # Exit loop on failure
+                    #print(f"Fetched {len(fork_edges)} forks. {'More pages to fetch' if has_next_page else 'No more pages.'}")
+                else:
+                    print(f"GraphQL request failed for {repo_name} with status code {response.status_code}")
+                    break  # Exit loop on failure
+
+        if not has_next_page:
+            self._record_sample(repo, 'forks', sampler)
 
 
     def fetch_subscribers(self):
         """Fetch subscribers (watchers) for each repository using GraphQL and save to a CSV file named as owner++reponame_subscribers.csv."""
-        metadata_file = os.path.join(self.metadata_dir, 'combined_metadata.csv')
-
-        with open(metadata_file, newline='', encoding='utf-8') as metadata_csv:
-            reader = csv.DictReader(metadata_csv)
-
-            for row in tqdm(reader, desc="Fetching subscribers"):
-                repo_url = row['html_url']
-                repo_owner, repo_name = self._parse_github_url(repo_url)
-                file_name = f"{repo_owner}++{repo_name}.csv"
-                subscribers_filename = os.path.join(self.subscribers_dir, file_name)
-
-                # Ensure the directory exists
-                os.makedirs(self.subscribers_dir, exist_ok=True)
-
-                # Initialize variables for pagination
-                has_next_page = True
-                end_cursor = None  # To store the cursor for the next page
-
-                # Open the CSV file in append mode to write subscribers incrementally
-                with open(subscribers_filename, 'w', newline='', encoding='utf-8') as subscribers_csv:
-                    subscribers_writer = None  # Initialize writer after first batch
-
-                    while has_next_page:
-                        # GraphQL query to fetch subscribers (watchers) with pagination
-                        query = '''
-                        {
-                            repository(owner: "%s", name: "%s") {
-                                watchers(first: 100, after: "%s") {
-                                    edges {
-                                        node {
-                                            login
-                                            id
-                                            url
-                                        }
-                                    }
-                                    pageInfo {
-                                        hasNextPage
-                                        endCursor
-                                    }
-                                }
-                            }
+        for repo in tqdm(self.load_registry(), desc="Fetching subscribers"):
+            self._fetch_subscribers_repo(repo)
+
+        self.save_registry()
+
+    def _fetch_subscribers_repo(self, repo):
+        """Fetch the subscribers of a single repository."""
+        subscribers_filename = os.path.join(self.subscribers_dir, repo.file_name)
+
+        # Ensure the directory exists
+        os.makedirs(self.subscribers_dir, exist_ok=True)
+
+        # GraphQL query to fetch subscribers (watchers) with pagination
+        query = '''
+        query($owner: String!, $name: String!, $cursor: String) {
+            repository(owner: $owner, name: $name) {
+                watchers(first: 100, after: $cursor) {
+                    edges {
+                        node {
+                            login
+                            id
+                            url
                         }
-                        ''' % (repo_owner, repo_name, end_cursor if end_cursor else "")
-
-                        # Make the GraphQL request
-                        response = requests.post(self.graphql_url, headers=self.headers, json={'query': query})
-
-                        if response.status_code == 200:
-                            data = response.json()
-                            subscriber_edges = data['data']['repository']['watchers']['edges']
-                            page_info = data['data']['repository']['watchers']['pageInfo']
-
-                            if not subscriber_edges:
-                                print(f" No subscribers found for {repo_name}.")
-                                break  # No more subscribers, exit loop
-
-                            # Initialize the CSV writer with fieldnames after fetching the first batch
-                            if not subscribers_writer:
-                                fieldnames = ['subscriber_login', 'subscriber_id', 'subscriber_url']
-                                subscribers_writer = csv.DictWriter(subscribers_csv, fieldnames=fieldnames)
-                                subscribers_writer.writeheader()  # Write header only once
-
-                            # Write subscriber data incrementally
-                            for subscriber in subscriber_edges:
-                                node = subscriber['node']
-                                subscriber_data = {
-                                    'subscriber_login': node['login'],
-                                    'subscriber_id': node['id'],
-                                    'subscriber_url': node['url']
-                                }
-                                subscribers_writer.writerow(subscriber_data)
-
-                            # Update pagination info
-                            has_next_page = page_info['hasNextPage']
-                            end_cursor = page_info['endCursor']  # Set the cursor for the next page
+                    }
+                    totalCount
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+                }
+            }
+        }
+        '''
+
+        def record_total(connection):
+            repo.totals['subscribers'] = connection['totalCount']
+
+        subscribers = GraphQLPaginator(self, 'subscribers').paginate(query, {'owner': repo.owner, 'name': repo.name},
+                                                                     'repository.watchers', repo=repo, on_page=record_total)
+        # The file stays empty (without a header) for a repository without subscribers
+        with open(subscribers_filename, 'w', newline='', encoding='utf-8') as subscribers_csv:
+            subscribers_writer = None
+            try:
+                for page in _pages(subscribers):
+                    if not subscribers_writer:
+                        fieldnames = ['subscriber_login', 'subscriber_id', 'subscriber_url']
+                        subscribers_writer = csv.DictWriter(subscribers_csv, fieldnames=fieldnames)
+                        subscribers_writer.writeheader()
+                    subscribers_writer.writerows({'subscriber_login': node['login'], 'subscriber_id': node['id'],
+                                                  'subscriber_url': node['url']} for node in page)
+                    self.metrics.record_rows('subscribers', len(page))
+            except GraphQLError as error:
+                print(f"{error} ({repo.full_name})")
+            else:
+                if not subscribers_writer:
+                    print(f" No subscribers found for {repo.name}.")
 
-                            #print(f"Fetched {len(subscriber_edges)} subscribers. {'More pages to fetch' if has_next_page else 'No more pages.'}")
-                        else:
-                            print(f"GraphQL request failed for {repo_name} with status code {response.status_code}")
-                            break  # Exit loop on failure
 
 
-    def analyze(self, analyze_flag):
+    def analyze(self, analyze_flag, dedup_threshold=0.9, service_address=None, backend=None):
         self.analyze_flag = analyze_flag
         if self.analyze_flag:
             print('\nAnalyzing the Github Repositories...')
-            generate_summary(src_dir=self.readme_directory, target_dir=self.analysis_directory)
+            # Imported here: it loads torch, transformers and the tokenizer, which fetching never needs
+            from app.text_segments_transformers import generate_summary
+            generate_summary(src_dir=self.readme_directory, target_dir=self.analysis_directory, dedup_threshold=dedup_threshold,
+                             backend=backend, service_address=service_address)
             # extract_topics_from_summaries(target_dir=self.analysis_directory)
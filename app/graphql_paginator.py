@@ -0,0 +1,180 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BUDGET_RESERVE = 50  # GraphQL points kept in reserve; below it paginators wait for the rate limit reset
+QUEUE_PAGES = 64  # Pages buffered between the worker threads of run_many and its consumer
+
+
+class GraphQLError(Exception):
+    """ A GraphQL request failed or its response carried errors. """
+
+
+def _at(data, path):
+    """ The value at a dotted path such as 'repository.pullRequests', or None when a step is missing. """
+    for key in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _items(connection):
+    """ The raw items of a connection page: its nodes, or else its edges. """
+    if 'nodes' in connection:
+        return connection['nodes'] or []
+    return connection.get('edges') or []
+
+
+def _unwrap(item):
+    """ An edge that only holds a node becomes the node; edges with fields of their own (starredAt, ...) stay edges. """
+    if isinstance(item, dict) and set(item) == {'node'}:
+        return item['node']
+    return item
+
+
+class NestedConnection:
+    """
+    A connection inside the nodes of a paginated connection, e.g. the labels of each pull
+    request. Nodes whose first page of it has more pages are completed with `query`, which
+    takes the node's $id and a $cursor and returns the connection at `path`, e.g.
+    query($id: ID!, $cursor: String) { node(id: $id) { ... on PullRequest { labels(first: 100, after: $cursor) { ... } } } }
+    with path 'node.labels'.
+    """
+    __slots__ = ('field', 'query', 'path')
+
+    def __init__(self, field, query, path):
+        self.field = field
+        self.query = query
+        self.path = path
+
+
+class GraphQLPaginator:
+    """
+    Runs any GraphQL document over all pages of a connection. The document declares a
+    `$cursor: String` variable and passes it as `after: $cursor` to the connection at `path`
+    (dotted, e.g. 'repository.releases'), which selects `pageInfo { hasNextPage endCursor }`
+    and `nodes` or `edges`. Owners, names and other values go in as variables, so nothing
+    needs quoting. Requests go through the fetcher, sharing its retries, metrics, response
+    archive and rate-limit budget.
+    """
+
+    def __init__(self, fetcher, stage='graphql', workers=4, reserve=BUDGET_RESERVE):
+        self.fetcher = fetcher
+        self.stage = stage
+        self.workers = workers
+        self.reserve = reserve
+
+    def execute(self, query, variables=None, repo=None):
+        """ Send one GraphQL request and return its data, raising GraphQLError on failure. """
+        # The budget check and its lock live on the fetcher, shared by every paginator built on it
+        self.fetcher._wait_for_graphql_budget(self.reserve)
+        response = self.fetcher._request('POST', self.fetcher.graphql_url, self.stage, repo=repo,
+                                         json={'query': query, 'variables': variables or {}})
+        if response.status_code != 200:
+            raise GraphQLError(f"GraphQL request of {self.stage} failed with status code {response.status_code}")
+        data = self.fetcher._json(response, self.stage)
+        if data.get('errors'):
+            raise GraphQLError(f"GraphQL query of {self.stage} failed with errors: {data['errors']}")
+        return data.get('data') or {}
+
+    def pages(self, query, variables=None, path=None, repo=None, cursor=None):
+        """ Yield every page (the connection dict at path) from cursor on, requesting the next one when asked for. """
+        while True:
+            data = self.execute(query, dict(variables or {}, cursor=cursor), repo)
+            connection = _at(data, path)
+            if connection is None:
+                raise GraphQLError(f"No connection at '{path}' in the response of {self.stage}")
+            yield connection
+            page_info = connection.get('pageInfo') or {}
+            if not page_info.get('hasNextPage') or not page_info.get('endCursor'):
+                return
+            cursor = page_info['endCursor']
+
+    def _complete(self, node, nested, repo):
+        """ Fetch the remaining pages of every nested connection of a node into its first page. """
+        for connection_spec in nested:
+            connection = node.get(connection_spec.field) if isinstance(node, dict) else None
+            page_info = (connection or {}).get('pageInfo') or {}
+            if not page_info.get('hasNextPage'):
+                continue
+            items = _items(connection)
+            for page in self.pages(connection_spec.query, {'id': node['id']}, connection_spec.path, repo, page_info['endCursor']):
+                items.extend(_items(page))
+                page_info = page.get('pageInfo') or page_info
+            connection['edges' if 'edges' in connection else 'nodes'] = items
+            connection['pageInfo'] = page_info
+
+    def paginate(self, query, variables=None, path=None, nested=(), repo=None, on_page=None):
+        """
+        Yield the nodes of the connection at path, page by page as they are consumed, with the
+        nested connections (NestedConnection) of each node completed. on_page(connection) is
+        called for every page, e.g. to read its totalCount.
+        """
+        for page in self.pages(query, variables, path, repo):
+            if on_page is not None:
+                on_page(page)
+            for item in _items(page):
+                node = _unwrap(item)
+                self._complete(node, nested, repo)
+                yield node
+
+    def run_many(self, jobs, nested=()):
+        """
+        Paginate many (key, query, variables, path[, repo]) jobs on a thread pool and yield
+        (key, node) in arrival order; the optional RepoRecord keys the job's pages in the
+        metrics and the response archive. At most QUEUE_PAGES pages are buffered, so a slow consumer holds the
+        workers back instead of piling up memory. The first failure is raised to the consumer.
+        """
+        pages = queue.Queue(maxsize=QUEUE_PAGES)
+        done = object()
+        stop = threading.Event()
+
+        def offer(item):
+            """ Queue an item for the consumer; False once the consumer has stopped. """
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def run(key, query, variables, path, repo=None):
+            if stop.is_set():
+                return
+            try:
+                for page in self.pages(query, variables, path, repo):
+                    nodes = [_unwrap(item) for item in _items(page)]
+                    for node in nodes:
+                        self._complete(node, nested, repo)
+                    if not offer((key, nodes)):
+                        return  # Without asking for the next page
+            except Exception as error:
+                offer((key, error))
+            finally:
+                offer((key, done))
+
+        jobs = list(jobs)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for job in jobs:
+                executor.submit(run, *job)
+            try:
+                remaining = len(jobs)
+                while remaining:
+                    key, item = pages.get()
+                    if item is done:
+                        remaining -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        for node in item:
+                            yield key, node
+            finally:
+                # The consumer stopped or failed: let the workers drop their pages and finish
+                stop.set()
+                while True:
+                    try:
+                        pages.get_nowait()
+                    except queue.Empty:
+                        break
@@ -0,0 +1,203 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+
+# Upper bounds (seconds) of the request latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+class _EndpointStats:
+    __slots__ = ('requests', 'errors', 'retries', 'bytes', 'latency_sum', 'latency_buckets',
+                 'parse_seconds', 'graphql_cost', 'status_codes')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.parse_seconds = 0.0
+        self.graphql_cost = 0
+        self.status_codes = {}
+
+
+class FetchMetrics:
+    """
+    Thread-safe counters for one fetch run, recorded per (stage, endpoint): request count,
+    latency histogram, bytes received, JSON parse time, GraphQL cost, retries and status codes;
+    per stage: pages per repository, rows written and wall time; plus the last rate limit seen.
+    Optionally profiles every stage unit with cProfile.
+    """
+
+    def __init__(self, profile=False):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.endpoints = {}  # (stage, endpoint) -> _EndpointStats
+        self.pages = {}  # stage -> {full_name: pages}
+        self.rows = {}  # stage -> rows written
+        self.stage_seconds = {}  # stage -> summed wall time of its units
+        self.rate_limit = {}  # resource -> {'remaining', 'limit', 'reset'}
+        self.profile = profile
+        self.profiles = {}  # stage -> pstats.Stats
+
+    def _endpoint(self, stage, endpoint):
+        key = (stage, endpoint)
+        if key not in self.endpoints:
+            self.endpoints[key] = _EndpointStats()
+        return self.endpoints[key]
+
+    def record_request(self, stage, endpoint, latency, size, status_code, headers=None, full_name=None):
+        with self.lock:
+            stats = self._endpoint(stage, endpoint)
+            stats.requests += 1
+            stats.bytes += size
+            stats.latency_sum += latency
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats.latency_buckets[index] += 1
+                    break
+            stats.status_codes[status_code] = stats.status_codes.get(status_code, 0) + 1
+            if status_code != 200:
+                stats.errors += 1
+            if full_name is not None:
+                stage_pages = self.pages.setdefault(stage, {})
+                stage_pages[full_name] = stage_pages.get(full_name, 0) + 1
+            if headers and 'X-RateLimit-Remaining' in headers:
+                self.rate_limit[headers.get('X-RateLimit-Resource', 'core')] = {
+                    'remaining': int(headers['X-RateLimit-Remaining']),
+                    'limit': int(headers.get('X-RateLimit-Limit', 0)),
+                    'reset': int(headers.get('X-RateLimit-Reset', 0))
+                }
+
+    def record_retry(self, stage, endpoint):
+        with self.lock:
+            self._endpoint(stage, endpoint).retries += 1
+
+    def record_parse(self, stage, endpoint, seconds, graphql_cost=None):
+        with self.lock:
+            stats = self._endpoint(stage, endpoint)
+            stats.parse_seconds += seconds
+            if graphql_cost:
+                stats.graphql_cost += graphql_cost
+
+    def record_rows(self, stage, count):
+        with self.lock:
+            self.rows[stage] = self.rows.get(stage, 0) + count
+
+    def run_unit(self, stage, function, *args):
+        """
+        Run one stage unit, adding its wall time to the stage and profiling it when enabled.
+        Only one profiler can be active at a time (Python 3.12+ refuses a second one), so a
+        unit that starts while another thread's unit is being profiled runs unprofiled; for
+        complete profiles run with a single worker.
+        """
+        profiler = cProfile.Profile() if self.profile else None
+        start = time.perf_counter()
+        try:
+            if profiler:
+                try:
+                    profiler.enable()
+                except ValueError:
+                    profiler = None  # Another unit holds the profiler
+                    return function(*args)
+                try:
+                    return function(*args)
+                finally:
+                    profiler.disable()
+            return function(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + elapsed
+                if profiler:
+                    if stage in self.profiles:
+                        self.profiles[stage].add(profiler)
+                    else:
+                        self.profiles[stage] = pstats.Stats(profiler)
+
+    def report(self):
+        """ The run report as a JSON-serialisable dict. """
+        with self.lock:
+            endpoints = []
+            for (stage, endpoint), stats in sorted(self.endpoints.items()):
+                endpoints.append({
+                    'stage': stage,
+                    'endpoint': endpoint,
+                    'requests': stats.requests,
+                    'errors': stats.errors,
+                    'retries': stats.retries,
+                    'bytes': stats.bytes,
+                    'latency_seconds_sum': round(stats.latency_sum, 4),
+                    'latency_seconds_mean': round(stats.latency_sum / stats.requests, 4) if stats.requests else None,
+                    'latency_histogram': {('+Inf' if bound == float('inf') else str(bound)): count
+                                          for bound, count in zip(LATENCY_BUCKETS, stats.latency_buckets)},
+                    'json_parse_seconds': round(stats.parse_seconds, 4),
+                    'graphql_cost': stats.graphql_cost,
+                    'status_codes': {str(code): count for code, count in stats.status_codes.items()}
+                })
+            stages = {}
+            for stage in set(self.pages) | set(self.rows) | set(self.stage_seconds):
+                pages = list(self.pages.get(stage, {}).values())
+                stages[stage] = {
+                    'repos': len(pages),
+                    'pages': sum(pages),
+                    'pages_per_repo_mean': round(sum(pages) / len(pages), 2) if pages else None,
+                    'pages_per_repo_max': max(pages) if pages else None,
+                    'rows_written': self.rows.get(stage, 0),
+                    'wall_seconds': round(self.stage_seconds.get(stage, 0.0), 3)
+                }
+            return {
+                'started': self.started,
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'endpoints': endpoints,
+                'stages': stages,
+                'rate_limit': dict(self.rate_limit)
+            }
+
+    def save_json(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=1)
+        return path
+
+    def write_prometheus(self, path):
+        """ Write the counters in the Prometheus textfile-collector format (written atomically). """
+        report = self.report()
+        lines = []
+        for entry in report['endpoints']:
+            labels = f'stage="{entry["stage"]}",endpoint="{entry["endpoint"]}"'
+            lines.append(f'git_sniffer_requests_total{{{labels}}} {entry["requests"]}')
+            lines.append(f'git_sniffer_request_errors_total{{{labels}}} {entry["errors"]}')
+            lines.append(f'git_sniffer_request_retries_total{{{labels}}} {entry["retries"]}')
+            lines.append(f'git_sniffer_response_bytes_total{{{labels}}} {entry["bytes"]}')
+            lines.append(f'git_sniffer_graphql_cost_total{{{labels}}} {entry["graphql_cost"]}')
+            lines.append(f'git_sniffer_json_parse_seconds_total{{{labels}}} {entry["json_parse_seconds"]}')
+            cumulative = 0
+            for bound, count in entry['latency_histogram'].items():
+                cumulative += count
+                lines.append(f'git_sniffer_request_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'git_sniffer_request_latency_seconds_sum{{{labels}}} {entry["latency_seconds_sum"]}')
+            lines.append(f'git_sniffer_request_latency_seconds_count{{{labels}}} {entry["requests"]}')
+        for stage, entry in report['stages'].items():
+            lines.append(f'git_sniffer_pages_total{{stage="{stage}"}} {entry["pages"]}')
+            lines.append(f'git_sniffer_rows_written_total{{stage="{stage}"}} {entry["rows_written"]}')
+            lines.append(f'git_sniffer_stage_seconds_total{{stage="{stage}"}} {entry["wall_seconds"]}')
+        for resource, limits in report['rate_limit'].items():
+            lines.append(f'git_sniffer_rate_limit_remaining{{resource="{resource}"}} {limits["remaining"]}')
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+        return path
+
+    def save_profiles(self, directory):
+        """ Dump the merged cProfile stats of each stage to <directory>/<stage>.prof. """
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            for stage, stats in self.profiles.items():
+                stats.dump_stats(os.path.join(directory, f'{stage}.prof'))
+        return directory
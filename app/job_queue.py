@@ -0,0 +1,286 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.pipeline import build_stages, resolve_stages, DEFAULT_STAGES
+from app.contributor_activity import ContributorActivity
+
+LEASE_SECONDS = 120  # A job whose lease is not renewed for this long is handed to another worker
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 3
+IDLE_SLEEP_SECONDS = 5
+
+# Fetcher attribute holding the output directory of each stage (used to discard partial output on retry)
+STAGE_OUTPUT_DIRS = {
+    'stargazers': 'stargazers_dir',
+    'forks': 'forks_dir',
+    'subscribers': 'subscribers_dir',
+    'contributors': 'contributors_dir',
+    'commits': 'commits_dir',
+    'releases': 'releases_dir',
+    'issues': 'issues_dir',
+    'pulls': 'pulls_dir',
+}
+
+
+class JobQueue:
+    """
+    Durable (repo, stage) job queue in a SQLite table. Workers claim jobs under a lease
+    and renew it with heartbeats; jobs whose lease expires (e.g. the worker was killed)
+    become claimable again, so no job is lost and each finishes exactly once per run.
+    Jobs belong to the current run (runs table): a run that was interrupted is resumed,
+    while a new run starts from a fresh set of jobs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                full_name TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                last_error TEXT,
+                UNIQUE (full_name, stage)
+            )
+        ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started REAL NOT NULL,
+                finished REAL
+            )
+        ''')
+
+    def close(self):
+        self.connection.close()
+
+    def begin_run(self, repos, stages):
+        """
+        Start a run of the (repo, stage) jobs, or resume the last run if it never finished,
+        keeping the jobs it already completed. A new run drops the jobs of the previous one,
+        so refreshes (e.g. incremental stargazers) fetch again. Returns (run id, resumed).
+        """
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            row = self.connection.execute('SELECT id FROM runs WHERE finished IS NULL ORDER BY id DESC LIMIT 1').fetchone()
+            if row is None:
+                self.connection.execute('DELETE FROM jobs')
+                run_id = self.connection.execute('INSERT INTO runs (started) VALUES (?)', (time.time(),)).lastrowid
+            else:
+                run_id = row[0]
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO jobs (full_name, stage) VALUES (?, ?)',
+                [(repo.full_name, stage) for repo in repos for stage in stages]
+            )
+        return run_id, row is not None
+
+    def finish_run(self, run_id):
+        """ Mark a run finished once its results are merged; the next begin_run starts over. """
+        with self.connection:
+            self.connection.execute('UPDATE runs SET finished = ? WHERE id = ?', (time.time(), run_id))
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """ Lease the oldest pending (or lease-expired) job to worker_id. Returns (id, full_name, stage, attempts) or None. """
+        now = time.time()
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            row = self.connection.execute('''
+                SELECT id, full_name, stage, attempts FROM jobs
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY id LIMIT 1
+            ''', (now,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute('''
+                UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', (worker_id, now + lease_seconds, row[0]))
+        return row
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """ Extend the lease of a running job. Returns False if the lease was lost to another worker. """
+        with self.connection:
+            cursor = self.connection.execute('''
+                UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (time.time() + lease_seconds, job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result=None):
+        with self.connection:
+            self.connection.execute('''
+                UPDATE jobs SET status = 'done', result = ?, lease_expires = NULL
+                WHERE id = ? AND lease_owner = ?
+            ''', (json.dumps(result) if result is not None else None, job_id, worker_id))
+
+    def fail(self, job_id, worker_id, error, max_attempts=MAX_ATTEMPTS):
+        """ Return a failed job to the queue, or mark it failed once it used up its attempts. """
+        with self.connection:
+            self.connection.execute('''
+                UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                                last_error = ?, lease_owner = NULL, lease_expires = NULL
+                WHERE id = ? AND lease_owner = ?
+            ''', (max_attempts, str(error), job_id, worker_id))
+
+    def unfinished(self):
+        """ Number of jobs that are pending or still leased. """
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')"
+        ).fetchone()[0]
+
+    def counts(self):
+        return dict(self.connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def results(self):
+        """ (job id, full_name, changes) reported by the finished jobs, see stage_changes. """
+        for job_id, full_name, result in self.connection.execute(
+                "SELECT id, full_name, result FROM jobs WHERE status = 'done' AND result IS NOT NULL ORDER BY id"):
+            yield job_id, full_name, json.loads(result)
+
+
+def stage_changes(repo, stage):
+    """
+    The registry fields a stage may have changed for a repository: its connection total,
+    its watermark and its sample entry (None removes them, e.g. once a sampled connection
+    was fetched whole) and, for commits, the default branch. A job reports only
+    these instead of the whole record, so a stale snapshot held by another worker never
+    overwrites what a later job learned.
+    """
+    changes = {'totals': {stage: repo.totals[stage]} if stage in repo.totals else {},
+               'watermarks': {stage: repo.watermarks.get(stage)},
+               'samples': {stage: repo.samples.get(stage)}}
+    if stage == 'commits':
+        changes['default_branch'] = repo.default_branch
+    return changes
+
+
+def _heartbeat_loop(queue_path, job_id, worker_id, stop):
+    queue = JobQueue(queue_path)
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if not queue.heartbeat(job_id, worker_id):
+                break
+    finally:
+        queue.close()
+
+
+def worker_main(queue_path, token, data_dir=None, metadata_file=None, profile=False, api_url=None,
+                archive_dir=None, replay=False, columns=None, sampling=None, window=None):
+    """
+    Worker process: claim jobs until the queue is drained, fetching and writing each one.
+    Before a job is marked done, its contributor activity is saved to
+    <metadata_dir>/workers/activity-job-<job id>.npz for the coordinator to merge, and the
+    worker's request metrics so far to workers/<worker_id>.json, so a worker that is killed
+    later loses nothing of the jobs it completed.
+    """
+    # Imported here so the coordinator module can be imported without the fetcher's dependencies
+    from app.fetch_github_data import GitHubRepoFetcher
+
+    worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    fetcher = GitHubRepoFetcher(token, data_dir=data_dir, metadata_file=metadata_file, profile=profile,
+                                api_url=api_url, archive_dir=archive_dir, replay=replay, columns=columns,
+                                sampling=sampling, window=window)
+    registry = fetcher.load_registry()
+    stages = build_stages(fetcher)
+    queue = JobQueue(queue_path)
+    workers_dir = os.path.join(fetcher.metadata_dir, 'workers')
+    os.makedirs(workers_dir, exist_ok=True)
+
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            if queue.unfinished() == 0:
+                break
+            time.sleep(IDLE_SLEEP_SECONDS)  # Other workers hold the remaining leases; wait for them to finish or expire
+            continue
+
+        job_id, full_name, stage, attempts = job
+        repo = registry.get(full_name)
+        if repo is None:
+            queue.fail(job_id, worker_id, f"{full_name} is not in the registry", max_attempts=0)
+            continue
+
+        # A retried job may have left a partial file behind; start that dataset over
+        if attempts > 0 and stage in STAGE_OUTPUT_DIRS:
+            partial = os.path.join(getattr(fetcher, STAGE_OUTPUT_DIRS[stage]), repo.file_name)
+            if os.path.isfile(partial):
+                os.remove(partial)
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat_loop, args=(queue_path, job_id, worker_id, stop), daemon=True)
+        heartbeat.start()
+        try:
+            # Empty activity counts per job, so the coordinator merges exactly what the job fetched
+            fetcher.activity = ContributorActivity()
+            fetcher.metrics.run_unit(stage, stages[stage].run, repo)
+            if fetcher.activity.repos:
+                fetcher.activity.save(os.path.join(workers_dir, f'activity-job-{job_id}.npz'))
+            fetcher.metrics.save_json(os.path.join(workers_dir, f'{worker_id}.json'))
+            queue.complete(job_id, worker_id, stage_changes(repo, stage))
+        except Exception as e:
+            print(f"Worker {worker_id}: job '{stage}' failed for {full_name}: {e}")
+            queue.fail(job_id, worker_id, e)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+    queue.close()
+    fetcher.metrics.save_json(os.path.join(workers_dir, f'{worker_id}.json'))
+    if profile:
+        fetcher.metrics.save_profiles(os.path.join(workers_dir, f'{worker_id}-profiles'))
+
+
+def run_job_queue(fetcher, token, stages=None, processes=None, queue_path=None):
+    """
+    Coordinator: enqueue a (repo, stage) job for every repository in the registry and run
+    `processes` worker processes until the queue is drained. Re-running with the same
+    queue file resumes where a previous (possibly killed) run stopped; once a run has
+    finished, the next one queues every job again.
+    """
+    registry = fetcher.load_registry()
+    names = resolve_stages(build_stages(fetcher), stages or DEFAULT_STAGES)
+    # Each commits job resolves its own default branch, so the branch stage is not queued
+    names = [name for name in names if name != 'branch']
+    queue_path = queue_path or os.path.join(fetcher.metadata_dir, 'jobs.sqlite')
+    processes = processes or os.cpu_count()
+
+    queue = JobQueue(queue_path)
+    run_id, resumed = queue.begin_run(registry, names)
+    print(f"\n{'Resuming interrupted' if resumed else 'Queued'} run {run_id} in {queue_path}: {queue.counts()}")
+
+    archive_dir = fetcher.archive.directory if fetcher.archive is not None else None
+    worker_args = (queue_path, token, fetcher.data_dir, fetcher.metadata_file, fetcher.metrics.profile, fetcher.api_url,
+                   archive_dir, fetcher.replay, fetcher.columns, fetcher.sampling, fetcher.window)
+    workers = [multiprocessing.Process(target=worker_main, args=worker_args) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # Fold what the workers learned back into the shared registry and contributor activity
+    # (including the jobs a killed worker completed, or an interrupted run left unmerged)
+    merged = []
+    for job_id, full_name, changes in queue.results():
+        registry.update(full_name, changes)
+        activity_file = os.path.join(fetcher.metadata_dir, 'workers', f'activity-job-{job_id}.npz')
+        if os.path.isfile(activity_file):
+            fetcher.activity.merge(ContributorActivity.load(activity_file))
+            merged.append(activity_file)
+    fetcher.save_registry()
+    for activity_file in merged:
+        os.remove(activity_file)
+    if queue.unfinished() == 0:
+        queue.finish_run(run_id)
+
+    print(f"Job queue finished: {queue.counts()}")
+    queue.close()
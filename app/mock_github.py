@@ -0,0 +1,401 @@
+import argparse
+import base64
+import calendar
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Items per repository of each connection, relative to the configured repository size
+CONNECTION_WEIGHTS = {
+    'history': 1.0,
+    'stargazers': 1.0,
+    'issues': 0.5,
+    'pullRequests': 0.5,
+    'forks': 0.2,
+    'watchers': 0.1,
+    'contributors': 0.1,
+    'releases': 0.05,
+}
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(offset):
+    return base64.b64encode(f'cursor:{offset}'.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """ Offset of the item after the cursor; an empty or missing cursor starts at the beginning. """
+    if not cursor:
+        return 0
+    return int(base64.b64decode(cursor).decode('ascii').split(':', 1)[1])
+
+
+def _timestamp(index):
+    # Deterministic, increasing ISO timestamps starting on 2020-01-01
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1577836800 + index * 3600))
+
+
+def _first_index_at(timestamp):
+    """ Smallest item index whose _timestamp is at or after timestamp. """
+    return math.ceil((calendar.timegm(time.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ')) - 1577836800) / 3600)
+
+
+def _user(index):
+    return {'login': f'user{index}', 'id': f'U_{index}', 'avatarUrl': f'https://avatars.example/u/{index}',
+            'url': f'https://github.com/user{index}', 'name': f'User {index}'}
+
+
+def _commit(repo, i):
+    return {'node': {'oid': f'{repo.index:08x}{i:032x}',
+                     'author': {'name': f'User {i % 97}', 'email': f'user{i % 97}@example.com',
+                                'user': {'login': f'user{i % 97}'} if i % 7 else None},
+                     'committedDate': _timestamp(i), 'message': f'Commit {i} of {repo.full_name}'}}
+
+
+def _release(repo, i):
+    return {'node': {'id': f'RE_{i}', 'tagName': f'v{i}.0.0', 'name': f'Release {i}',
+                     'createdAt': _timestamp(i), 'publishedAt': _timestamp(i),
+                     'author': {'login': f'user{i % 13}', 'name': f'User {i % 13}'}}}
+
+
+def _issue(repo, i):
+    return {'node': {'id': f'I_{i}', 'title': f'Issue {i}', 'state': 'CLOSED' if i % 3 else 'OPEN',
+                     'createdAt': _timestamp(i), 'updatedAt': _timestamp(i + 1),
+                     'closedAt': _timestamp(i + 2) if i % 3 else None,
+                     'body': f'Body of issue {i}. ' * 20, 'url': f'{repo.url}/issues/{i}',
+                     'author': {'login': f'user{i % 53}'} if i % 11 else None}}
+
+
+def _pull(repo, i):
+    return {'node': {'id': f'PR_{i}', 'title': f'Pull request {i}', 'state': 'MERGED' if i % 2 else 'CLOSED',
+                     'createdAt': _timestamp(i), 'updatedAt': _timestamp(i + 1), 'closedAt': _timestamp(i + 2),
+                     'mergedAt': _timestamp(i + 2) if i % 2 else None,
+                     'body': f'Body of pull request {i}. ' * 20, 'url': f'{repo.url}/pull/{i}',
+                     'author': {'login': f'user{i % 41}', 'name': f'User {i % 41}'} if i % 9 else None}}
+
+
+def _stargazer(repo, i):
+    user = _user(i)
+    return {'node': {'login': user['login'], 'avatarUrl': user['avatarUrl'], 'url': user['url']},
+            'starredAt': _timestamp(i)}
+
+
+def _fork(repo, i):
+    return {'node': {'id': f'R_fork{i}', 'name': repo.name, 'nameWithOwner': f'user{i}/{repo.name}',
+                     'owner': {'login': f'user{i}'}, 'createdAt': _timestamp(i), 'updatedAt': _timestamp(i + 1),
+                     'url': f'https://github.com/user{i}/{repo.name}'}}
+
+
+def _watcher(repo, i):
+    user = _user(i)
+    return {'node': {'login': user['login'], 'id': user['id'], 'url': user['url']}}
+
+
+def _contributor(repo, i):
+    return {'login': f'user{i}', 'id': i, 'type': 'User', 'contributions': 1000 // (i + 1) + 1,
+            'html_url': f'https://github.com/user{i}'}
+
+
+EDGE_FACTORIES = {
+    'history': _commit,
+    'releases': _release,
+    'issues': _issue,
+    'pullRequests': _pull,
+    'stargazers': _stargazer,
+    'forks': _fork,
+    'watchers': _watcher,
+}
+
+
+class SyntheticRepo:
+    """ A generated repository; sizes[connection] is its number of items in that connection. """
+
+    def __init__(self, index, size):
+        self.index = index
+        self.owner = f'owner{index % 10}'
+        self.name = f'repo-{index}'
+        # Skewed sizes (a few large repositories, many small ones) like a real search result
+        scale = 2.0 / (1 + index % 4)
+        self.sizes = {connection: max(1, int(size * weight * scale)) for connection, weight in CONNECTION_WEIGHTS.items()}
+
+    @property
+    def full_name(self):
+        return f'{self.owner}/{self.name}'
+
+    @property
+    def url(self):
+        return f'https://github.com/{self.full_name}'
+
+    def search_item(self, api_url):
+        return {
+            'id': 1000 + self.index, 'node_id': f'R_{self.index}', 'name': self.name, 'full_name': self.full_name,
+            'html_url': self.url, 'description': f'Synthetic repository {self.index}', 'homepage': None,
+            'owner': {'login': self.owner, 'id': self.index % 10, 'type': 'User'},
+            'fork': False, 'private': False, 'archived': False, 'language': 'Python', 'size': self.sizes['history'],
+            'stargazers_count': self.sizes['stargazers'], 'watchers_count': self.sizes['stargazers'],
+            'forks_count': self.sizes['forks'], 'open_issues_count': self.sizes['issues'],
+            'created_at': _timestamp(0), 'updated_at': _timestamp(self.index), 'pushed_at': _timestamp(self.index),
+            'default_branch': 'main', 'license': {'key': 'mit', 'spdx_id': 'MIT', 'name': 'MIT License'},
+            'topics': ['benchmark'], 'url': f'{api_url}/repos/{self.full_name}',
+        }
+
+    def page(self, connection, first=None, after=None, descending=False, last=None, before=None, since=None, until=None):
+        """
+        One page of a connection in the GraphQL shape: edges, totalCount and pageInfo. Items are
+        oldest first unless descending; last/before page backwards from the end. since/until
+        limit the items by time (for issues, since applies to the update time, one hour later).
+        """
+        low, high = 0, self.sizes[connection]
+        if since:
+            low = max(low, _first_index_at(since) - (1 if connection == 'issues' else 0))
+        if until:
+            # Items before the first one at or after until, plus that one when it is exactly at until
+            high = min(high, _first_index_at(until) + (_timestamp(_first_index_at(until)) == until))
+        total = max(0, high - low)
+        if last is not None:
+            end = decode_cursor(before) if before else total
+            start = max(0, end - min(last, MAX_PAGE_SIZE))
+        else:
+            start = decode_cursor(after)
+            end = min(start + min(first or MAX_PAGE_SIZE, MAX_PAGE_SIZE), total)
+        return {
+            'edges': [EDGE_FACTORIES[connection](self, low + (total - 1 - i if descending else i)) for i in range(start, end)],
+            'totalCount': total,
+            'pageInfo': {'hasNextPage': end < total, 'endCursor': encode_cursor(end) if end > start else None,
+                         'hasPreviousPage': start > 0, 'startCursor': encode_cursor(start) if end > start else None},
+        }
+
+
+def _workflow_tree(repo):
+    """ The .github/workflows tree of a repository: none for every third one, else one or two workflows. """
+    if repo.index % 3 == 0:
+        return None
+    entries = [{'name': 'ci.yml', 'type': 'blob', 'object': {'isTruncated': False, 'text': (
+        'name: CI\non:\n  push:\n    branches: [main]\n  pull_request:\njobs:\n  test:\n    runs-on: ubuntu-latest\n'
+        '    steps:\n      - uses: actions/checkout@v4\n      - uses: actions/setup-python@v5\n      - run: pytest\n')}}]
+    if repo.index % 3 == 2:
+        entries.append({'name': 'release.yaml', 'type': 'blob', 'object': {'isTruncated': False, 'text': (
+            'on: [release, workflow_dispatch]\njobs:\n  build:\n    uses: ./.github/workflows/ci.yml\n'
+            '  publish:\n    needs: build\n    runs-on: ubuntu-latest\n    steps:\n      - uses: actions/checkout@v4\n'
+            '      - uses: pypa/gh-action-pypi-publish@release/v1\n')}})
+        entries.append({'name': 'scripts', 'type': 'tree', 'object': {}})
+    return {'entries': entries}
+
+
+def _argument(arguments, name, variables):
+    """ Value of a GraphQL field argument given either as a literal or as a $variable. """
+    match = re.search(r'\b%s:\s*(?:"([^"]*)"|(\d+)|\$(\w+))' % name, arguments)
+    if match is None:
+        return None
+    literal, number, variable = match.groups()
+    if variable is not None:
+        return variables.get(variable)
+    return int(number) if number is not None else literal
+
+
+class MockGitHubAPI:
+    """
+    Local stand-in for the parts of the GitHub API the fetcher uses: REST /user, repository
+    search and contributors, and the GraphQL repository connections (history, releases,
+    issues, pullRequests, stargazers, forks, watchers) and defaultBranchRef, plus aliased
+    multi-repository totalCount and workflows queries, all served from `repos` synthetic
+    repositories of about `size` items per connection.
+
+    Faults can be injected: `latency` seconds per request, a fraction `error_rate` of requests
+    answered with 502, and at most `rate_limit` requests per `rate_limit_window` seconds
+    (further requests get a secondary rate limit 403 with Retry-After).
+    """
+
+    def __init__(self, repos=20, size=300, latency=0.0, error_rate=0.0, rate_limit=0, rate_limit_window=60, seed=0):
+        self.repos = [SyntheticRepo(index, size) for index in range(repos)]
+        self.by_name = {repo.full_name: repo for repo in self.repos}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.window_requests = 0
+        self.requests = 0
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _admit(self):
+        """ Apply the injected faults. Returns (status, headers) of an error response, or None. """
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            now = time.time()
+            if now - self.window_start >= self.rate_limit_window:
+                self.window_start, self.window_requests = now, 0
+            self.window_requests += 1
+            if self.rate_limit and self.window_requests > self.rate_limit:
+                retry_after = max(1, int(self.window_start + self.rate_limit_window - now))
+                return 403, {'Retry-After': str(retry_after)}
+            if self.error_rate and self.random.random() < self.error_rate:
+                return 502, {}
+        return None
+
+    def rate_limit_headers(self):
+        remaining = max(0, self.rate_limit - self.window_requests) if self.rate_limit else 5000
+        return {'X-RateLimit-Limit': str(self.rate_limit or 5000), 'X-RateLimit-Remaining': str(remaining),
+                'X-RateLimit-Reset': str(int(self.window_start + self.rate_limit_window)),
+                'X-RateLimit-Resource': 'core'}
+
+    def rest(self, path, query):
+        """ (status, body) of a REST GET. """
+        page = int(query.get('page', ['1'])[0])
+        per_page = min(int(query.get('per_page', ['30'])[0]), MAX_PAGE_SIZE)
+        if path == '/user':
+            return 200, {'login': 'benchmark', 'id': 1}
+        if path == '/search/repositories':
+            items = self.repos[(page - 1) * per_page:page * per_page]
+            return 200, {'total_count': len(self.repos), 'incomplete_results': False,
+                         'items': [repo.search_item(self.url) for repo in items]}
+        match = re.fullmatch(r'/repos/([^/]+/[^/]+)/contributors', path)
+        if match and match.group(1) in self.by_name:
+            repo = self.by_name[match.group(1)]
+            start = (page - 1) * per_page
+            return 200, [_contributor(repo, i) for i in range(start, min(start + per_page, repo.sizes['contributors']))]
+        return 404, {'message': 'Not Found'}
+
+    def _totals(self, arguments, query, variables):
+        """
+        totalCount of every connection named in an aliased repository query, plus the workflows
+        tree when the query asks for an object(expression:), or None for an unknown repository.
+        """
+        repo = self.by_name.get(f"{_argument(arguments, 'owner', variables)}/{_argument(arguments, 'name', variables)}")
+        if repo is None:
+            return None
+        repository = {}
+        for connection in EDGE_FACTORIES:
+            if re.search(r'\b%s\b' % connection, query) is None:
+                continue
+            if connection == 'history':
+                repository['defaultBranchRef'] = {'name': 'main', 'target': {'history': {'totalCount': repo.sizes['history']}}}
+            else:
+                repository[connection] = {'totalCount': repo.sizes[connection]}
+        if 'object(expression:' in query:
+            repository['object'] = _workflow_tree(repo)
+        return repository
+
+    def graphql(self, body):
+        """ Answer the repository-shaped queries the fetcher sends. """
+        query, variables = body.get('query', ''), body.get('variables') or {}
+        aliases = re.findall(r'(\w+):\s*repository\(([^)]*)\)', query)
+        if aliases:
+            # Batched totals or workflows: several aliased repositories
+            return 200, {'data': {alias: self._totals(arguments, query, variables) for alias, arguments in aliases}}
+        arguments = re.search(r'repository\(([^)]*)\)', query)
+        if arguments is None:
+            return 200, {'errors': [{'message': 'Only repository queries are supported by the mock API'}]}
+        owner = _argument(arguments.group(1), 'owner', variables)
+        name = _argument(arguments.group(1), 'name', variables)
+        repo = self.by_name.get(f'{owner}/{name}')
+        if repo is None:
+            return 200, {'data': {'repository': None},
+                         'errors': [{'type': 'NOT_FOUND', 'message': f"Could not resolve to a Repository with the name '{owner}/{name}'."}]}
+
+        repository = {}
+        if 'defaultBranchRef' in query:
+            repository['defaultBranchRef'] = {'name': 'main'}
+        for connection in EDGE_FACTORIES:
+            match = re.search(r'\b%s\(([^)]*)\)' % connection, query)
+            if match is None:
+                continue
+            arguments = match.group(1)
+            page = repo.page(connection, _argument(arguments, 'first', variables), _argument(arguments, 'after', variables),
+                             re.search(r'direction:\s*DESC', arguments) is not None,
+                             _argument(arguments, 'last', variables), _argument(arguments, 'before', variables),
+                             _argument(arguments, 'since', variables), _argument(arguments, 'until', variables))
+            if connection == 'history':
+                repository['object'] = {'history': page}
+            else:
+                repository[connection] = page
+        for connection in EDGE_FACTORIES:
+            # totalCount-only selections, e.g. forks { totalCount }
+            if connection not in repository and re.search(r'\b%s\s*\{\s*totalCount\s*\}' % connection, query):
+                repository[connection] = {'totalCount': repo.sizes[connection]}
+
+        data = {'repository': repository}
+        if 'rateLimit' in query:
+            data['rateLimit'] = {'cost': 1, 'remaining': int(self.rate_limit_headers()['X-RateLimit-Remaining'])}
+        return 200, {'data': data}
+
+    def start(self, host='127.0.0.1', port=0):
+        """ Serve on a background thread; port 0 picks a free port. Returns the API root URL. """
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in {**api.rate_limit_headers(), **(headers or {})}.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _handle(self, answer):
+                fault = api._admit()
+                if fault:
+                    status, headers = fault
+                    self._reply(status, {'message': 'Injected failure'}, headers)
+                else:
+                    self._reply(*answer())
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                self._handle(lambda: api.rest(parts.path, parse_qs(parts.query)))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                self._handle(lambda: api.graphql(body))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a synthetic GitHub API for offline runs (set GITHUB_API_URL to its URL).")
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--repos', type=int, default=20, help='Number of synthetic repositories')
+    parser.add_argument('--size', type=int, default=300, help='Approximate items per repository connection')
+    parser.add_argument('--latency', type=float, default=0.0, help='Injected latency per request in seconds')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='Fraction of requests answered with 502')
+    parser.add_argument('--rate_limit', type=int, default=0, help='Requests allowed per minute before 403s (0 = unlimited)')
+    args = parser.parse_args()
+
+    api = MockGitHubAPI(args.repos, args.size, args.latency, args.error_rate, args.rate_limit)
+    print(f"Mock GitHub API serving {args.repos} repositories at {api.start(port=args.port)}")
+    try:
+        api.thread.join()
+    except KeyboardInterrupt:
+        api.stop()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import re
+import time
+
+from app.readme_normalizer import clean_readme
+
+
+def _multi_pass_clean_readme(text):
+    """Previous multi-pass cleaner, kept only as the baseline of benchmark_normalizer."""
+    text = re.sub(r'http\S+|https\S+|www\S+', '', text)
+    text = re.sub(r'\.\. image::[^\n]*|\. \[.*\]:[^\n]*', '', text)
+    text = re.sub(r'[^A-Za-z0-9\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def benchmark_normalizer(texts, repeats=5):
+    """
+    Compare the throughput (MB/s) of the single-pass normalizer with the previous multi-pass cleaner.
+    """
+    total_mb = sum(len(text.encode('utf-8')) for text in texts) * repeats / 1e6
+    results = {}
+    for name, cleaner in [('multi_pass', _multi_pass_clean_readme), ('single_pass', clean_readme)]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                cleaner(text)
+        results[name] = total_mb / (time.perf_counter() - start)
+        print(f"{name}: {results[name]:.2f} MB/s")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the README normalizer against the previous multi-pass cleaner.")
+    parser.add_argument('readme_dir', nargs='?', default=os.path.join('data', 'readme'), help='Directory of the fetched README files')
+    parser.add_argument('--repeats', type=int, default=5, help='Passes over all README files per cleaner')
+    args = parser.parse_args()
+
+    texts = []
+    for filename in os.listdir(args.readme_dir):
+        if filename.lower().endswith('_readme.md'):
+            with open(os.path.join(args.readme_dir, filename), encoding='utf-8') as file:
+                texts.append(file.read())
+    benchmark_normalizer(texts, args.repeats)
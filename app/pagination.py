@@ -0,0 +1,126 @@
+import math
+
+MAX_PAGE_SIZE = 100  # GitHub's limit for first:/last:
+MIN_PAGE_SIZE = 5
+FAST_SECONDS = 2.0  # A page answered faster than this lets the page size grow again
+
+
+class AdaptivePageSize:
+    """
+    Page size (first:) of one paginated GraphQL connection. It halves whenever a page
+    times out or fails with 502/504, which is how GitHub reacts to pages that are too
+    expensive to compute, and doubles back towards the maximum while pages come back fast.
+    """
+
+    def __init__(self, initial=MAX_PAGE_SIZE, minimum=MIN_PAGE_SIZE, maximum=MAX_PAGE_SIZE, fast_seconds=FAST_SECONDS):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.fast_seconds = fast_seconds
+        self.shrinks = 0
+
+    def succeeded(self, seconds):
+        if seconds < self.fast_seconds:
+            self.size = min(self.maximum, self.size * 2)
+
+    def failed(self):
+        """ Halve the page size. Returns False when it already was at the minimum. """
+        if self.size <= self.minimum:
+            return False
+        self.size = max(self.minimum, self.size // 2)
+        self.shrinks += 1
+        return True
+
+
+class ConnectionSampler:
+    """
+    Page arguments of a connection fetched whole or as a sample. The first page reveals
+    totalCount; when the connection holds more than the sample size (max_items, and/or a
+    fraction `rate` of totalCount), half of the sample is paged from the front (first/after)
+    and the other half from the back (last/before), so both the oldest and the newest items
+    are represented. totalCount can be given up front with start(), which a sample sized by
+    a rate needs: otherwise the first page is fetched whole before totalCount arrives.
+    summary() reports the rate actually sampled. Without max_items and rate every page is fetched.
+    """
+
+    def __init__(self, max_items=None, rate=None):
+        self.max_items = max_items
+        self.rate = rate
+        self.total = None
+        self.target = None
+        self.head = 0  # Items paged from the front
+        self.tail = 0  # Items paged from the back
+        self.after = None
+        self.before = None
+        self.backwards = False
+        self.finished = False  # Set once the connection (or its sample) has been paged to the end
+
+    def _target(self, total):
+        target = total
+        if self.max_items:
+            target = min(target, self.max_items)
+        if self.rate:
+            target = min(target, max(1, math.ceil(self.rate * total)))
+        return target
+
+    def start(self, total):
+        """ Size the sample from a totalCount known before the first page. """
+        self.total = total
+        self.target = self._target(total)
+
+    def _head_target(self):
+        return self.target if self.target >= self.total else math.ceil(self.target / 2)
+
+    def arguments(self, page_size=MAX_PAGE_SIZE):
+        """ The pagination arguments of the next page, e.g. 'first: 100, after: "..."'. """
+        if self.backwards:
+            size = min(page_size, self.target - self.head - self.tail)
+            return f'last: {size}' + (f', before: "{self.before}"' if self.before else '')
+        if self.target is None:
+            # totalCount is not known yet; a capped sample never needs more than half the cap from the front
+            size = min(page_size, math.ceil(self.max_items / 2)) if self.max_items else page_size
+        else:
+            size = max(1, min(page_size, self._head_target() - self.head))
+        return f'first: {size}' + (f', after: "{self.after}"' if self.after else '')
+
+    def advance(self, connection):
+        """ Take in a fetched page (edges, totalCount, pageInfo). Returns True while more pages should be fetched. """
+        more = self._advance(connection)
+        self.finished = not more
+        return more
+
+    def _advance(self, connection):
+        page_info = connection['pageInfo']
+        count = len(connection['edges'])
+        if self.total is None:
+            self.total = connection['totalCount']
+            self.target = self._target(self.total)
+        if self.backwards:
+            self.tail += count
+            self.before = page_info.get('startCursor')
+            return count > 0 and page_info.get('hasPreviousPage', False) and self.head + self.tail < self.target
+
+        self.head += count
+        self.after = page_info.get('endCursor')
+        if not page_info.get('hasNextPage', False) or count == 0:
+            return False
+        if self.head < self._head_target():
+            return True
+        if self.head + self.tail < self.target:
+            self.backwards = True  # The front half is done; continue from the end of the connection
+            return True
+        return False
+
+    @property
+    def sampled(self):
+        return self.head + self.tail
+
+    @property
+    def is_sample(self):
+        """ Whether the sample size left part of the connection out (a caller stopping early does not count). """
+        return self.target is not None and self.target < self.total
+
+    def summary(self):
+        """ What was fetched, so downstream metrics can be reweighted by total / sampled. """
+        return {'method': 'head_tail', 'total': self.total, 'sampled': self.sampled,
+                'rate': round(self.sampled / self.total, 6) if self.total else None}
@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tqdm import tqdm
+
+
+class Stage:
+    """A per-repository fetch step and the stages it needs to have finished for the same repository."""
+
+    def __init__(self, name, run, depends_on=()):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+
+
+# Default order of the stages, as run by main.py before the scheduler existed
+DEFAULT_STAGES = ['stargazers', 'forks', 'subscribers', 'contributors', 'commits',
+                  'releases', 'issues', 'pulls']
+# Stages fetched for many repositories per request, run by main.py before the per-repository stages
+BATCHED_STAGES = ['workflows']
+# Stages run on the local clones by main.py after the fetch stages
+LOCAL_STAGES = ['clone_analysis']
+STAGE_NAMES = ['branch'] + DEFAULT_STAGES + ['clone'] + BATCHED_STAGES + LOCAL_STAGES
+
+
+def build_stages(fetcher):
+    """ The stage graph of a GitHubRepoFetcher. commits needs the default branch resolved first. """
+    stages = [
+        Stage('branch', fetcher.resolve_default_branch),
+        Stage('stargazers', fetcher._fetch_stargazers_repo),
+        Stage('forks', fetcher._fetch_forks_repo),
+        Stage('subscribers', fetcher._fetch_subscribers_repo),
+        Stage('contributors', fetcher._fetch_contributors_repo),
+        Stage('commits', fetcher._fetch_commits_repo, depends_on=['branch']),
+        Stage('releases', fetcher._fetch_releases_repo),
+        Stage('issues', fetcher._fetch_issues_repo),
+        Stage('pulls', fetcher._fetch_pulls_repo),
+        Stage('clone', fetcher._clone_repository),
+    ]
+    return {stage.name: stage for stage in stages}
+
+
+def resolve_stages(stages, requested):
+    """ Add the (transitive) dependencies of the requested stages, keeping a dependency-first order. """
+    ordered = []
+
+    def visit(name):
+        if name not in stages:
+            raise ValueError(f"Unknown stage '{name}', expected one of {list(stages)}")
+        for dependency in stages[name].depends_on:
+            visit(dependency)
+        if name not in ordered:
+            ordered.append(name)
+
+    for name in requested:
+        visit(name)
+    return ordered
+
+
+def run_pipeline(fetcher, stages=None, workers=4):
+    """
+    Run the requested stages for every repository in the registry on a shared thread pool.
+
+    Each (stage, repository) pair is one unit of work. A unit is submitted as soon as the
+    stages it depends on have finished for the same repository, so independent I/O-bound
+    stages overlap instead of running one after another. Units whose dependency failed
+    are skipped. Returns a dict of (stage, full_name) -> exception for the failed units.
+    """
+    graph = build_stages(fetcher)
+    names = resolve_stages(graph, stages or DEFAULT_STAGES)
+    repos = list(fetcher.load_registry())
+
+    failed = {}
+    waiting = {}  # (stage, full_name) -> number of unfinished dependencies
+    dependents = {name: [other for other in names if name in graph[other].depends_on] for name in names}
+    ready = []
+    for repo in repos:
+        for name in names:
+            remaining = sum(1 for dependency in graph[name].depends_on if dependency in names)
+            waiting[(name, repo.full_name)] = remaining
+            if remaining == 0:
+                ready.append((name, repo))
+
+    def skip_dependents(name, repo, error):
+        for dependent in dependents[name]:
+            key = (dependent, repo.full_name)
+            if key not in failed:
+                failed[key] = error
+                pbar.update(1)
+                print(f"Skipping stage '{dependent}' for {repo.full_name} because '{name}' failed")
+                skip_dependents(dependent, repo, error)
+
+    pbar = tqdm(total=len(waiting), desc=f"Running stages {', '.join(names)}", unit="unit")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {executor.submit(fetcher.metrics.run_unit, name, graph[name].run, repo): (name, repo)
+                   for name, repo in ready}
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, repo = running.pop(future)
+                pbar.update(1)
+                error = future.exception()
+                if error is not None:
+                    failed[(name, repo.full_name)] = error
+                    print(f"Stage '{name}' failed for {repo.full_name}: {error}")
+                    skip_dependents(name, repo, error)
+                    continue
+                for dependent in dependents[name]:
+                    key = (dependent, repo.full_name)
+                    waiting[key] -= 1
+                    if waiting[key] == 0:
+                        running[executor.submit(fetcher.metrics.run_unit, dependent, graph[dependent].run, repo)] = (dependent, repo)
+    pbar.close()
+
+    fetcher.save_registry()
+    return failed
@@ -1,36 +1,160 @@
 from tabulate import tabulate
+import ast
 import csv 
 import os
+import pandas as pd
+
+# Flattened, typed schema of the repository metadata (column -> pandas dtype)
+METADATA_SCHEMA = {
+    'id': 'Int64',
+    'node_id': 'string',
+    'name': 'string',
+    'full_name': 'string',
+    'html_url': 'string',
+    'description': 'string',
+    'homepage': 'string',
+    'owner_login': 'string',
+    'owner_id': 'Int64',
+    'owner_type': 'string',
+    'fork': 'boolean',
+    'private': 'boolean',
+    'archived': 'boolean',
+    'language': 'string',
+    'size': 'Int64',
+    'stargazers_count': 'Int64',
+    'watchers_count': 'Int64',
+    'forks_count': 'Int64',
+    'open_issues_count': 'Int64',
+    'created_at': 'datetime64[ns, UTC]',
+    'updated_at': 'datetime64[ns, UTC]',
+    'pushed_at': 'datetime64[ns, UTC]',
+    'default_branch': 'string',
+    'license_key': 'string',
+    'license_spdx_id': 'string',
+    'license_name': 'string',
+    'topics': 'object',  # list of strings
+    'search_term': 'string',
+}
+
+def metadata_parquet_path(csv_path):
+    """ The typed metadata file lives next to the CSV with a .parquet extension. """
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def _literal(value):
+    """ Parse a repr'd dict/list cell written by csv.DictWriter; empty cells become None. """
+    if isinstance(value, str):
+        if value == '':
+            return None
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    return value
+
+def flatten_repo(item, search_term):
+    """
+    Flatten one raw search item into the METADATA_SCHEMA columns. Works on items from the
+    search API as well as on rows read back from the CSV (where nested fields are reprs).
+    """
+    owner = _literal(item.get('owner')) or {}
+    license_info = _literal(item.get('license')) or {}
+    topics = _literal(item.get('topics')) or []
+    return {
+        'id': item.get('id'),
+        'node_id': item.get('node_id'),
+        'name': item.get('name'),
+        'full_name': item.get('full_name'),
+        'html_url': item.get('html_url'),
+        'description': item.get('description') or None,
+        'homepage': item.get('homepage') or None,
+        'owner_login': owner.get('login'),
+        'owner_id': owner.get('id'),
+        'owner_type': owner.get('type'),
+        'fork': item.get('fork'),
+        'private': item.get('private'),
+        'archived': item.get('archived'),
+        'language': item.get('language') or None,
+        'size': item.get('size'),
+        'stargazers_count': item.get('stargazers_count'),
+        'watchers_count': item.get('watchers_count'),
+        'forks_count': item.get('forks_count'),
+        'open_issues_count': item.get('open_issues_count'),
+        'created_at': item.get('created_at'),
+        'updated_at': item.get('updated_at'),
+        'pushed_at': item.get('pushed_at'),
+        'default_branch': item.get('default_branch'),
+        'license_key': license_info.get('key'),
+        'license_spdx_id': license_info.get('spdx_id'),
+        'license_name': license_info.get('name'),
+        'topics': list(topics),
+        'search_term': search_term,
+    }
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return {'True': True, 'true': True, 'False': False, 'false': False}.get(value)
+    return value
+
+def metadata_frame(rows):
+    """ Build a DataFrame with the METADATA_SCHEMA dtypes from flattened rows. """
+    df = pd.DataFrame(rows, columns=list(METADATA_SCHEMA))
+    for column, dtype in METADATA_SCHEMA.items():
+        if dtype == 'Int64':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+        elif dtype == 'boolean':
+            df[column] = df[column].map(_to_bool).astype('boolean')
+        elif dtype.startswith('datetime64'):
+            df[column] = pd.to_datetime(df[column], utc=True, errors='coerce')
+        elif dtype == 'string':
+            df[column] = df[column].astype('string')
+    return df
+
+def save_metadata(rows, csv_path):
+    """
+    Write the flattened rows to the typed Parquet file next to csv_path. Rows already in
+    the file are kept unless the same full_name was fetched again.
+    """
+    parquet_path = metadata_parquet_path(csv_path)
+    df = metadata_frame(rows)
+    if os.path.isfile(parquet_path):
+        df = pd.concat([pd.read_parquet(parquet_path), df], ignore_index=True)
+        df = df.drop_duplicates(subset='full_name', keep='last').reset_index(drop=True)
+    df.to_parquet(parquet_path, index=False)
+    return parquet_path
+
+def metadata_from_csv(csv_path):
+    """ Convert an existing combined_metadata.csv into the typed schema (used when no Parquet file exists yet). """
+    with open(csv_path, mode='r', newline='', encoding='utf-8') as file:
+        rows = [flatten_repo(row, (_literal(row.get('params')) or {}).get('q')) for row in csv.DictReader(file)]
+    return metadata_frame(rows)
+
+def load_metadata(csv_path):
+    """
+    Load the repository metadata as a typed DataFrame in a single read. Falls back to
+    converting the CSV (and caching the Parquet file) for data fetched before the schema existed.
+    """
+    parquet_path = metadata_parquet_path(csv_path)
+    if os.path.isfile(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        return pd.read_parquet(parquet_path)
+    df = metadata_from_csv(csv_path)
+    df.to_parquet(parquet_path, index=False)
+    return df
 
 def structure_metadata(input_file):
 
-    output_file_txt = os.path.join('data', 'metadata', 'summary.txt')
+    output_file_txt = os.path.join(os.path.dirname(input_file), 'summary.txt')
     # output_file_csv = os.path.join('data', 'metadata', f'{search_term}_structured_metadata.csv')
 
-    # Read the CSV file
-    with open(input_file, mode='r', newline='', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        
-        # Prepare the data for tabulation
-        table_data = []
-        for row in reader:
-            table_data.append([
-                row['params'],
-                row['name'],
-                row['full_name'],
-                row['html_url'],
-                row['description'],
-                row['stargazers_count'],
-                row['forks_count'],
-                row['language'],
-                row['open_issues_count'],
-                row['created_at'],
-                row['updated_at'],
-                row['default_branch'],
-                row['license'],
-                row['topics'],
-                row['private']
-            ])
+    # Read the typed metadata
+    df = load_metadata(input_file)
+
+    # Prepare the data for tabulation
+    columns = ['search_term', 'name', 'full_name', 'html_url', 'description', 'stargazers_count', 'forks_count',
+               'language', 'open_issues_count', 'created_at', 'updated_at', 'default_branch', 'license_name',
+               'topics', 'private']
+    table = df[columns].astype(object).where(df[columns].notna(), None)
+    table['topics'] = df['topics'].map(lambda topics: ', '.join(topics) if topics is not None else '')
+    table_data = table.values.tolist()
 
     # Define the headers for the table
     headers = ["Search Query", "Repository Name", "full_name", "URL", "Description", "Stars", "Forks", "Language", "Issues", "Created At", "Updated At", "Default Branch", "License", "Topics", "Private"]
@@ -0,0 +1,128 @@
+import csv
+import os
+import re
+import zlib
+import numpy as np
+
+# MinHash settings. Shingle hashes are 32 bit, so a * x + b stays below 2**63
+# with a < 2**31 and the modulo by the Mersenne prime is exact in uint64.
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+_rng = np.random.RandomState(1)
+_perm_a = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_perm_b = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+_word_pattern = re.compile(r'\w+')
+
+
+def shingle_hashes(text, shingle_size=SHINGLE_SIZE):
+    """
+    Hash the word shingles of a cleaned README into a set of 32 bit integers.
+    """
+    words = _word_pattern.findall(text.lower())
+    if len(words) < shingle_size:
+        words = words + [''] * (shingle_size - len(words))
+    shingles = {' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signature(text):
+    """
+    Compute the MinHash signature (NUM_PERM minimum hash values) of a text.
+    """
+    hashes = shingle_hashes(text)
+    permuted = (np.outer(hashes, _perm_a) + _perm_b) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=0)
+
+
+def lsh_parameters(threshold, num_perm=NUM_PERM):
+    """
+    Pick the number of bands and rows per band whose LSH threshold (1/b)^(1/r)
+    is closest to the requested Jaccard similarity.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands == 0:
+            break
+        distance = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or distance < best[0]:
+            best = (distance, bands, rows)
+    return best[1], best[2]
+
+
+def find_duplicate_groups(texts, threshold=0.9):
+    """
+    Group near-duplicate texts with MinHash LSH.
+
+    texts is a dict of key -> cleaned text. Returns a list of groups, each a list
+    of (key, similarity to the representative) tuples with the representative first.
+    Texts without any near-duplicate form a group of their own.
+    """
+    keys = list(texts.keys())
+    if not keys:
+        return []
+    signatures = np.vstack([minhash_signature(texts[key]) for key in keys])
+    bands, rows = lsh_parameters(threshold)
+
+    # Union-find over the candidate pairs that share at least one band bucket
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = {}
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for index, values in enumerate(band_values):
+            buckets.setdefault(values.tobytes(), []).append(index)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_first, root_other = find(first), find(other)
+                if root_first == root_other:
+                    continue
+                # Verify the candidate pair with the estimated Jaccard similarity
+                if np.mean(signatures[first] == signatures[other]) >= threshold:
+                    parent[root_other] = root_first
+
+    grouped = {}
+    for index in range(len(keys)):
+        grouped.setdefault(find(index), []).append(index)
+
+    groups = []
+    for members in grouped.values():
+        # The longest README is kept as the representative of its group
+        members.sort(key=lambda i: len(texts[keys[i]]), reverse=True)
+        representative = signatures[members[0]]
+        groups.append([(keys[i], float(np.mean(signatures[i] == representative))) for i in members])
+    return groups
+
+
+def save_duplicate_report(groups, target_dir):
+    """
+    Save the near-duplicate groups (only groups with more than one member) to a CSV file.
+    """
+    report_path = os.path.join(target_dir, 'readme_duplicate_groups.csv')
+    with open(report_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['group_id', 'representative', 'full_name', 'similarity'])
+        writer.writeheader()
+        group_id = 0
+        for group in groups:
+            if len(group) < 2:
+                continue
+            for full_name, similarity in group:
+                writer.writerow({
+                    'group_id': group_id,
+                    'representative': group[0][0],
+                    'full_name': full_name,
+                    'similarity': round(similarity, 4)
+                })
+            group_id += 1
+    return report_path
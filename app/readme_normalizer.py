@@ -0,0 +1,51 @@
+import os
+import re
+
+# One master pattern, compiled once and scanned once with findall. Only the word
+# alternative has a capturing group, so markup matches come back as empty strings and
+# the whole scan stays inside the regex engine. A link keeps its visible text because
+# only its '](target)' part is matched as markup.
+_TOKEN_PATTERN = re.compile(r'''
+    (?:https?://|www\.)\S+                                  # bare URL
+  | ([^\W_]+)                                               # word (any script)
+  | ^[ \t]*```[^\n]*\n[\s\S]*?(?:^[ \t]*```[^\n]*$|\Z)      # fenced code block
+  | ^[ \t]*~~~[^\n]*\n[\s\S]*?(?:^[ \t]*~~~[^\n]*$|\Z)      # fenced code block (tildes)
+  | <!--[\s\S]*?(?:-->|\Z)                                  # HTML comment
+  | </?[A-Za-z][^>\n]*>                                     # HTML tag
+  | \[!\[[^\]\n]*\]\([^)\n]*\)\]\([^)\n]*\)                 # linked badge image
+  | !\[[^\]\n]*\]\([^)\n]*\)                                # inline image
+  | \]\([^)\n]*\)                                           # link target
+  | ^[ \t]*\[[^\]\n]+\]:[^\n]*                                # reference definition
+  | ^\.\.[ \t][^\n]*                                         # reStructuredText directive
+  | ^[ \t]*\|[^\n]*\|[ \t]*$                                  # table row
+''', re.MULTILINE | re.VERBOSE)
+
+
+def tokenize_readme(text):
+    """
+    Scan the README once and return the words that survive normalization.
+    Code fences, HTML, badges, images, tables, reference links and URLs are dropped;
+    links keep their visible text. Non-ASCII letters are kept.
+    """
+    return list(filter(None, _TOKEN_PATTERN.findall(text)))
+
+
+def clean_readme(text):
+    """
+    Clean the README text by removing markdown markup, URLs, badge images, special characters, and extra spaces.
+    """
+    return ' '.join(tokenize_readme(text))
+
+
+def normalize_readmes(src_dir):
+    """
+    Lazily read and clean every {repo_owner}++{repo_name}_README.md file in src_dir,
+    yielding (full_name, cleaned_text) one file at a time.
+    """
+    for filename in os.listdir(src_dir):
+        if filename.lower().endswith("_readme.md"):
+            with open(os.path.join(src_dir, filename), 'r', encoding='utf-8') as file:
+                text = file.read()
+            owner, repo = filename[:-len('_README.md')].split('++')
+            yield f'{owner}/{repo}', clean_readme(text)
+
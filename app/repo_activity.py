@@ -0,0 +1,63 @@
+import os
+import pandas as pd
+from app.result_cache import cached_map
+
+ACTIVITY_COLUMNS = ['full_name', 'contributors_count', 'total_contributions', 'active_days', 'commit_info']
+
+
+def full_name_from_filename(filename):
+    """ Map an owner++repo.csv file name (as written by fetch_commits) to owner/repo. """
+    return os.path.splitext(filename)[0].replace('++', '/', 1)
+
+
+def _commit_activity(file_path):
+    """
+    Compute the activity metrics of one commits CSV in a single vectorized pass.
+    Commits without a GitHub login are attributed to the author email.
+    """
+    commits = pd.read_csv(file_path, usecols=['commit_date', 'login', 'commit_author_email'],
+                          dtype={'login': 'string', 'commit_author_email': 'string'})
+    if commits.empty:
+        return {'contributors_count': 0, 'total_contributions': 0, 'active_days': 0, 'commit_info': {}}
+
+    author = commits['login'].mask(commits['login'].isna() | (commits['login'] == 'N/A'), commits['commit_author_email'])
+    day = pd.to_datetime(commits['commit_date'], utc=True, errors='coerce', format='ISO8601').dt.floor('D')
+
+    daily = pd.DataFrame({'author': author, 'day': day}).groupby(['author', 'day']).size()
+    commit_info = {}
+    for (name, date), total_commits in daily.items():
+        commit_info.setdefault(name, []).append((date.date(), int(total_commits)))
+
+    return {
+        'contributors_count': int(author.nunique()),
+        'total_contributions': int(len(commits)),
+        'active_days': int(day.nunique()),
+        'commit_info': commit_info
+    }
+
+
+def compute_activity(commits_dir=os.path.join('data', 'commits'), cache_file=None, max_workers=None):
+    """
+    Compute contributors_count, total_contributions, active_days and commit_info for every
+    owner++repo.csv in commits_dir and return them as one DataFrame keyed by full_name.
+
+    Files are processed in parallel across a process pool. Results are cached per file by
+    (mtime, size) in cache_file, so unchanged files are not re-read on later runs.
+    """
+    if cache_file is None:
+        cache_file = os.path.join(os.path.dirname(os.path.abspath(commits_dir)), 'analysis', 'activity_cache.pkl')
+
+    jobs = {}
+    for filename in os.listdir(commits_dir):
+        if not filename.endswith('.csv'):
+            continue
+        path = os.path.join(commits_dir, filename)
+        stat = os.stat(path)
+        jobs[filename] = ((stat.st_mtime_ns, stat.st_size), path)
+    results = cached_map(_commit_activity, jobs, cache_file, max_workers, chunksize=8)
+
+    activity = pd.DataFrame(
+        [dict(full_name=full_name_from_filename(filename), **metrics) for filename, metrics in results.items()],
+        columns=ACTIVITY_COLUMNS
+    )
+    return activity.set_index('full_name').sort_index()
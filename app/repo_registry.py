@@ -0,0 +1,122 @@
+import json
+import os
+
+from app.process_metadata import load_metadata
+
+
+class RepoRecord:
+    """
+    Compact record of one repository shared by all fetch stages.
+    totals holds the totalCount of each connection seen so far (e.g. 'commits', 'issues'),
+    watermarks the position up to which an incremental stage has fetched (e.g. 'stargazers'),
+    samples how much of a sampled connection was fetched ({'total', 'sampled', 'rate', 'method'}).
+    """
+    __slots__ = ('owner', 'name', 'node_id', 'default_branch', 'totals', 'watermarks', 'samples')
+
+    def __init__(self, owner, name, node_id=None, default_branch=None, totals=None, watermarks=None, samples=None):
+        self.owner = owner
+        self.name = name
+        self.node_id = node_id
+        self.default_branch = default_branch
+        self.totals = totals if totals is not None else {}
+        self.watermarks = watermarks if watermarks is not None else {}
+        self.samples = samples if samples is not None else {}
+
+    @property
+    def full_name(self):
+        return f"{self.owner}/{self.name}"
+
+    @property
+    def file_name(self):
+        """ File name used by every per-repo dataset: owner++repo.csv """
+        return f"{self.owner}++{self.name}.csv"
+
+    @property
+    def url(self):
+        return f"https://github.com/{self.owner}/{self.name}"
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"RepoRecord({self.full_name!r})"
+
+
+class RepoRegistry:
+    """
+    Ordered registry of repositories, built once from the metadata and persisted as JSON
+    so later runs and stages can skip re-parsing the metadata and re-querying default branches.
+    """
+
+    def __init__(self, records=None):
+        self._records = {}
+        for record in records or []:
+            self.add(record)
+
+    def add(self, record):
+        """ Add a record, keeping already known fields (node id, default branch, totals, watermarks) of an existing entry. """
+        existing = self._records.get(record.full_name)
+        if existing is None:
+            self._records[record.full_name] = record
+            return record
+        existing.node_id = record.node_id or existing.node_id
+        existing.default_branch = record.default_branch or existing.default_branch
+        existing.totals.update(record.totals)
+        existing.watermarks.update(record.watermarks)
+        existing.samples.update(record.samples)
+        return existing
+
+    def update(self, full_name, changes):
+        """
+        Apply the fields one stage changed for a repository (see job_queue.stage_changes):
+        'default_branch', and per-key values of 'totals', 'watermarks' and 'samples' that
+        replace the known ones, where None deletes the key. Unknown repositories are ignored.
+        """
+        record = self._records.get(full_name)
+        if record is None:
+            return None
+        if changes.get('default_branch'):
+            record.default_branch = changes['default_branch']
+        for field in ('totals', 'watermarks', 'samples'):
+            values = getattr(record, field)
+            for key, value in (changes.get(field) or {}).items():
+                if value is None:
+                    values.pop(key, None)
+                else:
+                    values[key] = value
+        return record
+
+    def get(self, full_name):
+        return self._records.get(full_name)
+
+    def __iter__(self):
+        return iter(list(self._records.values()))
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, full_name):
+        return full_name in self._records
+
+    @classmethod
+    def from_metadata(cls, metadata_file):
+        """ Build the registry from combined_metadata.csv (through its typed Parquet copy). """
+        df = load_metadata(metadata_file)
+        registry = cls()
+        for full_name, node_id, default_branch in zip(df['full_name'], df['node_id'], df['default_branch']):
+            owner, name = full_name.split('/', 1)
+            registry.add(RepoRecord(owner, name,
+                                    node_id if isinstance(node_id, str) else None,
+                                    default_branch if isinstance(default_branch, str) else None))
+        return registry
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump([record.to_dict() for record in self._records.values()], file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as file:
+            return cls(RepoRecord(**entry) for entry in json.load(file))
@@ -0,0 +1,139 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+SEGMENT_BYTES = 256 * 2 ** 20  # Start a new segment file once the current one reaches this size
+ARCHIVED_HEADERS = ('X-RateLimit-Limit', 'X-RateLimit-Remaining', 'X-RateLimit-Reset', 'X-RateLimit-Resource')
+
+
+def request_cursor(kwargs):
+    """
+    The pagination position of a request: the GraphQL 'cursor'/'after' variable or the
+    after: "..." literal in the query (prefixed with 'before:' when paging backwards with
+    last/before), the 'expression' variable of an object lookup (e.g. 'HEAD:README.md'),
+    or the REST query parameters. Field selection and page size are deliberately left
+    out, so a replay with a different query still finds the page.
+    """
+    if 'json' in kwargs:
+        body = kwargs['json']
+        query = body.get('query', '')
+        variables = body.get('variables') or {}
+        if variables.get('expression'):
+            return 'expression:' + variables['expression']
+        cursor = variables.get('cursor') or variables.get('after')
+        if cursor is None:
+            match = re.search(r'after:\s*"([^"]*)"', query)
+            cursor = match.group(1) if match else ''
+        if re.search(r'\blast:\s*\d', query):
+            match = re.search(r'before:\s*"([^"]*)"', query)
+            cursor = 'before:' + (match.group(1) if match else '')
+        return cursor
+    params = kwargs.get('params') or {}
+    return '&'.join(f'{key}={params[key]}' for key in sorted(params))
+
+
+class ArchivedResponse:
+    """ The parts of a requests.Response the fetcher reads, served from the archive. """
+
+    def __init__(self, status_code, content, headers=None, url=''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseArchive:
+    """
+    Append-only archive of raw API responses, indexed by (repo, dataset, cursor).
+
+    In 'record' mode every response body is zlib-compressed and appended to a segment file,
+    and its location is appended to an index file; each process writes its own segments and
+    index, so parallel workers never share a file. In 'replay' mode the indexes are loaded
+    and lookups read the compressed bodies straight from the segments, without any network.
+    When a key was recorded more than once, the latest response wins.
+    """
+
+    def __init__(self, directory, mode='record'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Archive mode must be 'record' or 'replay', got '{mode}'")
+        self.directory = directory
+        self.mode = mode
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.index = {}  # (repo, dataset, cursor) -> index entry
+        self.files = {}  # segment name -> open file
+        self.writer = None
+        self.segment = None
+        self.segment_number = 0
+        if mode == 'replay':
+            self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for index_file in glob.glob(os.path.join(self.directory, 'index-*.jsonl')):
+            with open(index_file, encoding='utf-8') as file:
+                # A line cut short by a killed recorder is ignored
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        for entry in sorted(entries, key=lambda entry: entry['time']):
+            self.index[(entry['repo'], entry['dataset'], entry['cursor'])] = entry
+
+    def _open_segment(self):
+        """ Start a new segment file for this process. Called with the lock held. """
+        if self.writer is not None:
+            self.writer.close()
+        self.segment_number += 1
+        self.segment = f'segment-{os.getpid()}-{self.segment_number:05d}.bin'
+        self.writer = open(os.path.join(self.directory, self.segment), 'ab')
+
+    def record(self, repo, dataset, cursor, response):
+        """ Append one response body and its index entry. """
+        payload = zlib.compress(response.content)
+        with self.lock:
+            if self.writer is None or self.writer.tell() >= SEGMENT_BYTES:
+                self._open_segment()
+            offset = self.writer.tell()
+            self.writer.write(payload)
+            self.writer.flush()
+            entry = {
+                'repo': repo, 'dataset': dataset, 'cursor': cursor, 'time': time.time(),
+                'status': response.status_code, 'url': response.url,
+                'headers': {key: response.headers[key] for key in ARCHIVED_HEADERS if key in response.headers},
+                'segment': self.segment, 'offset': offset, 'length': len(payload),
+            }
+            with open(os.path.join(self.directory, f'index-{os.getpid()}.jsonl'), 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + '\n')
+
+    def lookup(self, repo, dataset, cursor):
+        """ The archived response for the key, or None. """
+        entry = self.index.get((repo, dataset, cursor))
+        if entry is None:
+            return None
+        with self.lock:
+            if entry['segment'] not in self.files:
+                self.files[entry['segment']] = os.open(os.path.join(self.directory, entry['segment']), os.O_RDONLY)
+            descriptor = self.files[entry['segment']]
+        content = zlib.decompress(os.pread(descriptor, entry['length'], entry['offset']))
+        return ArchivedResponse(entry['status'], content, entry['headers'], entry['url'])
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        with self.lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+            for descriptor in self.files.values():
+                os.close(descriptor)
+            self.files = {}
@@ -0,0 +1,41 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+
+def cached_map(function, jobs, cache_file, max_workers=None, chunksize=1):
+    """
+    Compute function(argument) for every job in jobs ({name: (key, argument)}) and return
+    {name: result}. A result cached in cache_file under the same name and key is reused, so
+    only new and changed jobs run, in parallel across a process pool; a None key is never
+    taken from the cache. The cache is saved with the new results and without the names
+    that are no longer in jobs.
+    """
+    cache = {}
+    if os.path.isfile(cache_file):
+        with open(cache_file, 'rb') as file:
+            cache = pickle.load(file)
+
+    results = {}
+    stale = []
+    for name, (key, argument) in jobs.items():
+        cached = cache.get(name)
+        if key is not None and cached and cached[0] == key:
+            results[name] = cached[1]
+        else:
+            stale.append(name)
+
+    if stale or set(cache) - set(jobs):
+        if stale:
+            arguments = [jobs[name][1] for name in stale]
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for name, result in zip(stale, executor.map(function, arguments, chunksize=chunksize)):
+                    results[name] = result
+                    cache[name] = (jobs[name][0], result)
+
+        # Drop entries of jobs that no longer exist before saving
+        cache = {name: entry for name, entry in cache.items() if name in jobs}
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'wb') as file:
+            pickle.dump(cache, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return results
@@ -0,0 +1,200 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+from app.process_metadata import load_metadata
+from app.repo_registry import RepoRegistry
+from app.contributor_activity import ContributorActivity
+
+MANIFEST_NAME = 'shard.json'
+
+# Per-repo dataset directories written by the fetch stages (relative to a data directory)
+DATASET_DIRS = ['stars', 'stars_daily', 'forks', 'subscribers', 'contributors', 'commits', 'releases', 'issues', 'pulls',
+                'workflows']
+
+
+def parse_shard(value):
+    """ Parse 'i/N' (0 <= i < N) into (i, N). """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/N, got '{value}'")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must satisfy 0 <= i < N, got '{value}'")
+    return index, count
+
+
+def shard_data_dir(base_dir, index, count):
+    return os.path.join(base_dir, 'shards', f'shard-{index}-of-{count}')
+
+
+def _stable_hash(full_name):
+    # md5 is only used for a stable, platform independent hash (Python's hash() is salted per process)
+    return int.from_bytes(hashlib.md5(full_name.lower().encode('utf-8')).digest()[:8], 'big')
+
+
+def expected_sizes(metadata_file):
+    """
+    Rough per-repo work estimate from the search metadata: every star, fork and open issue
+    is a row some stage has to page through, plus a constant for the fixed per-repo requests.
+    """
+    df = load_metadata(metadata_file)
+    weight = (df['stargazers_count'].fillna(0) + df['forks_count'].fillna(0)
+              + df['open_issues_count'].fillna(0) + 100)
+    return dict(zip(df['full_name'], weight.astype(float)))
+
+
+def assign_shards(full_names, count, weights=None):
+    """
+    Deterministically map every full_name to a shard in [0, count).
+
+    Without weights, a repo goes to hash(full_name) mod count. With weights, repos are placed
+    heaviest first on the currently lightest shard (ties broken by the hash), which balances
+    the expected work. Either way every node computes the same assignment from the same metadata.
+    """
+    if not weights:
+        return {full_name: _stable_hash(full_name) % count for full_name in full_names}
+
+    loads = [0.0] * count
+    assignment = {}
+    for full_name in sorted(full_names, key=lambda name: (-weights.get(name, 0.0), _stable_hash(name), name)):
+        shard = min(range(count), key=lambda i: (loads[i], (i - _stable_hash(full_name)) % count))
+        assignment[full_name] = shard
+        loads[shard] += weights.get(full_name, 0.0)
+    return assignment
+
+
+def select_shard(fetcher, index, count, weighted=False):
+    """
+    Restrict the fetcher's registry to shard index of count and write the shard manifest
+    into its data directory. The metadata file itself is shared by all shards.
+
+    Shards are always assigned from every repository in the metadata, never from the shard's
+    saved registry, which an earlier run already cut down (re-sharding it would shrink the
+    shard on every rerun). What the shard learned before (branches, totals, watermarks) is kept.
+    """
+    registry = RepoRegistry.from_metadata(fetcher.metadata_file)
+    for record in fetcher.load_registry():
+        if record.full_name in registry:
+            registry.add(record)
+    weights = expected_sizes(fetcher.metadata_file) if weighted else None
+    assignment = assign_shards([record.full_name for record in registry], count, weights)
+    fetcher.registry = RepoRegistry(record for record in registry if assignment[record.full_name] == index)
+    fetcher.urls = {record.url for record in fetcher.registry}
+    fetcher.save_registry()
+
+    manifest = {
+        'index': index,
+        'count': count,
+        'weighted': weighted,
+        'metadata_file': os.path.abspath(fetcher.metadata_file),
+        'repos': sorted(record.full_name for record in fetcher.registry)
+    }
+    with open(os.path.join(fetcher.data_dir, MANIFEST_NAME), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=1)
+    print(f"\nShard {index}/{count}: {len(fetcher.registry)} of {len(registry)} repositories")
+    return fetcher.registry
+
+
+def merge_shards(shard_dirs, output_dir, metadata_file=None):
+    """
+    Combine the per-repo datasets of several shard data directories into output_dir.
+
+    Validates that the manifests cover shards 0..N-1 of the same N, that every repository
+    appears in exactly one shard and (when metadata_file is given) that together they cover
+    the whole metadata. A dataset file found in more than one shard is taken from the shard
+    that owns the repository. Returns a dict with the merge counts and problems found.
+    """
+    manifests = []
+    for shard_dir in shard_dirs:
+        with open(os.path.join(shard_dir, MANIFEST_NAME), encoding='utf-8') as file:
+            manifests.append((shard_dir, json.load(file)))
+
+    problems = []
+    counts = {manifest['count'] for _, manifest in manifests}
+    indexes = sorted(manifest['index'] for _, manifest in manifests)
+    if len(counts) != 1:
+        problems.append(f"Shards were produced with different shard counts: {sorted(counts)}")
+    elif indexes != list(range(counts.pop())):
+        problems.append(f"Expected shard indexes 0..N-1, found {indexes}")
+
+    owner = {}
+    for shard_dir, manifest in manifests:
+        for full_name in manifest['repos']:
+            if full_name in owner:
+                problems.append(f"{full_name} is assigned to both {owner[full_name]} and {shard_dir}")
+            else:
+                owner[full_name] = shard_dir
+
+    if metadata_file:
+        expected = set(load_metadata(metadata_file)['full_name'])
+        missing = expected - set(owner)
+        if missing:
+            problems.append(f"{len(missing)} repositories are in no shard, e.g. {sorted(missing)[:5]}")
+
+    copied = duplicates = 0
+    for dataset in DATASET_DIRS:
+        target_dir = os.path.join(output_dir, dataset)
+        os.makedirs(target_dir, exist_ok=True)
+        seen = {}
+        for shard_dir, _ in manifests:
+            source_dir = os.path.join(shard_dir, dataset)
+            if not os.path.isdir(source_dir):
+                continue
+            for filename in os.listdir(source_dir):
+                is_dir = os.path.isdir(os.path.join(source_dir, filename))
+                # Only files carry an extension; a directory name such as owner++socket.io is the repository itself
+                full_name = (filename if is_dir else os.path.splitext(filename)[0]).replace('++', '/', 1)
+                if filename in seen:
+                    duplicates += 1
+                    # Keep the copy written by the shard that owns the repository
+                    if owner.get(full_name) != shard_dir:
+                        continue
+                seen[filename] = shard_dir
+                if is_dir:
+                    # The workflow files of a repository are kept in a directory of their own
+                    shutil.copytree(os.path.join(source_dir, filename), os.path.join(target_dir, filename), dirs_exist_ok=True)
+                else:
+                    shutil.copy2(os.path.join(source_dir, filename), os.path.join(target_dir, filename))
+                copied += 1
+
+    # Merge the registries into the output's own, so later stages there keep branches and totals
+    output_registry = os.path.join(output_dir, 'metadata', 'registry.json')
+    registry = RepoRegistry.load(output_registry) if os.path.isfile(output_registry) else RepoRegistry()
+    for shard_dir, _ in manifests:
+        registry_file = os.path.join(shard_dir, 'metadata', 'registry.json')
+        if os.path.isfile(registry_file):
+            for record in RepoRegistry.load(registry_file):
+                registry.add(record)
+    os.makedirs(os.path.join(output_dir, 'metadata'), exist_ok=True)
+    registry.save(output_registry)
+
+    # Shards count disjoint repositories, so their contributor activity merges without conflicts
+    activity_file = os.path.join(output_dir, 'metadata', 'contributor_activity.npz')
+    activity = ContributorActivity.load_or_create(activity_file)
+    for shard_dir, _ in manifests:
+        shard_activity = os.path.join(shard_dir, 'metadata', 'contributor_activity.npz')
+        if os.path.isfile(shard_activity):
+            activity.merge(ContributorActivity.load(shard_activity))
+    if activity.repos:
+        activity.save(activity_file)
+
+    for problem in problems:
+        print(f"Validation problem: {problem}")
+    print(f"\nMerged {len(manifests)} shards into {output_dir}: {copied} files copied, {duplicates} duplicates resolved")
+    return {'copied': copied, 'duplicates': duplicates, 'problems': problems}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge the data directories written by main.py --shard i/N.")
+    parser.add_argument('command', choices=['merge'], help='merge: combine shard outputs into one dataset')
+    parser.add_argument('shard_dirs', nargs='+', help='Shard data directories, e.g., data/shards/shard-0-of-4 ...')
+    parser.add_argument('-o', '--output', type=str, default='data', help='Data directory to merge into')
+    parser.add_argument('--metadata', type=str, default=None, help='combined_metadata.csv to check the shards against')
+    args = parser.parse_args()
+
+    result = merge_shards(args.shard_dirs, args.output, args.metadata)
+    if result['problems']:
+        raise SystemExit(1)
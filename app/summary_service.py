@@ -0,0 +1,230 @@
+import argparse
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+# The service listens on a Unix socket where available, otherwise on localhost.
+DEFAULT_ADDRESS = os.environ.get(
+    'GIT_SNIFFER_SUMMARY_SERVICE',
+    '/tmp/git-sniffer-summary.sock' if hasattr(os, 'fork') else 'localhost:6543'
+)
+# Shared secret of the service and its clients: GIT_SNIFFER_SERVICE_KEY, or else a random key the
+# service writes on first start to a file only its owner can read (connections unpickle what they receive)
+KEY_FILE = os.environ.get('GIT_SNIFFER_SERVICE_KEY_FILE', os.path.join(os.getcwd(), 'data', 'metadata', 'summary_service.key'))
+
+MAX_QUEUE_DEPTH = 256  # Maximum number of texts waiting to be summarized
+MAX_BATCH_TEXTS = 16  # Maximum number of texts coalesced into one model call
+COALESCE_SECONDS = 0.05  # How long the batcher waits for more texts before running a batch
+MAX_RETRY_DELAY = 30  # Longest back-off between two attempts of a client while the service is busy
+MAX_WAIT_SECONDS = 600  # A client gives up once a slice has been rejected as busy for this long
+
+
+def service_authkey(create=False, key_file=None):
+    """
+    The authentication key of the summary service. GIT_SNIFFER_SERVICE_KEY wins; otherwise the
+    key is read from key_file, which the service (create=True) generates with mode 0600 when
+    it does not exist yet. There is no default key.
+    """
+    if os.environ.get('GIT_SNIFFER_SERVICE_KEY'):
+        return os.environ['GIT_SNIFFER_SERVICE_KEY'].encode('utf-8')
+    key_file = key_file or KEY_FILE
+    if create and not os.path.exists(key_file):
+        os.makedirs(os.path.dirname(key_file), exist_ok=True)
+        try:
+            descriptor = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # Created by a service started at the same time
+        else:
+            with os.fdopen(descriptor, 'w') as file:
+                file.write(secrets.token_hex(32))
+    try:
+        with open(key_file, encoding='utf-8') as file:
+            key = file.read().strip()
+    except FileNotFoundError:
+        raise RuntimeError(f"No summary service key in {key_file}: start the service first or set GIT_SNIFFER_SERVICE_KEY")
+    if hasattr(os, 'getuid') and os.stat(key_file).st_mode & 0o077:
+        raise RuntimeError(f"The summary service key {key_file} is readable by other users; restrict it with chmod 600")
+    return key.encode('utf-8')
+
+
+def parse_address(address):
+    """
+    Turn 'host:port' into a (host, port) tuple; anything else is treated as a Unix socket path.
+    """
+    address = address or DEFAULT_ADDRESS
+    if isinstance(address, tuple):
+        return address
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit() and os.sep not in address:
+        return (host, int(port))
+    return address
+
+
+class _Job:
+    """Texts submitted by one client request and the summaries produced for them."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.summaries = [None] * len(texts)
+        self.remaining = len(texts)
+        self.error = None
+        self.done = threading.Event()
+
+
+class SummaryService:
+    """
+    Long-lived summarization worker. Loads the model once and coalesces the texts of
+    all connected clients into shared batches. Requests that would push the queue past
+    max_queue_depth are rejected with a 'busy' reply so callers back off.
+    """
+
+    def __init__(self, address=None, backend=None, max_queue_depth=MAX_QUEUE_DEPTH,
+                 max_batch_texts=MAX_BATCH_TEXTS, coalesce_seconds=COALESCE_SECONDS):
+        self.address = parse_address(address)
+        self.backend = backend
+        self.max_queue_depth = max_queue_depth
+        self.max_batch_texts = max_batch_texts
+        self.coalesce_seconds = coalesce_seconds
+        self.pending = queue.Queue()
+        self.depth = 0
+        self.depth_lock = threading.Lock()
+
+    def _admit(self, job):
+        with self.depth_lock:
+            if self.depth + len(job.texts) > self.max_queue_depth:
+                return False
+            self.depth += len(job.texts)
+        for index, text in enumerate(job.texts):
+            self.pending.put((job, index, text))
+        return True
+
+    def _next_batch(self):
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.coalesce_seconds
+        while len(batch) < self.max_batch_texts:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batches(self, summarize_many):
+        while True:
+            batch = self._next_batch()
+            try:
+                summaries = summarize_many([text for _, _, text in batch], backend=self.backend)
+                error = None
+            except Exception as e:
+                summaries = [None] * len(batch)
+                error = str(e)
+
+            with self.depth_lock:
+                self.depth -= len(batch)
+            for (job, index, _), summary in zip(batch, summaries):
+                job.summaries[index] = summary
+                job.error = job.error or error
+                job.remaining -= 1
+                if job.remaining == 0:
+                    job.done.set()
+
+    def _handle(self, connection):
+        try:
+            while True:
+                try:
+                    request = connection.recv()
+                except EOFError:
+                    break
+                texts = request.get('texts', [])
+                if not texts:
+                    connection.send({'summaries': []})
+                    continue
+                if len(texts) > self.max_queue_depth:
+                    connection.send({'error': f"Request of {len(texts)} texts exceeds the queue depth of {self.max_queue_depth}"})
+                    continue
+
+                job = _Job(texts)
+                if not self._admit(job):
+                    connection.send({'error': 'busy', 'retry_after': self.coalesce_seconds * 10})
+                    continue
+                job.done.wait()
+                if job.error:
+                    connection.send({'error': job.error})
+                else:
+                    connection.send({'summaries': job.summaries})
+        finally:
+            connection.close()
+
+    def serve_forever(self):
+        # Imported here so clients of this module never load the model
+        from app.text_segments_transformers import get_backend, summarize_many
+
+        get_backend(self.backend)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+        threading.Thread(target=self._run_batches, args=(summarize_many,), daemon=True).start()
+        with Listener(self.address, authkey=service_authkey(create=True)) as listener:
+            print(f"\nSummary service listening on {self.address}")
+            while True:
+                connection = listener.accept()
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+
+def service_available(address=None):
+    """ Check whether a summary service is accepting connections at the address. """
+    try:
+        Client(parse_address(address), authkey=service_authkey()).close()
+        return True
+    except (OSError, EOFError, RuntimeError):
+        return False
+
+
+def request_summaries(texts, address=None, max_retries=30):
+    """
+    Summarize texts through a running summary service, backing off while it reports busy.
+    Large lists are sent in slices so a single caller never exceeds the service queue depth.
+    The back-off doubles up to MAX_RETRY_DELAY, and a slice is given up after max_retries
+    busy replies or MAX_WAIT_SECONDS of waiting, whichever comes first.
+    """
+    summaries = []
+    with Client(parse_address(address), authkey=service_authkey()) as connection:
+        for start in range(0, len(texts), MAX_BATCH_TEXTS):
+            texts_slice = list(texts[start:start + MAX_BATCH_TEXTS])
+            delay = COALESCE_SECONDS
+            waited = 0.0
+            for _ in range(max_retries):
+                connection.send({'texts': texts_slice})
+                response = connection.recv()
+                if response.get('error') != 'busy':
+                    break
+                pause = min(max(delay, response.get('retry_after', delay)), MAX_RETRY_DELAY, MAX_WAIT_SECONDS - waited)
+                if pause <= 0:
+                    break
+                time.sleep(pause)
+                waited += pause
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+            if response.get('error') == 'busy':
+                raise RuntimeError(f"Summary service at {address or DEFAULT_ADDRESS} stayed busy for {waited:.0f}s "
+                                   f"({max_retries} retries at most); is it overloaded or stuck?")
+
+            if 'error' in response:
+                raise RuntimeError(f"Summary service error: {response['error']}")
+            summaries.extend(response['summaries'])
+    return summaries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a long-lived README summarization service.")
+    parser.add_argument('--address', type=str, default=DEFAULT_ADDRESS, help='Unix socket path or host:port to listen on')
+    parser.add_argument('--backend', type=str, default=None, help='Inference backend: pytorch, quantized or onnx')
+    parser.add_argument('--max_queue', type=int, default=MAX_QUEUE_DEPTH, help='Maximum number of texts waiting in the queue')
+    parser.add_argument('--max_batch', type=int, default=MAX_BATCH_TEXTS, help='Maximum number of texts coalesced into one batch')
+    args = parser.parse_args()
+
+    SummaryService(args.address, args.backend, args.max_queue, args.max_batch).serve_forever()
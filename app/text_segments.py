@@ -5,27 +5,7 @@ from sumy.parsers.plaintext import PlaintextParser
 from sumy.summarizers.lsa import LsaSummarizer
 from sumy.nlp.tokenizers import Tokenizer
 import csv 
-
-def clean_readme(text):
-    """
-    Clean the README text by removing URLs, badge images, special characters, and extra spaces.
-    """
-    # Remove URLs
-    text = re.sub(r'http\S+', '', text)
-    text = re.sub(r'https\S+', '', text)
-    text = re.sub(r'www\S+', '', text)
-    
-    # Remove badge images and other non-informative text
-    text = re.sub(r'\.\. image::[^\n]*', '', text)
-    text = re.sub(r'\.\. \[.*\]:[^\n]*', '', text)
-    
-    # Remove special characters
-    text = re.sub(r'[^A-Za-z0-9\s]+', ' ', text)
-    
-    # Remove multiple spaces
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    return text
+from app.readme_normalizer import clean_readme
 
 def tokenize_and_summarize(text):
     """
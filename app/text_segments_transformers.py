@@ -4,69 +4,271 @@ import torch
 import re
 import os
 import csv
+import time
+from functools import lru_cache
+from tabulate import tabulate
+from app.readme_normalizer import clean_readme, normalize_readmes
+from app.readme_dedup import find_duplicate_groups, save_duplicate_report
+from app.summary_service import request_summaries
 
 # Set up device and summarizer
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 print(f"\nUsing device: {device}")
 
 # Initialize tokenizer and model
-MAX_TOKEN_LENGTH = 1024  # T5 models typically have a max length of 512 tokens
+MAX_TOKEN_LENGTH = 512  # T5 models typically have a max length of 512 tokens
+CHUNK_OVERLAP = 64  # Tokens shared by consecutive windows so sentences are not cut blindly
+BATCH_SIZE = 2  # Smaller batch size for large models
 
-tokenizer = T5Tokenizer.from_pretrained("Falconsai/medical_summarization", legacy=False)
-model = T5ForConditionalGeneration.from_pretrained("Falconsai/medical_summarization").to(device)
+MODEL_NAME = "Falconsai/medical_summarization"
 
-def clean_readme(text):
+# Inference backend: 'pytorch' (default), 'quantized' (dynamic int8, CPU) or 'onnx' (ONNX Runtime, CPU)
+SUMMARY_BACKENDS = ('pytorch', 'quantized', 'onnx')
+SUMMARY_BACKEND = os.environ.get('GIT_SNIFFER_SUMMARY_BACKEND', 'pytorch')
+ONNX_EXPORT_DIR = os.environ.get('GIT_SNIFFER_ONNX_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'git-sniffer', 'onnx', MODEL_NAME.replace('/', '--')))
+ONNX_EXPORT_MARKER = 'export-complete'  # Written into ONNX_EXPORT_DIR once the whole export is saved
+
+GENERATION_KWARGS = {
+    'max_length': 300,
+    'min_length': 100,
+    'length_penalty': 1.5,
+    'num_beams': 5,
+    'early_stopping': True
+}
+
+tokenizer = T5Tokenizer.from_pretrained(MODEL_NAME, legacy=False)
+_backends = {}  # Loaded backends, keyed by name
+
+class SummaryBackend:
+    """A loaded summarization model together with the device its inputs must live on."""
+
+    def __init__(self, name, model, device):
+        self.name = name
+        self.model = model
+        self.device = device
+
+    def generate(self, input_ids, attention_mask):
+        with torch.inference_mode():
+            return self.model.generate(
+                input_ids=input_ids.to(self.device),
+                attention_mask=attention_mask.to(self.device),
+                **GENERATION_KWARGS
+            )
+
+def _load_pytorch():
+    model = T5ForConditionalGeneration.from_pretrained(MODEL_NAME).to(device)
+    model.eval()
+    return SummaryBackend('pytorch', model, device)
+
+def _load_quantized():
+    """Dynamic int8 quantization of the Linear layers; only supported on CPU."""
+    model = T5ForConditionalGeneration.from_pretrained(MODEL_NAME)
+    model.eval()
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return SummaryBackend('quantized', quantized, torch.device('cpu'))
+
+def _load_onnx():
+    """ONNX Runtime encoder/decoder, exported once and reused from ONNX_EXPORT_DIR (redone when an earlier export never finished)."""
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        raise ImportError("The 'onnx' summary backend requires optimum[onnxruntime]: pip install optimum[onnxruntime]")
+
+    marker = os.path.join(ONNX_EXPORT_DIR, ONNX_EXPORT_MARKER)
+    if os.path.isfile(marker):
+        model = ORTModelForSeq2SeqLM.from_pretrained(ONNX_EXPORT_DIR)
+    else:
+        print(f"\nExporting {MODEL_NAME} to ONNX in {ONNX_EXPORT_DIR}...")
+        model = ORTModelForSeq2SeqLM.from_pretrained(MODEL_NAME, export=True)
+        model.save_pretrained(ONNX_EXPORT_DIR)
+        with open(marker, 'w', encoding='utf-8') as file:
+            file.write(MODEL_NAME)
+    return SummaryBackend('onnx', model, torch.device('cpu'))
+
+_backend_loaders = {
+    'pytorch': _load_pytorch,
+    'quantized': _load_quantized,
+    'onnx': _load_onnx
+}
+
+def get_backend(name=None):
     """
-    Clean the README text by removing URLs, badge images, special characters, and extra spaces.
+    Return the named inference backend (SUMMARY_BACKEND by default), loading it on first use.
     """
-    text = re.sub(r'http\S+|https\S+|www\S+', '', text)  # More robust URL removal
-    text = re.sub(r'\.\. image::[^\n]*|\. \[.*\]:[^\n]*', '', text)  # Clean non-informative content
-    text = re.sub(r'[^A-Za-z0-9\s]', ' ', text)  # Remove special characters
-    text = re.sub(r'\s+', ' ', text).strip()  # Remove extra spaces
-    return text
+    name = name or SUMMARY_BACKEND
+    if name not in _backend_loaders:
+        raise ValueError(f"Unknown summary backend '{name}', expected one of {SUMMARY_BACKENDS}")
+    if name not in _backends:
+        _backends[name] = _backend_loaders[name]()
+    return _backends[name]
 
-def split_text(text, max_length):
+@lru_cache(maxsize=1024)
+def encode_document(text):
     """
-    Splits the text into chunks of max_length tokens.
+    Tokenize a document once into input ids (without special tokens). Cached per document.
     """
-    tokens = tokenizer.tokenize(text)
-    # Ensure tokens do not exceed the model's maximum token length
-    return [tokens[i:i + max_length] for i in range(0, len(tokens), max_length)]
+    return tuple(tokenizer.encode(text, add_special_tokens=False))
+
+def split_ids(input_ids, max_length=MAX_TOKEN_LENGTH, overlap=CHUNK_OVERLAP):
+    """
+    Slice input ids into overlapping windows of at most max_length ids, each ending with EOS.
+    An empty document has no windows (and gets an empty summary).
+    """
+    window = max_length - 1  # Leave room for the EOS token
+    step = max(window - overlap, 1)
+    chunks = []
+    for start in range(0, len(input_ids), step):
+        chunks.append(list(input_ids[start:start + window]) + [tokenizer.eos_token_id])
+        if start + window >= len(input_ids):
+            break
+    return chunks
+
+def pad_batch(chunks):
+    """
+    Right-pad a batch of id windows into input_ids and attention_mask tensors.
+    """
+    longest = max(len(chunk) for chunk in chunks)
+    input_ids = torch.full((len(chunks), longest), tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(chunks), longest), dtype=torch.long)
+    for row, chunk in enumerate(chunks):
+        input_ids[row, :len(chunk)] = torch.tensor(chunk, dtype=torch.long)
+        attention_mask[row, :len(chunk)] = 1
+    return input_ids, attention_mask
 
-def return_summary(text):
-    summaries = []
-    text_chunks = split_text(text, MAX_TOKEN_LENGTH)
-    batch_size = 2  # Smaller batch size for large models
+def summarize_many(texts, backend=None):
+    """
+    Summarize several documents at once. The id windows of all documents are pooled
+    and generated in shared batches (similar lengths together to limit padding), then
+    the chunk summaries are joined back per document in order. Documents without text
+    get an empty summary instead of one generated from a lone EOS window.
+    """
+    backend = get_backend(backend)
+    windows = []  # (document index, window index, ids)
+    for doc_index, text in enumerate(texts):
+        for window_index, chunk in enumerate(split_ids(encode_document(text))):
+            windows.append((doc_index, window_index, chunk))
+    windows.sort(key=lambda window: len(window[2]))
 
-    for i in range(0, len(text_chunks), batch_size):
-        batch = text_chunks[i:i + batch_size]
-        batch_texts = [' '.join(chunk) for chunk in batch]
+    chunk_summaries = [{} for _ in texts]
+    for i in range(0, len(windows), BATCH_SIZE):
+        batch = windows[i:i + BATCH_SIZE]
 
         try:
-            inputs = tokenizer(batch_texts, return_tensors="pt", padding=True, truncation=True, max_length=MAX_TOKEN_LENGTH, return_attention_mask=True).to(device)
-            summary_ids = model.generate(
-                inputs['input_ids'],
-                max_length=300,
-                min_length=100,
-                length_penalty=1.5,
-                num_beams=5,
-                early_stopping=True
-            )
+            input_ids, attention_mask = pad_batch([chunk for _, _, chunk in batch])
+            summary_ids = backend.generate(input_ids, attention_mask)
 
-            batch_summaries = [tokenizer.decode(g, skip_special_tokens=True) for g in summary_ids]
-            summaries.extend(batch_summaries)
+            batch_summaries = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+            for (doc_index, window_index, _), summary in zip(batch, batch_summaries):
+                chunk_summaries[doc_index][window_index] = summary
         except RuntimeError as e:
             print(f"RuntimeError: {e}")
             if 'CUDA error' in str(e):
                 print("CUDA error likely caused by incorrect tensor size or input dimensions.")
             raise  # Re-raise the exception for further investigation
 
-    return ' '.join(summaries)
+    return [' '.join(parts[k] for k in sorted(parts)) for parts in chunk_summaries]
+
+def return_summary(text, backend=None):
+    return summarize_many([text], backend=backend)[0]
+
+def _string_piece_chunks(text, max_length=MAX_TOKEN_LENGTH):
+    """
+    Previous chunking path: tokenize to string pieces, join them with spaces and re-tokenize.
+    Kept only as the baseline for benchmark_chunking.
+    """
+    tokens = tokenizer.tokenize(text)
+    batch_texts = [' '.join(tokens[i:i + max_length]) for i in range(0, len(tokens), max_length)]
+    return tokenizer(batch_texts, return_tensors="pt", padding=True, truncation=True, max_length=max_length, return_attention_mask=True)
+
+def benchmark_chunking(texts, repeats=3):
+    """
+    Compare the throughput (documents per second) of the string-piece chunking path
+    with the id-window path. The tokenizer cache is cleared before every id-path run
+    so the numbers reflect the first pass over each document.
+    """
+    results = {}
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text in texts:
+            _string_piece_chunks(text)
+    results['string_pieces'] = len(texts) * repeats / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        encode_document.cache_clear()
+        for text in texts:
+            chunks = split_ids(encode_document(text))
+            for i in range(0, len(chunks), BATCH_SIZE):
+                pad_batch(chunks[i:i + BATCH_SIZE])
+    results['input_ids'] = len(texts) * repeats / (time.perf_counter() - start)
+
+    for path, docs_per_second in results.items():
+        print(f"{path}: {docs_per_second:.1f} documents/s")
+    return results
+
+def _overlap_f1(candidate, reference):
+    """Unigram overlap F1 between two summaries (a ROUGE-1 style agreement score)."""
+    candidate_words = candidate.lower().split()
+    reference_words = reference.lower().split()
+    if not candidate_words or not reference_words:
+        return 0.0
+    reference_counts = {}
+    for word in reference_words:
+        reference_counts[word] = reference_counts.get(word, 0) + 1
+    overlap = 0
+    for word in candidate_words:
+        if reference_counts.get(word, 0) > 0:
+            reference_counts[word] -= 1
+            overlap += 1
+    if overlap == 0:
+        return 0.0
+    precision = overlap / len(candidate_words)
+    recall = overlap / len(reference_words)
+    return 2 * precision * recall / (precision + recall)
+
+def compare_backends(texts, backends=SUMMARY_BACKENDS, reference='pytorch'):
+    """
+    Summarize the same cleaned texts with every backend and report load time, mean latency
+    per document and agreement (unigram F1) with the reference backend's summaries.
+    """
+    outputs = {}
+    rows = []
+    for name in backends:
+        start = time.perf_counter()
+        try:
+            get_backend(name)
+        except ImportError as e:
+            print(f"Skipping backend '{name}': {e}")
+            continue
+        load_seconds = time.perf_counter() - start
+
+        latencies = []
+        outputs[name] = []
+        for text in texts:
+            start = time.perf_counter()
+            outputs[name].append(return_summary(text, backend=name))
+            latencies.append(time.perf_counter() - start)
+        rows.append([name, load_seconds, sum(latencies) / max(len(latencies), 1)])
+
+    for row in rows:
+        if reference in outputs:
+            scores = [_overlap_f1(c, r) for c, r in zip(outputs[row[0]], outputs[reference])]
+            row.append(sum(scores) / max(len(scores), 1))
+        else:
+            row.append(None)
+
+    print(tabulate(rows, headers=['Backend', 'Load (s)', 'Latency / doc (s)', f'F1 vs {reference}'], tablefmt='pipe', floatfmt='.3f'))
+    return rows
 
 
-def generate_summary(src_dir, target_dir):
+def generate_summary(src_dir, target_dir, dedup_threshold=0.9, backend=None, service_address=None):
     """
     Process all README files in the source directory and save the summaries in the target directory.
+    Near-duplicate READMEs (forks, templates, mirrors) are grouped with MinHash LSH when
+    dedup_threshold is set; only one representative per group is summarized.
+    backend selects the inference backend (see SUMMARY_BACKENDS). When service_address is
+    given, summaries are requested from a running summary service instead of a local model.
     """
     summaries = {}
 
@@ -74,27 +276,35 @@ def generate_summary(src_dir, target_dir):
         os.makedirs(target_dir)
 
     csv_file_path = os.path.join(target_dir, 'readme_summaries.csv')
-    
-    for filename in os.listdir(src_dir):
-        if filename.lower().endswith("_readme.md"):
-            file_path = os.path.join(src_dir, filename)
-            
-            # Read the README file content
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-            
-            # Clean the README content
-            clean_text = clean_readme(text)
-            
-            # Generate a summary
-            summary = return_summary(clean_text)
-            
-            # Append results to dictionary
-            owner, repo = filename.split('_README.md')[0].split('++')
-            summaries[f'{owner}/{repo}'] = {
+
+    cleaned_texts = dict(normalize_readmes(src_dir))
+
+    # Group near-duplicates so each group is summarized only once
+    if dedup_threshold:
+        groups = find_duplicate_groups(cleaned_texts, threshold=dedup_threshold)
+        report_path = save_duplicate_report(groups, target_dir)
+        duplicates = sum(len(group) - 1 for group in groups)
+        print(f"\nFound {duplicates} near-duplicate READMEs in {sum(len(g) > 1 for g in groups)} groups, report saved in {report_path}")
+    else:
+        groups = [[(full_name, 1.0)] for full_name in cleaned_texts]
+
+    # Generate the summaries of the representatives
+    representatives = [group[0][0] for group in groups]
+    representative_texts = [cleaned_texts[name] for name in representatives]
+    if service_address:
+        representative_summaries = request_summaries(representative_texts, address=service_address)
+    else:
+        representative_summaries = summarize_many(representative_texts, backend=backend)
+
+    for group, summary in zip(groups, representative_summaries):
+        representative = group[0][0]
+
+        # Fan the summary out to every member of the group
+        for full_name, _ in group:
+            summaries[full_name] = {
                 'Summary': summary
             }
-            print(f"Successfully summarized {owner}/{repo}")
+        print(f"Successfully summarized {representative}" + (f" (shared with {len(group) - 1} duplicates)" if len(group) > 1 else ""))
 
     # Write results to CSV
     with open(csv_file_path, 'w', newline='', encoding='utf-8') as csvfile:
@@ -0,0 +1,64 @@
+import argparse
+from datetime import datetime, timezone
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'  # GitHub's DateTime/GitTimestamp format; compares correctly as a string
+
+
+def parse_timestamp(value, end_of_day=False):
+    """
+    Parse a date (2023-01-31) or ISO 8601 time into GitHub's UTC timestamp format. A plain
+    date stands for its first second, or with end_of_day for its last one.
+    """
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a date like 2023-01-31 or 2023-01-31T12:00:00Z, got '{value}'")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    if end_of_day and 'T' not in value and ' ' not in value.strip():
+        moment = moment.replace(hour=23, minute=59, second=59)
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def parse_until(value):
+    return parse_timestamp(value, end_of_day=True)
+
+
+class TimeWindow:
+    """
+    Window [since, until] of creation (or commit) times a collection is limited to; either
+    end may be open. Commit history and issues take the window as query arguments; the
+    other connections are paged newest first and dropped once they are older than since.
+    """
+
+    def __init__(self, since=None, until=None):
+        if since and until and since > until:
+            raise ValueError(f"The window starts ({since}) after it ends ({until})")
+        self.since = since
+        self.until = until
+
+    def __bool__(self):
+        return bool(self.since or self.until)
+
+    def contains(self, timestamp):
+        return (not self.since or timestamp >= self.since) and (not self.until or timestamp <= self.until)
+
+    def passed(self, timestamp):
+        """ True once a newest-first connection has reached items older than the window. """
+        return bool(self.since) and timestamp < self.since
+
+    def order_arguments(self, filter_since=False):
+        """
+        Extra connection arguments of a windowed query: newest first, plus filterBy.since for
+        connections that support it (issues, where it filters on the update time, so every
+        issue created in the window is still returned). Empty without a window.
+        """
+        if not self:
+            return ''
+        arguments = ', orderBy: {field: CREATED_AT, direction: DESC}'
+        if filter_since and self.since:
+            arguments += ', filterBy: {since: "%s"}' % self.since
+        return arguments
+
+    def __repr__(self):
+        return f"TimeWindow({self.since!r}, {self.until!r})"
@@ -0,0 +1,79 @@
+WORKFLOWS_EXPRESSION = 'HEAD:.github/workflows'
+WORKFLOW_EXTENSIONS = ('.yml', '.yaml')
+# Selection of the workflows directory of an aliased repository: every file name with its YAML text
+WORKFLOWS_SELECTION = ('object(expression: "%s") { ... on Tree { entries { name type object { ... on Blob { text isTruncated } } } } }'
+                       % WORKFLOWS_EXPRESSION)
+# Columns of the workflow summary written for every repository, one row per workflow file
+WORKFLOW_COLUMNS = ['workflow', 'name', 'triggers', 'jobs', 'job_count', 'actions', 'error']
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("Parsing workflows requires PyYAML: pip install pyyaml")
+    return yaml
+
+
+def workflow_files(tree):
+    """ (file name, text) of the YAML files of a workflows tree, text None when GitHub did not send it (binary or too large). """
+    files = []
+    for entry in (tree or {}).get('entries') or []:
+        if entry.get('type') != 'blob' or not entry['name'].endswith(WORKFLOW_EXTENSIONS):
+            continue
+        blob = entry.get('object') or {}
+        files.append((entry['name'], None if blob.get('isTruncated') else blob.get('text')))
+    return files
+
+
+def _triggers(on):
+    """ Event names of an `on:` value, which may be a single event, a list or a mapping of events to filters. """
+    if isinstance(on, str):
+        return [on]
+    if isinstance(on, list):
+        return [event for event in on if isinstance(event, str)]
+    if isinstance(on, dict):
+        return list(on)
+    return []
+
+
+def _actions(jobs):
+    """ Every `uses:` of the jobs (reusable workflows) and of their steps (actions), in order and without repeats. """
+    actions = []
+    for job in jobs.values():
+        if not isinstance(job, dict):
+            continue
+        uses = [job.get('uses')] + [step.get('uses') for step in job.get('steps') or [] if isinstance(step, dict)]
+        actions.extend(action for action in uses if action and action not in actions)
+    return actions
+
+
+def parse_workflow(file_name, text):
+    """
+    Summary row of one workflow file: its name, trigger events, job ids and the actions it
+    uses (e.g. actions/checkout@v4), lists joined with ';'. A file that cannot be read or
+    parsed gets a row with the reason in 'error'.
+    """
+    row = dict.fromkeys(WORKFLOW_COLUMNS, '')
+    row['workflow'] = file_name
+    if text is None:
+        row['error'] = 'content not available'
+        return row
+    yaml = _yaml()
+    try:
+        # BaseLoader keeps every scalar a string, so the 'on' key is not read as the boolean True
+        document = yaml.load(text, Loader=yaml.BaseLoader)
+    except yaml.YAMLError as error:
+        row['error'] = f'invalid YAML: {str(error).splitlines()[0]}'
+        return row
+    if not isinstance(document, dict):
+        row['error'] = 'not a workflow mapping'
+        return row
+
+    jobs = document.get('jobs') if isinstance(document.get('jobs'), dict) else {}
+    row['name'] = document.get('name') if isinstance(document.get('name'), str) else ''
+    row['triggers'] = ';'.join(_triggers(document.get('on')))
+    row['jobs'] = ';'.join(jobs)
+    row['job_count'] = len(jobs)
+    row['actions'] = ';'.join(_actions(jobs))
+    return row
@@ -3,16 +3,42 @@ import sys
 import nltk
 import os
 
-from app.fetch_github_data import GitHubRepoFetcher
+from app.fetch_github_data import GitHubRepoFetcher, PULL_FIELDS, ISSUE_FIELDS, DEFAULT_COLUMNS, SAMPLED_STAGES
+from app.pipeline import run_pipeline, DEFAULT_STAGES, STAGE_NAMES, BATCHED_STAGES, LOCAL_STAGES
+from app.job_queue import run_job_queue
+from app.sharding import parse_shard, shard_data_dir, select_shard
+from app.contributor_graph import update_contributor_graph
+from app.cost_planner import plan_collection
+from app.time_window import TimeWindow, parse_timestamp, parse_until
 
 if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(description="Fetch GitHub repositories based on multiple search terms.")
     parser.add_argument('-t', '--token', type=str, required=True, help='GitHub access token')
-    parser.add_argument('-s', '--search', nargs='+', required=True, help='Search terms for repositories, e.g., -s term1 term2')
+    parser.add_argument('-s', '--search', nargs='+', default=None, help='Search terms for repositories, e.g., -s term1 term2 (optional when --metadata already exists)')
     parser.add_argument('-m', '--max_repos', type=int, default=10, help='Maximum number of repositories to fetch per term')
     # parser.add_argument('-r', '--readme', type=bool, default=False, help='True or 1 if README files are needed else False or 0')
     parser.add_argument('-a', '--analyze', type=bool, default=False, help='True or 1 if analysis is needed else False or 0')
+    parser.add_argument('--stages', nargs='+', choices=STAGE_NAMES, default=DEFAULT_STAGES, help='Fetch stages to run after the repository search, e.g., --stages commits issues')
+    parser.add_argument('--workers', type=int, default=4, help='Number of worker threads shared by the fetch stages')
+    parser.add_argument('--processes', type=int, default=0, help='Run the stages in this many worker processes fed by a durable job queue (0 = threads only)')
+    parser.add_argument('--metadata', type=str, default=None, help='Existing combined_metadata.csv to fetch for (default: data/metadata/combined_metadata.csv)')
+    parser.add_argument('--shard', type=parse_shard, default=None, help='Fetch only shard i of N (0-based), e.g., --shard 0/4, into data/shards/shard-i-of-N')
+    parser.add_argument('--shard_weighted', type=bool, default=False, help='True or 1 to balance shards by expected repository size instead of by hash only')
+    parser.add_argument('--profile', type=bool, default=False, help='True or 1 to profile every stage with cProfile (saved in data/metadata/profiles); use a single worker for complete profiles')
+    parser.add_argument('--prometheus', type=str, default=None, help='Also write the run metrics to this Prometheus textfile-collector file')
+    parser.add_argument('--archive', type=str, default=None, help='Directory of the raw response archive: record every API response into it')
+    parser.add_argument('--replay', type=bool, default=False, help='True or 1 to re-run the stages from --archive without network access')
+    parser.add_argument('--pull_columns', nargs='+', choices=list(PULL_FIELDS), default=DEFAULT_COLUMNS['pulls'], help='Pull request columns to write; only their fields are requested')
+    parser.add_argument('--issue_columns', nargs='+', choices=list(ISSUE_FIELDS), default=DEFAULT_COLUMNS['issues'], help='Issue columns to write; only their fields are requested')
+    parser.add_argument('--sample_max', type=int, default=None, help='Fetch at most this many items (head and tail pages) of large connections in --sample_stages')
+    parser.add_argument('--sample_rate', type=float, default=None, help='Fetch this fraction (0-1) of large connections in --sample_stages')
+    parser.add_argument('--sample_stages', nargs='+', choices=SAMPLED_STAGES, default=SAMPLED_STAGES, help='Stages sampled by --sample_max/--sample_rate')
+    parser.add_argument('--since', type=parse_timestamp, default=None, help='Only fetch commits, releases, issues and pull requests created at or after this date, e.g., 2023-01-01')
+    parser.add_argument('--until', type=parse_until, default=None, help='Only fetch commits, releases, issues and pull requests created at or before this date (inclusive)')
+    parser.add_argument('--plan', type=bool, default=False, help='True or 1 to only estimate pages, cost and time of the stages and order the repositories largest first')
+    parser.add_argument('--summary_backend', type=str, default=None, help='Inference backend of the README summaries: pytorch, quantized or onnx (default: GIT_SNIFFER_SUMMARY_BACKEND or pytorch)')
+    parser.add_argument('--graph', type=bool, default=False, help='True or 1 to update the repository x contributor graph after fetching')
     local_flag = False
     args = parser.parse_args()
     #nltk.data.path.extend([os.path.join(sys.prefix, 'nltk_data'), 
@@ -38,22 +64,60 @@ if __name__ == '__main__':
             # print("Exiting: README files are required for analysis.")
             sys.exit(1)
 
-    fetcher = GitHubRepoFetcher(args.token)
-    fetcher.fetch_repos(args.search, args.max_repos)
-    fetcher.fetch_stargazers()
-    fetcher.fetch_forks()
-    fetcher.fetch_subscribers()
-    fetcher.fetch_contributors()
-    fetcher.fetch_commits()
-    fetcher.fetch_releases()
-    fetcher.fetch_issues()
-    fetcher.fetch_pulls()
+    base_data_dir = os.path.join(os.getcwd(), 'data')
+    metadata_file = args.metadata or os.path.join(base_data_dir, 'metadata', 'combined_metadata.csv')
+    if args.replay and not args.archive:
+        parser.error("--replay needs the --archive directory to replay from")
+    if not args.search and not os.path.isfile(metadata_file):
+        parser.error(f"--search is required when {metadata_file} does not exist")
+
+    if args.sample_rate is not None and not 0 < args.sample_rate <= 1:
+        parser.error("--sample_rate must be in (0, 1]")
+    sampling = None
+    if args.sample_max or args.sample_rate:
+        sampling = {stage: (args.sample_max, args.sample_rate) for stage in args.sample_stages}
+
+    try:
+        window = TimeWindow(args.since, args.until)
+    except ValueError as error:
+        parser.error(str(error))
+    if window and sampling and 'issues' in sampling:
+        parser.error("--since/--until cannot be combined with sampling issues; leave issues out of --sample_stages")
+
+    data_dir = shard_data_dir(base_data_dir, *args.shard) if args.shard else None
+    fetcher = GitHubRepoFetcher(args.token, data_dir=data_dir, metadata_file=metadata_file, profile=args.profile,
+                                archive_dir=args.archive, replay=args.replay,
+                                columns={'pulls': args.pull_columns, 'issues': args.issue_columns}, sampling=sampling,
+                                window=window)
+    if args.search:
+        fetcher.fetch_repos(args.search, args.max_repos)
+    if args.shard:
+        select_shard(fetcher, *args.shard, weighted=args.shard_weighted)
+
+    stages = list(args.stages)
+    if (local_flag or 'clone_analysis' in stages) and 'clone' not in stages:
+        stages.append('clone')
+    analyze_clones = 'clone_analysis' in stages
+    if args.plan:
+        plan_collection(fetcher, stages, workers=args.processes or args.workers)
+        fetcher.save_run_report(args.prometheus)
+        sys.exit(0)
+    if 'workflows' in stages:
+        fetcher.fetch_workflows()
+    stages = [stage for stage in stages if stage not in BATCHED_STAGES + LOCAL_STAGES]
+    if stages and args.processes > 0:
+        run_job_queue(fetcher, args.token, stages=stages, processes=args.processes)
+    elif stages:
+        run_pipeline(fetcher, stages=stages, workers=args.workers)
+    if analyze_clones:
+        fetcher.analyze_clones(max_workers=args.processes or None)
+    if args.graph:
+        update_contributor_graph(fetcher.data_dir)
     # fetcher.fetch_readme(args.readme)
+    fetcher.save_run_report(args.prometheus)
     
-    if local_flag == True:
-        fetcher.clone_repositories()
     print(f"Number of Repositories Processed: {len(fetcher.urls)}")
-    # fetcher.analyze(args.analyze)
+    # fetcher.analyze(args.analyze, backend=args.summary_backend)
 
 
 
@@ -0,0 +1,24 @@
+import pytest
+
+from app.fetch_github_data import GitHubRepoFetcher
+from app.mock_github import MockGitHubAPI
+
+
+@pytest.fixture
+def mock_api():
+    """ A mock GitHub API of 3 small synthetic repositories, served for the duration of a test. """
+    api = MockGitHubAPI(repos=3, size=40)
+    api.start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def make_fetcher(mock_api, tmp_path):
+    """ Factory of fetchers against the mock API; search=True first fetches the repository metadata. """
+    def make(data_dir=None, search=False, **kwargs):
+        fetcher = GitHubRepoFetcher('test-token', data_dir=str(data_dir or tmp_path / 'data'), api_url=mock_api.url, **kwargs)
+        if search:
+            fetcher.fetch_repos(['benchmark'], len(mock_api.repos))
+        return fetcher
+    return make
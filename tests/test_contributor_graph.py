@@ -0,0 +1,28 @@
+import os
+
+from app.contributor_graph import update_contributor_graph
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+def test_incremental_update_drops_deleted_files(tmp_path):
+    data_dir = str(tmp_path)
+    os.makedirs(os.path.join(data_dir, 'metadata'))
+    _write(os.path.join(data_dir, 'contributors', 'a++one.csv'), 'contributor_login,contributions\nann,3\nbob,1\n')
+    _write(os.path.join(data_dir, 'contributors', 'a++two.csv'), 'contributor_login,contributions\nbob,2\ncid,5\n')
+    _write(os.path.join(data_dir, 'pulls', 'a++two.csv'), 'user\ncid\n')
+    graph = update_contributor_graph(data_dir)
+    assert graph.top_repos('a/one') == [('a/two', 1.0)]
+
+    # a/one is gone entirely; a/two keeps its contributors but lost its pull requests
+    os.remove(os.path.join(data_dir, 'contributors', 'a++one.csv'))
+    os.remove(os.path.join(data_dir, 'pulls', 'a++two.csv'))
+    graph = update_contributor_graph(data_dir)
+    assert graph.repos == ['a/two']
+    assert sorted(graph.logins) == ['bob', 'cid']
+    assert sorted(graph.sources) == ['contributors/a++two.csv']
+    assert {graph.logins[column]: weight for column, weight in zip(graph.matrix.indices, graph.matrix.data)} == {'bob': 2, 'cid': 5}
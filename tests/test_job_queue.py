@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+
+from app.job_queue import JobQueue, run_job_queue, worker_main
+
+
+def _killed_after(completed, *worker_args):
+    """ Run a worker that dies (without any cleanup) when it asks for a job after `completed` jobs. """
+    claim = JobQueue.claim
+    claims = []
+
+    def claim_or_die(self, worker_id, *args, **kwargs):
+        if len(claims) == completed:
+            os._exit(1)
+        claims.append(worker_id)
+        return claim(self, worker_id, *args, **kwargs)
+
+    JobQueue.claim = claim_or_die
+    worker_main(*worker_args)
+
+
+def _activity(fetcher):
+    return {repo.full_name: fetcher.activity.repo_activity(repo.full_name) for repo in fetcher.load_registry()}
+
+
+def test_resume_keeps_the_work_of_a_killed_worker(make_fetcher, tmp_path):
+    reference = make_fetcher(search=True)
+    for repo in reference.load_registry():
+        reference._fetch_commits_repo(repo)
+
+    fetcher = make_fetcher(data_dir=tmp_path / 'queued', metadata_file=reference.metadata_file)
+    queue_path = os.path.join(fetcher.metadata_dir, 'jobs.sqlite')
+    queue = JobQueue(queue_path)
+    queue.begin_run(fetcher.load_registry(), ['commits'])
+    worker_args = (queue_path, 'test-token', fetcher.data_dir, fetcher.metadata_file, False, fetcher.api_url)
+    worker = multiprocessing.get_context('fork').Process(target=_killed_after, args=(2,) + worker_args)
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 1
+    assert queue.counts() == {'done': 2, 'pending': 1}
+    queue.close()
+
+    # The resumed run only fetches the remaining job, yet ends up with the activity of all three
+    run_job_queue(fetcher, 'test-token', stages=['commits'], processes=1, queue_path=queue_path)
+    assert _activity(fetcher) == _activity(reference)
+    assert not [name for name in os.listdir(os.path.join(fetcher.metadata_dir, 'workers')) if name.startswith('activity-')]
+
+
+def test_finished_run_is_queued_again(make_fetcher):
+    fetcher = make_fetcher(search=True)
+    queue_path = os.path.join(fetcher.metadata_dir, 'jobs.sqlite')
+    queue = JobQueue(queue_path)
+    first, resumed = queue.begin_run(fetcher.load_registry(), ['releases'])
+    assert not resumed
+    assert queue.begin_run(fetcher.load_registry(), ['releases']) == (first, True)  # Not finished: resumed
+
+    queue.connection.execute("UPDATE jobs SET status = 'done'")
+    queue.finish_run(first)
+    second, resumed = queue.begin_run(fetcher.load_registry(), ['releases'])
+    assert (second, resumed) == (first + 1, False)
+    assert queue.counts() == {'pending': len(fetcher.load_registry())}
+    queue.close()
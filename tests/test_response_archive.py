@@ -0,0 +1,43 @@
+import os
+
+from app.response_archive import ResponseArchive, request_cursor
+
+
+def _forget_branches(fetcher):
+    for repo in fetcher.load_registry():
+        repo.default_branch = None
+
+
+def test_request_cursor_keys_pages_and_lookups():
+    assert request_cursor({'json': {'query': 'q', 'variables': {'cursor': 'abc'}}}) == 'abc'
+    assert request_cursor({'json': {'query': 'stargazers(last: 100, before: "xyz")'}}) == 'before:xyz'
+    assert request_cursor({'json': {'query': 'q', 'variables': {'expression': 'HEAD:README.md'}}}) == 'expression:HEAD:README.md'
+    assert request_cursor({'params': {'per_page': 100, 'page': 2}}) == 'page=2&per_page=100'
+
+
+def test_replay_resolves_every_repository_from_its_own_responses(make_fetcher, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    recorder = make_fetcher(search=True, archive_dir=archive_dir)
+    _forget_branches(recorder)
+    for repo in recorder.load_registry():
+        recorder.resolve_default_branch(repo)
+        recorder._fetch_commits_repo(repo)
+    recorder.archive.close()
+
+    archive = ResponseArchive(archive_dir, 'replay')
+    branch_keys = sorted(key for key in archive.index if key[1] == 'branch')
+    assert branch_keys == sorted((repo.full_name, 'branch', '') for repo in recorder.load_registry())
+
+    replayer = make_fetcher(data_dir=tmp_path / 'replay', metadata_file=recorder.metadata_file,
+                            archive_dir=archive_dir, replay=True)
+    _forget_branches(replayer)
+    for repo in replayer.load_registry():
+        assert replayer.resolve_default_branch(repo) == 'main'
+        replayer._fetch_commits_repo(repo)
+        with open(os.path.join(recorder.commits_dir, repo.file_name), encoding='utf-8') as recorded, \
+                open(os.path.join(replayer.commits_dir, repo.file_name), encoding='utf-8') as replayed:
+            assert replayed.read() == recorded.read()
+    # Every replayed request was found in the archive, with its page metrics kept per repository
+    report = replayer.metrics.report()
+    assert all(entry['status_codes'].keys() <= {'200'} for entry in report['endpoints'])
+    assert report['stages']['branch']['repos'] == len(replayer.load_registry())
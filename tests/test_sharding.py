@@ -0,0 +1,52 @@
+import json
+import os
+
+from app.repo_registry import RepoRecord, RepoRegistry
+from app.sharding import MANIFEST_NAME, merge_shards
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+
+def _shard(shard_dir, index, count, records, files):
+    """ A shard data directory with its manifest, registry and the given {relative path: text} dataset files. """
+    _write(os.path.join(shard_dir, MANIFEST_NAME),
+           json.dumps({'index': index, 'count': count, 'repos': [record.full_name for record in records]}))
+    os.makedirs(os.path.join(shard_dir, 'metadata'), exist_ok=True)
+    RepoRegistry(records).save(os.path.join(shard_dir, 'metadata', 'registry.json'))
+    for path, text in files.items():
+        _write(os.path.join(shard_dir, path), text)
+    return str(shard_dir)
+
+
+def test_merge_takes_each_repository_from_its_own_shard(tmp_path):
+    dotted = RepoRecord('owner', 'socket.io', default_branch='main')
+    plain = RepoRecord('owner', 'plain', default_branch='trunk')
+    owning = _shard(tmp_path / 'shard-0', 0, 2, [dotted], {
+        'commits/owner++socket.io.csv': 'sha\nnew\n',
+        'workflows/owner++socket.io/ci.yml': 'new',
+    })
+    # A stale copy of the dotted repository left in the other shard, e.g. from before a re-shard
+    other = _shard(tmp_path / 'shard-1', 1, 2, [plain], {
+        'commits/owner++plain.csv': 'sha\nplain\n',
+        'commits/owner++socket.io.csv': 'sha\nstale\n',
+        'workflows/owner++socket.io/ci.yml': 'stale',
+    })
+    output = tmp_path / 'merged'
+    output.joinpath('metadata').mkdir(parents=True)
+    RepoRegistry([RepoRecord('earlier', 'repo', default_branch='develop')]).save(str(output / 'metadata' / 'registry.json'))
+
+    result = merge_shards([other, owning], str(output))
+
+    assert result['problems'] == []
+    assert result['duplicates'] == 2
+    assert (output / 'commits' / 'owner++socket.io.csv').read_text(encoding='utf-8') == 'sha\nnew\n'
+    assert (output / 'workflows' / 'owner++socket.io' / 'ci.yml').read_text(encoding='utf-8') == 'new'
+    assert (output / 'commits' / 'owner++plain.csv').read_text(encoding='utf-8') == 'sha\nplain\n'
+    # The shards' registries are merged into the one already in the output directory
+    registry = RepoRegistry.load(str(output / 'metadata' / 'registry.json'))
+    assert {record.full_name: record.default_branch for record in registry} == {
+        'earlier/repo': 'develop', 'owner/socket.io': 'main', 'owner/plain': 'trunk'}